@@ -0,0 +1,49 @@
+import asyncio
+import os
+import sys
+from time import perf_counter
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+if SRC not in sys.path:
+    sys.path.insert(0, SRC)
+
+from utils.loop_monitor import percentile  # noqa: E402, F401
+
+
+def rss_mb() -> float:
+    """Resident set size of the current process, MB (Linux)."""
+    with open("/proc/self/statm") as f:
+        pages = int(f.read().split()[1])
+    return pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+class LoopLagProbe:
+    """
+    Measures how late the event loop wakes up a periodic sleeper.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.lags = []
+        self._task = None
+
+    async def _run(self):
+        while True:
+            start = perf_counter()
+            await asyncio.sleep(self.interval)
+            self.lags.append(perf_counter() - start - self.interval)
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+
+    @property
+    def max_ms(self):
+        return max(self.lags, default=0.0) * 1000
+
+    @property
+    def p99_ms(self):
+        return percentile(self.lags, 99) * 1000
@@ -0,0 +1,64 @@
+"""
+Per-frame conversion work for VAD + STT: each consumer converting (old) vs fan-out (new).
+
+    python bench/audio_fanout.py [frames]
+
+Old: VADInfoTrack resamples to 16 kHz, STTTrack calls to_ndarray() and its mono16k
+uplink encoder resamples again. New: AudioFanout.decode() once, consumers read the views.
+"""
+
+import sys
+from time import perf_counter
+
+import numpy as np
+from _common import SRC  # noqa: F401
+from av import AudioFrame, AudioResampler
+
+from tracks.fanout import AudioFanout
+
+RATE = 48000
+FRAME = 960
+
+
+def make_frames(n):
+    frames = []
+    for i in range(n):
+        t = (np.arange(FRAME) + i * FRAME) / RATE
+        mono = (np.sin(2 * np.pi * 440 * t) * 8000).astype(np.int16)
+        frame = AudioFrame.from_ndarray(np.repeat(mono, 2).reshape(1, -1), layout="stereo")
+        frame.sample_rate = RATE
+        frame.pts = i * FRAME
+        frames.append(frame)
+    return frames
+
+
+def old_path(frames):
+    vad_resampler = AudioResampler(format="s16", layout="mono", rate=16000)
+    stt_resampler = AudioResampler(format="s16", layout="mono", rate=16000)
+    for frame in frames:
+        for f in vad_resampler.resample(frame):
+            f.to_ndarray()[0]
+        frame.to_ndarray()[0].tobytes()
+        b"".join(f.to_ndarray()[0].tobytes() for f in stt_resampler.resample(frame))
+
+
+def new_path(frames):
+    fanout = AudioFanout(None)
+    for frame in frames:
+        decoded = fanout.decode(frame)
+        decoded.pcm48.tobytes()
+        decoded.pcm16.tobytes()
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    frames = make_frames(n)
+    for name, fn in (("old", old_path), ("new", new_path)):
+        start = perf_counter()
+        fn(frames)
+        elapsed = perf_counter() - start
+        print(f"{name}: {elapsed / n * 1e6:6.1f} us/frame")
+
+
+if __name__ == "__main__":
+    main()
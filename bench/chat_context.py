@@ -0,0 +1,92 @@
+"""
+Cost of ChatContext.context per turn: asdict of every message (old) vs incremental (new).
+
+    python bench/chat_context.py [turns]
+
+A session with a history of N messages (a quarter of them tool calls and results),
+then `turns` turns, each appending a user and an assistant message and reading the
+context twice (the llm_request and a tool call follow-up). Best of 5 runs.
+"""
+
+import sys
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from time import perf_counter
+
+from _common import SRC  # noqa: F401
+
+from chat import ChatContext, ChatMessage
+
+TEXT = "Sure, let us start with the most important task of the day. " * 3
+
+
+@dataclass
+class OldChatMessage:
+    ts: int = field(default_factory=lambda: int(datetime.now().timestamp() * 1000))
+    role: str | None = None
+    name: str | None = None
+    turn: int | None = None
+    content: str | list[str] | None = None
+    tool_call_id: str | None = None
+    tool_calls: list | None = None
+    interruption_time: int | None = None
+
+    @property
+    def interrupted_early(self) -> bool:
+        return self.interruption_time and self.interruption_time < 3000
+
+
+class OldChatContext:
+    def __init__(self):
+        self.messages = []
+
+    def append(self, **kwargs):
+        self.messages.append(OldChatMessage(**kwargs))
+
+    @property
+    def context(self):
+        return [asdict(m) for m in self.messages if not m.interrupted_early]
+
+
+def message(i) -> dict:
+    if i % 8 == 6:
+        call = {"id": f"call_{i}", "type": "function", "function": {"name": "f", "arguments": "{}"}}
+        return {"role": "assistant", "tool_calls": [call]}
+    if i % 8 == 7:
+        return {"role": "tool", "tool_call_id": f"call_{i - 1}", "content": "Local time is 12:00"}
+    return {"role": "user" if i % 2 else "assistant", "content": f"[{i}] {TEXT}"}
+
+
+def run(chat, size, turns) -> float:
+    for i in range(size):
+        chat.append(**message(i))
+    chat.context
+
+    start = perf_counter()
+    for i in range(turns):
+        chat.append(role="user", content=f"[turn {i}] {TEXT}")
+        chat.context
+        chat.append(role="assistant", content=TEXT)
+        chat.context
+    return (perf_counter() - start) / turns
+
+
+def main():
+    turns = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    print(f"{'messages':>8} {'old us/turn':>12} {'new us/turn':>12} {'speedup':>8}")
+    for size in (10, 100, 1000):
+        old = min(run(OldChatContext(), size, turns) for _ in range(5))
+        new = min(run(ChatContext(), size, turns) for _ in range(5))
+        print(f"{size:>8} {old * 1e6:>12.1f} {new * 1e6:>12.1f} {old / new:>7.1f}x")
+
+    # The wire format is unchanged
+    chat, old_chat = ChatContext(), OldChatContext()
+    for i in range(16):
+        kwargs = dict(message(i), ts=i)
+        chat.add(ChatMessage(**kwargs))
+        old_chat.messages.append(OldChatMessage(**kwargs))
+    assert chat.context == old_chat.context
+
+
+if __name__ == "__main__":
+    main()
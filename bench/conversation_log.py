@@ -0,0 +1,101 @@
+"""
+Event loop cost of the conversation log: open and append per message (old) vs ConversationLog.
+
+    python bench/conversation_log.py [sessions] [messages]
+
+`sessions` concurrent calls (default 200) each log `messages` messages (default 50),
+a message every 5-15 ms. Reports the loop time per message and the loop lag,
+then checks that every line carries its session and that rotated files are gzipped.
+"""
+
+import asyncio
+import glob
+import gzip
+import json
+import os
+import random
+import sys
+import tempfile
+from time import perf_counter
+
+from _common import SRC, LoopLagProbe, percentile  # noqa: F401
+
+from chat import ChatMessage
+from utils.conversation_log import ConversationLog
+
+TEXT = "Sure, let us start with the most important task of the day. " * 3
+
+
+def old_dump(path, msg: ChatMessage):
+    with open(path, "a") as file:
+        file.write(msg.to_json() + "\n")
+
+
+async def session(index, messages, dump, costs):
+    rng = random.Random(index)
+    for turn in range(messages):
+        msg = ChatMessage(role="user" if turn % 2 else "assistant", turn=turn, content=TEXT)
+        start = perf_counter()
+        dump(f"S{index}", msg)
+        costs.append(perf_counter() - start)
+        await asyncio.sleep(rng.uniform(0.005, 0.015))
+
+
+async def run(mode, sessions, messages, directory):
+    path = os.path.join(directory, f"{mode}.jsonl")
+    if mode == "old":
+        log = None
+        dump = lambda session_id, msg: old_dump(path, msg)  # noqa: E731
+    else:
+        log = ConversationLog(path)
+        log.writer.max_bytes = 1024 * 1024
+        dump = log.log
+
+    costs = []
+    probe = LoopLagProbe()
+    probe.start()
+    start = perf_counter()
+    await asyncio.gather(*(session(i, messages, dump, costs) for i in range(sessions)))
+    elapsed = perf_counter() - start
+    await probe.stop()
+    if log:
+        await asyncio.to_thread(log.close)
+
+    print(
+        f"{mode:>4}: {len(costs)} messages in {elapsed:5.2f}s  "
+        f"loop us/message p50 {percentile(costs, 50) * 1e6:6.1f} "
+        f"p99 {percentile(costs, 99) * 1e6:7.1f}  "
+        f"loop lag p99 {probe.p99_ms:6.2f} ms  max {probe.max_ms:6.2f} ms"
+    )
+    return path
+
+
+def check(path, sessions, messages):
+    lines = []
+    for archive in sorted(glob.glob(path[: -len(".jsonl")] + ".*.jsonl.gz")):
+        with gzip.open(archive, "rt", encoding="utf-8") as file:
+            lines += file.read().splitlines()
+    archives = len(lines)
+    with open(path, encoding="utf-8") as file:
+        lines += file.read().splitlines()
+
+    records = [json.loads(line) for line in lines]
+    assert len(records) == sessions * messages
+    for index in range(sessions):
+        turns = [r["turn"] for r in records if r["session"] == f"S{index}"]
+        assert turns == list(range(messages))
+    print(f"      {len(records)} records, {archives} of them in gzipped archives, sessions intact")
+
+
+async def main():
+    sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    messages = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    with tempfile.TemporaryDirectory(prefix="bench_") as directory:
+        await run("old", sessions, messages, directory)
+        path = await run("new", sessions, messages, directory)
+        check(path, sessions, messages)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
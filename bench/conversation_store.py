@@ -0,0 +1,101 @@
+"""
+Resuming a session: scan of the flat conversation log (old) vs the indexed store (new).
+
+    python bench/conversation_store.py [messages] [sessions]
+
+Writes a conversation log of `messages` messages (default 200000) from `sessions`
+interleaved calls (default 2000), imports it into a ConversationStore, then loads
+the last RESUME_MESSAGES messages of random sessions both ways.
+"""
+
+import json
+import os
+import random
+import sys
+import tempfile
+from time import perf_counter
+
+from _common import SRC, percentile  # noqa: F401
+
+from chat import ChatMessage
+from chat.store import RESUME_MESSAGES, ConversationStore, connect, import_jsonl
+
+TEXT = "Sure, let us start with the most important task of the day. " * 3
+
+
+def write_log(path, messages, sessions):
+    rng = random.Random(0)
+    turns = [0] * sessions
+    with open(path, "w", encoding="utf-8") as file:
+        for i in range(messages):
+            session = rng.randrange(sessions)
+            turns[session] += 1
+            message = ChatMessage(
+                ts=i, role="user" if i % 2 else "assistant", turn=turns[session], content=TEXT
+            )
+            record = {"session": f"S{session}", **message.to_dict()}
+            file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def scan(path, session_id, limit):
+    messages = []
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            record = json.loads(line)
+            if record.pop("session") == session_id:
+                messages.append(ChatMessage(**record))
+    return messages[-limit:]
+
+
+def timed(fn, runs):
+    times = []
+    for _ in range(runs):
+        start = perf_counter()
+        result = fn()
+        times.append(perf_counter() - start)
+    return result, times
+
+
+def main():
+    messages = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    sessions = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    rng = random.Random(1)
+
+    with tempfile.TemporaryDirectory(prefix="bench_") as directory:
+        log_path = os.path.join(directory, "db.jsonl")
+        db_path = os.path.join(directory, "db.sqlite3")
+        write_log(log_path, messages, sessions)
+
+        start = perf_counter()
+        db = connect(db_path)
+        store = ConversationStore(db_path)
+        imported = import_jsonl(db, log_path)
+        db.close()
+        print(f"imported {imported} messages in {perf_counter() - start:.2f}s")
+
+        session_id = f"S{rng.randrange(sessions)}"
+        old, old_times = timed(lambda: scan(log_path, session_id, RESUME_MESSAGES), 3)
+        new, new_times = timed(lambda: store.load(session_id, RESUME_MESSAGES), 100)
+        assert old == new and old, (len(old), len(new))
+
+        print(
+            f"load last {RESUME_MESSAGES} of {messages} messages:  "
+            f"scan p50 {percentile(old_times, 50) * 1000:8.1f} ms  "
+            f"store p50 {percentile(new_times, 50) * 1000:6.2f} ms "
+            f"p99 {percentile(new_times, 99) * 1000:6.2f} ms"
+        )
+
+        # Saved messages are readable once flushed
+        message = ChatMessage(role="user", turn=1, content="hello again")
+        store.save("S-new", message, user="U1")
+        store.close()
+        assert store.load("S-new") == [message]
+
+        # Importing the log again, or a log of messages already saved, adds nothing
+        db = connect(db_path)
+        assert import_jsonl(db, log_path) == 0
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Abort dispatch latency while the bus is flooded with VAD telemetry.
+
+    python bench/event_bus_priority.py
+
+For each backlog size, publishes a burst of on_vad_data events followed by a
+tts_abort and measures the time until the abort callback runs. With priority lanes
+the latency stays flat instead of growing with the backlog.
+Then checks the ordering: an abort overtakes the queued transcript events of other
+publishers, but not those of its own publisher. And that a full mailbox holding up the
+bus does not hold up an abort.
+"""
+
+import asyncio
+from time import perf_counter
+
+from _common import percentile
+
+from utils.event_bus import TRANSCRIPT, EventBus
+
+
+async def measure(backlog, rounds=50):
+    bus = EventBus()
+    await bus.start()
+
+    done = asyncio.Event()
+    latencies = []
+    published = 0.0
+
+    async def on_vad(message):
+        pass
+
+    async def on_abort(message):
+        latencies.append(perf_counter() - published)
+        done.set()
+
+    bus.subscribe(on_vad, ["on_vad_data"])
+    bus.subscribe(on_abort, ["tts_abort"])
+
+    for _ in range(rounds):
+        done.clear()
+        for _ in range(backlog):
+            bus.publish({"type": "on_vad_data", "payload": {"speech_prob": 0.0}})
+        published = perf_counter()
+        bus.publish({"type": "tts_abort", "payload": {"turn": 1}})
+        await done.wait()
+        while any(bus.lane_depth):  # let the telemetry drain
+            await asyncio.sleep(0.005)
+
+    stats = bus.lane_stats()
+    await bus.stop()
+    return latencies, stats
+
+
+async def ordering():
+    bus = EventBus()
+    await bus.start()
+
+    received = []
+
+    async def on_event(message):
+        received.append((message["source"], message["type"]))
+
+    bus.subscribe(on_event, ["tts_request", "tts_abort"])
+    for source in ("coordinator", "other"):
+        bus.publish({"type": "tts_request", "source": source}, source=source)
+    bus.publish({"type": "tts_abort", "source": "coordinator"}, source="coordinator")
+    bus.publish({"type": "tts_abort", "source": "third"}, source="third")
+    while any(bus.lane_depth) or any(m.size for m in bus.mailboxes.values()):
+        await asyncio.sleep(0.005)
+    await bus.stop()
+
+    assert received.index(("third", "tts_abort")) == 0, received
+    coordinator = [t for s, t in received if s == "coordinator"]
+    assert coordinator == ["tts_request", "tts_abort"], received
+    print(f"ordering: {', '.join(f'{s}:{t}' for s, t in received)}")
+
+
+async def blocked():
+    bus = EventBus()
+    await bus.start()
+
+    release = asyncio.Event()
+    aborted = asyncio.Event()
+
+    async def slow(message):
+        await release.wait()
+
+    async def on_abort(message):
+        aborted.set()
+
+    bus.subscribe(slow, ["llm_response"], maxsize=1)
+    bus.subscribe(on_abort, ["tts_abort"])
+    for _ in range(5):
+        bus.publish({"type": "llm_response"}, source="llm")
+    await asyncio.sleep(0.01)
+    bus.publish({"type": "tts_abort"}, source="coordinator")
+    async with asyncio.timeout(0.1):
+        await aborted.wait()
+    assert bus.lane_depth[TRANSCRIPT], "the bus is held up by the full mailbox"
+    release.set()
+    await bus.stop()
+    print("blocked: abort delivered while a full mailbox holds up the bus")
+
+
+async def main():
+    print(f"{'vad backlog':>11} {'p50':>9} {'p99':>9} {'telemetry max depth':>20}")
+    for backlog in (0, 10, 100, 1_000, 10_000):
+        latencies, stats = await measure(backlog)
+        print(
+            f"{backlog:>11} {percentile(latencies, 50) * 1e6:>7.0f}us"
+            f" {percentile(latencies, 99) * 1e6:>7.0f}us"
+            f" {stats['telemetry']['max_depth']:>20}"
+        )
+    await ordering()
+    await blocked()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,88 @@
+"""
+EventBus throughput, events/s on one core.
+
+    python bench/event_bus_throughput.py [events] [subscribers]
+
+"tasks" is the previous dispatch (asyncio.create_task per callback),
+"mailboxes" is the current EventBus with one long-lived task per subscriber.
+"""
+
+import asyncio
+import sys
+from time import perf_counter
+
+from _common import SRC  # noqa: F401
+
+from utils.event_bus import EventBus
+
+
+async def run_tasks(events, subscribers):
+    """Old dispatch loop: one task per subscriber per event."""
+    queue = asyncio.Queue()
+    handled = 0
+    done = asyncio.Event()
+
+    async def callback(message):
+        nonlocal handled
+        handled += 1
+        if handled == events * subscribers:
+            done.set()
+
+    async def process():
+        while True:
+            _, message = await queue.get()
+            for _ in range(subscribers):
+                asyncio.create_task(callback(message))
+
+    task = asyncio.create_task(process())
+    start = perf_counter()
+    for i in range(events):
+        queue.put_nowait(("on_vad_data", {"type": "on_vad_data", "payload": i}))
+    await done.wait()
+    elapsed = perf_counter() - start
+    task.cancel()
+    return elapsed
+
+
+async def run_mailboxes(events, subscribers):
+    bus = EventBus()
+    handled = 0
+    done = asyncio.Event()
+
+    async def callback(message):
+        nonlocal handled
+        handled += 1
+        if handled == events * subscribers:
+            done.set()
+
+    # Distinct callables, one mailbox each
+    for i in range(subscribers):
+
+        async def subscriber(message, cb=callback):
+            await cb(message)
+
+        bus.subscribe(subscriber, ["on_vad_data"], maxsize=events)
+
+    await bus.start()
+    start = perf_counter()
+    for i in range(events):
+        bus.publish({"type": "on_vad_data", "payload": i})
+    await done.wait()
+    elapsed = perf_counter() - start
+    await bus.stop()
+    return elapsed
+
+
+async def main(events=100_000, subscribers=3):
+    for name, fn in (("tasks", run_tasks), ("mailboxes", run_mailboxes)):
+        elapsed = await fn(events, subscribers)
+        print(
+            f"{name:>10}: {events / elapsed:>10,.0f} events/s"
+            f"  {events * subscribers / elapsed:>10,.0f} deliveries/s"
+        )
+
+
+if __name__ == "__main__":
+    events = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    subscribers = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    asyncio.run(main(events, subscribers))
@@ -0,0 +1,72 @@
+"""
+Event loop lag while a long audio log is exported: on the loop (old) vs media executor (new).
+
+    python bench/media_export_lag.py [minutes] [format]
+
+Exports `minutes` of 48 kHz stereo int16 noise (default 30) in one pydub job, on the loop
+or submitted to utils/media_jobs.py, the executor that also runs the TTS Opus decoding.
+The session audio itself is no longer exported at the end of a call: AudioLogWriter
+(utils/audio_log.py) encodes it to rotating segments in its own thread as it comes.
+mp3 needs ffmpeg, use "wav" to measure the pydub part alone.
+"""
+
+import asyncio
+import io
+import os
+import sys
+import tempfile
+from time import perf_counter
+
+import numpy as np
+from _common import SRC, LoopLagProbe  # noqa: F401
+from pydub import AudioSegment
+
+from utils.media_jobs import get_media_executor
+
+RATE = 48000
+
+
+def export(pcm_data, path, fmt):
+    audio = AudioSegment.from_raw(io.BytesIO(pcm_data), sample_width=2, frame_rate=RATE, channels=2)
+    audio.export(path, format=fmt, bitrate="160k")
+    return audio.duration_seconds
+
+
+async def run(mode, pcm_data, fmt):
+    path = os.path.join(tempfile.mkdtemp(prefix="bench_"), f"log.{fmt}")
+    probe = LoopLagProbe()
+    probe.start()
+    await asyncio.sleep(0.1)
+
+    start = perf_counter()
+    if mode == "loop":
+        export(pcm_data, path, fmt)
+    else:
+        await get_media_executor().submit(export, pcm_data, path, fmt)
+    elapsed = perf_counter() - start
+
+    await asyncio.sleep(0.1)
+    await probe.stop()
+    os.unlink(path)
+    print(
+        f"{mode:>8}: export {elapsed:6.2f}s  "
+        f"loop lag p99 {probe.p99_ms:8.2f} ms  max {probe.max_ms:8.2f} ms"
+    )
+
+
+async def main():
+    minutes = float(sys.argv[1]) if len(sys.argv) > 1 else 30
+    fmt = sys.argv[2] if len(sys.argv) > 2 else "mp3"
+
+    samples = int(minutes * 60 * RATE) * 2
+    rng = np.random.default_rng(0)
+    pcm_data = bytearray(rng.integers(-3000, 3000, samples, dtype=np.int16).tobytes())
+    print(f"{minutes:g} min, {len(pcm_data) / 2**20:.0f} MB PCM, {fmt}")
+
+    await run("loop", pcm_data, fmt)
+    await run("executor", pcm_data, fmt)
+    print(get_media_executor().stats())
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,132 @@
+"""
+Time from the first LLM token to the first TTS request: fixed grouping (old) vs Segmenter (new).
+
+    python bench/segmenter.py
+
+Replays answers token by token (about 4 characters a token) through the old grouping
+and LLMWorker._group_chunks, at a normal and a slow token rate and with a stall in the
+first sentence. Also counts the segments split inside "Dr." or "3.5", and checks that
+a stall on a buffer whose only spaces follow abbreviations sends it instead of spinning.
+"""
+
+import asyncio
+import os
+import re
+from time import perf_counter, process_time
+from types import SimpleNamespace
+
+from _common import SRC  # noqa: F401
+
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+
+from workers.llm import LLMWorker  # noqa: E402
+
+ANSWERS = [
+    "Great question, and honestly it depends on how much time you have before the meeting"
+    " with Dr. Smith tomorrow. If it's more than an hour, I'd start with the slides.",
+    "Sure! Version 3.5 of the app added offline mode, so you can practice on the train."
+    " Want me to walk you through the settings?",
+    "Well, the thing about learning a language as an adult is that consistency matters far"
+    " more than intensity, so twenty minutes a day beats three hours on Sunday.",
+    "No. I think you mean the U.S. office, e.g. the one in Boston. They open at 9 a.m.",
+]
+SCENARIOS = {
+    "normal 25 ms/token": lambda i: 0.025,
+    "slow 80 ms/token": lambda i: 0.08,
+    "stall 1.5 s at token 8": lambda i: 1.5 if i == 8 else 0.025,
+}
+BAD_SPLIT = re.compile(r"(\bDr|\b3|\bU\.S|\be\.g|\ba\.m)\.?$")
+
+
+def chunk(content=None):
+    delta = SimpleNamespace(content=content, tool_calls=None)
+    return SimpleNamespace(choices=[SimpleNamespace(delta=delta, finish_reason=None)])
+
+
+async def stream(text, delay):
+    for i, token in enumerate(re.findall(r"\s?\S{1,4}", text)):
+        await asyncio.sleep(delay(i))
+        yield chunk(token)
+
+
+async def old_group_chunks(completion):
+    delimiter = (".", "!", "?", "\n", "\t", ";")
+    buffer, first = "", True
+    async for c in completion:
+        buffer += c.choices[0].delta.content
+        min_len = 50 if first else 150
+        if buffer.endswith(delimiter) and len(buffer) > min_len:
+            first = False
+            yield {"text": buffer.strip()}
+            buffer = ""
+    if buffer:
+        yield {"text": buffer.strip()}
+
+
+async def run(group, text, delay):
+    start = perf_counter()
+    first_token = None
+
+    async def timed():
+        nonlocal first_token
+        async for c in stream(text, delay):
+            first_token = first_token or perf_counter()
+            yield c
+
+    first, parts = None, []
+    async for part in group(timed()):
+        first = first or perf_counter()
+        parts.append(part["text"])
+    assert " ".join(parts).split() == text.split(), parts
+    return (first - first_token) * 1000, parts, perf_counter() - start
+
+
+async def abbreviations_stall(worker):
+    """
+    "Call Dr. Mr. Mrs. St. Jr." then 1 s without tokens: sent whole, no busy loop.
+    """
+
+    async def tokens():
+        for token in ("Call", " Dr.", " Mr.", " Mrs.", " St.", " Jr."):
+            yield chunk(token)
+        await asyncio.sleep(1.0)
+        yield chunk(" Smith.")
+
+    cpu = process_time()
+    parts = [part["text"] async for part in worker._group_chunks(tokens())]
+    cpu = process_time() - cpu
+    assert parts == ["Call", "Dr. Mr. Mrs. St.", "Jr. Smith."], parts
+    assert cpu < 0.2, f"{cpu:.2f} s of CPU during the stall"
+    print(f"\nstall after abbreviations: {parts}, cpu {cpu * 1000:.0f} ms")
+
+
+async def main():
+    worker = LLMWorker(None)
+    groups = {"old": old_group_chunks, "new": worker._group_chunks}
+    print(f"{'scenario':<24} {'first segment ms (old)':>22} {'(new)':>8} {'parts':>11} {'bad':>6}")
+    for name, delay in SCENARIOS.items():
+        results = {}
+        for mode, group in groups.items():
+            runs = await asyncio.gather(*(run(group, text, delay) for text in ANSWERS))
+            firsts = [r[0] for r in runs]
+            parts = [p for r in runs for p in r[1]]
+            # Split inside an abbreviation or a number, the end of the answer aside
+            bad = sum(1 for r in runs for p in r[1][:-1] if BAD_SPLIT.search(p))
+            results[mode] = (sum(firsts) / len(firsts), len(parts), bad)
+        (old, old_parts, old_bad), (new, new_parts, new_bad) = results["old"], results["new"]
+        print(
+            f"{name:<24} {old:>22.0f} {new:>8.0f} {old_parts:>5} {new_parts:>5} "
+            f"{old_bad:>3}{new_bad:>3}"
+        )
+
+    print("\nsegments (new, normal rate):")
+    for text in ANSWERS[:2]:
+        _, parts, _ = await run(worker._group_chunks, text, SCENARIOS["normal 25 ms/token"])
+        for part in parts:
+            print(f"  {part!r}")
+
+    await abbreviations_stall(worker)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
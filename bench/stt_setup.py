@@ -0,0 +1,102 @@
+"""
+Call setup: STTWorker.start() with a new Deepgram connection vs one from the pool.
+
+    python bench/stt_setup.py [sessions] [connect_delay]
+
+A local websocket stand-in accepts the connections `connect_delay` seconds late
+(default 0.3, about a TLS and websocket handshake to Deepgram). Sessions start
+one after another with a short gap, then a burst of 4 at once (STT_POOL_SIZE=2).
+"""
+
+import asyncio
+import logging
+import os
+import sys
+from time import perf_counter
+
+from _common import SRC, percentile  # noqa: F401
+from aiohttp import WSMsgType, web
+
+os.environ.setdefault("DEEPGRAM_API_KEY", "bench")
+PORT = 8091
+os.environ["DEEPGRAM_URL"] = f"http://127.0.0.1:{PORT}"
+
+from utils.event_bus import EventBus  # noqa: E402
+from utils.stt_pool import get_stt_pool, start_stt_pool, stop_stt_pool  # noqa: E402
+from workers.stt import STTWorker, client_options, live_options  # noqa: E402
+
+BURST = 4  # sessions at once, more than the default pool size
+GAP = 0.5  # s between sequential sessions, the pool refills meanwhile
+
+
+async def listen(request):
+    ws = web.WebSocketResponse()
+    await asyncio.sleep(request.app["connect_delay"])
+    await ws.prepare(request)
+    async for msg in ws:
+        if msg.type == WSMsgType.TEXT and "CloseStream" in msg.data:
+            break
+    await ws.close()
+    return ws
+
+
+async def setup_time(event_bus) -> float:
+    stt = STTWorker(event_bus)
+    start = perf_counter()
+    await stt.start()
+    elapsed = perf_counter() - start
+    await stt.stop()
+    return elapsed
+
+
+async def run(mode, sessions):
+    event_bus = EventBus()
+    await event_bus.start()
+    if mode == "pool":
+        pool = start_stt_pool(client_options(), live_options())
+        while pool.stats()["idle"] < pool.size:
+            await asyncio.sleep(0.05)
+
+    sequential = []
+    for _ in range(sessions):
+        sequential.append(await setup_time(event_bus))
+        await asyncio.sleep(GAP)
+    burst = await asyncio.gather(*(setup_time(event_bus) for _ in range(BURST)))
+
+    stats = get_stt_pool().stats() if mode == "pool" else {}
+    await stop_stt_pool()
+    await event_bus.stop()
+
+    def ms(values, p):
+        return percentile(values, p) * 1000
+
+    print(
+        f"{mode:>5}: sequential p50 {ms(sequential, 50):6.1f} ms  p95 {ms(sequential, 95):6.1f} ms"
+        f"  | burst of {len(burst)} min {ms(burst, 0):6.1f} ms  max {ms(burst, 100):6.1f} ms"
+    )
+    if stats:
+        print(f"       pool {stats}")
+
+
+async def main():
+    sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    connect_delay = float(sys.argv[2]) if len(sys.argv) > 2 else 0.3
+
+    app = web.Application()
+    app["connect_delay"] = connect_delay
+    app.router.add_get("/v1/listen", listen)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", PORT).start()
+
+    print(f"{sessions} sessions, connect delay {connect_delay * 1000:.0f} ms")
+    try:
+        for mode in ("new", "pool"):
+            await run(mode, sessions)
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    logging.disable(logging.WARNING)
+    asyncio.run(main())
@@ -0,0 +1,82 @@
+"""
+Time from a TTS request to its first audio packet: network synthesis vs the TTS cache.
+
+    python bench/tts_cache.py [tts_delay]
+
+TTSWorker against the loadtest stand-in speech endpoint (first byte after `tts_delay`
+seconds, default 0.3). Every phrase is requested three times: a miss, a hit in memory,
+and a hit on disk with a fresh cache on the same directory (another pre-fork worker).
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+from time import perf_counter
+
+from _common import SRC
+
+sys.path.insert(0, os.path.join(os.path.dirname(SRC), "loadtest"))
+os.environ["OPENAI_API_KEY"] = "bench"
+os.environ["OPENAI_BASE_URL"] = "http://127.0.0.1:8091/v1"
+
+from aiohttp import web  # noqa: E402
+from standins import Latency, make_app  # noqa: E402
+
+from utils.event_bus import EventBus  # noqa: E402
+from utils.tts_cache import TTSCache  # noqa: E402
+from workers.tts import TTSWorker  # noqa: E402
+
+PHRASES = ["It is done.", "Sure!", "Got it, let's move on.", "Could you say that again?"]
+SILENCE = bytes.fromhex("f8fffe")
+
+
+async def first_packet(tts, text, turn) -> float:
+    """
+    Seconds from the request to the first audio packet, the rest of the audio is drained.
+    """
+    start = perf_counter()
+    await tts._handle_tts_request({"payload": {"text": text, "turn": turn}})
+    first = None
+    while True:
+        pkt, _ = tts.get_audio_packet()
+        if bytes(pkt) != SILENCE:
+            first = first or perf_counter() - start
+        elif first is not None and not tts.active and tts.syntheses.empty():
+            return first
+        await asyncio.sleep(0.002)
+
+
+async def main():
+    delay = float(sys.argv[1]) if len(sys.argv) > 1 else 0.3
+    runner = web.AppRunner(make_app(Latency(tts_delay=delay)))
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", 8091).start()
+
+    bus = EventBus()
+    await bus.start()
+    tts = TTSWorker(bus, cache=False)  # the caches below, not the process-wide one
+    await tts.start()
+
+    with tempfile.TemporaryDirectory(prefix="bench_") as directory:
+        results = {"miss": [], "memory hit": [], "disk hit": []}
+        cache = TTSCache(directory)
+        for turn, text in enumerate(PHRASES, 1):
+            tts.current_turn = turn
+            tts.cache = cache
+            results["miss"].append(await first_packet(tts, text, turn))
+            results["memory hit"].append(await first_packet(tts, text, turn))
+            await asyncio.sleep(0.1)  # the file is written in the background
+            tts.cache = TTSCache(directory)
+            results["disk hit"].append(await first_packet(tts, text, turn))
+
+        for name, times in results.items():
+            print(f"{name:>10}: first packet {sum(times) / len(times) * 1000:7.1f} ms")
+        print(cache.stats())
+
+    await tts.stop()
+    await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
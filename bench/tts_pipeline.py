@@ -0,0 +1,137 @@
+"""
+Playback gaps of a multi-sentence answer: sequential TTS with a 1 s sleep (old) vs pipelined.
+
+    python bench/tts_pipeline.py [tts_delay] [tts_speed]
+
+TTSWorker against the loadtest stand-in speech endpoint (first byte after `tts_delay`
+seconds, default 0.6, streamed `tts_speed` times faster than real time, default 1.0),
+without the TTS cache: every sentence is synthesized.
+The answer's sentences are requested at once, the packets are pulled in real time like
+TTSTrack does. Reports the first audio, the silence inside the answer and the end.
+Then aborts a turn mid-answer and checks that nothing of it is played after.
+"""
+
+import asyncio
+import os
+import sys
+from time import perf_counter
+
+from _common import SRC
+
+sys.path.insert(0, os.path.join(os.path.dirname(SRC), "loadtest"))
+os.environ["OPENAI_API_KEY"] = "bench"
+os.environ["OPENAI_BASE_URL"] = "http://127.0.0.1:8091/v1"
+
+from aiohttp import web  # noqa: E402
+from standins import Latency, make_app  # noqa: E402
+
+import workers.tts as tts_module  # noqa: E402
+from utils.event_bus import EventBus  # noqa: E402
+from workers.tts import TTSWorker  # noqa: E402
+
+SENTENCES = [
+    "Great question, and honestly it depends on how much time you have.",
+    "If it's more than an hour, I'd start with the slides.",
+    "Then rehearse the opening twice, out loud.",
+    "Keep the demo short.",
+    "And leave ten minutes for questions at the end.",
+]
+SILENCE = bytes.fromhex("f8fffe")
+
+
+class OldTTSWorker(TTSWorker):
+    async def start(self):
+        await super().start()
+        # Only the old loop: no pipelined playout
+        for task in asyncio.all_tasks():
+            if task.get_name() == "play_tts":
+                task.cancel()
+
+    async def _process_tts_requests(self):
+        while self._running:
+            turn, text = await self.tts_queue.get()
+            if turn < self.current_turn or not self._running:
+                self.tts_queue.task_done()
+                continue
+            try:
+                await self._requestTTS(turn, text, lambda item: self.on_segment(turn, *item))
+                if self._running:
+                    await asyncio.sleep(1)  # rate limit
+            finally:
+                self.tts_queue.task_done()
+
+
+async def play(tts, until):
+    """
+    Pull packets in real time, returns (first audio, silence inside the answer, end) in s.
+    """
+    start = clock = perf_counter()
+    first = last = None
+    silence = pending_silence = 0.0
+    while perf_counter() - start < until:
+        pkt, duration = tts.get_audio_packet()
+        now = perf_counter() - start
+        if bytes(pkt) == SILENCE:
+            if first is not None:
+                pending_silence += duration
+        else:
+            first = now if first is None else first
+            last = now + duration
+            silence += pending_silence
+            pending_silence = 0.0
+        clock += duration
+        await asyncio.sleep(max(clock - perf_counter(), 0))
+    return first, silence, last
+
+
+async def run(name, worker_class, ahead):
+    tts_module.TTS_AHEAD = ahead
+    bus = EventBus()
+    await bus.start()
+    tts = worker_class(bus, cache=False)
+    await tts.start()
+    tts.current_turn = 1
+    for text in SENTENCES:
+        await tts._handle_tts_request({"payload": {"text": text, "turn": 1}})
+    first, silence, end = await play(tts, until=30)
+    print(f"{name:<28} first audio {first:5.2f}s  silence {silence:5.2f}s  end {end:5.2f}s")
+    await tts.stop()
+
+
+async def abort():
+    bus = EventBus()
+    await bus.start()
+    tts = TTSWorker(bus, cache=False)
+    await tts.start()
+    tts.current_turn = 1
+    for text in SENTENCES:
+        await tts._handle_tts_request({"payload": {"text": text, "turn": 1}})
+    await asyncio.sleep(1.5)
+    await tts._handle_abort({"payload": {"turn": 1}})
+    await asyncio.sleep(0.01)
+    assert not tts.active, tts.active
+    played = []
+    for _ in range(300):
+        pkt, duration = tts.get_audio_packet()
+        played.append(bytes(pkt) != SILENCE)
+    assert not any(played)
+    print("abort: in-flight requests cancelled, nothing of the turn played after it")
+    await tts.stop()
+
+
+async def main():
+    delay = float(sys.argv[1]) if len(sys.argv) > 1 else 0.6
+    speed = float(sys.argv[2]) if len(sys.argv) > 2 else 1.0
+    runner = web.AppRunner(make_app(Latency(tts_delay=delay, tts_speed=speed)))
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", 8091).start()
+
+    await run("sequential + 1 s sleep (old)", OldTTSWorker, 1)
+    await run("pipelined, 1 ahead", TTSWorker, 1)
+    await run("pipelined, 3 ahead", TTSWorker, 3)
+    await abort()
+    await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
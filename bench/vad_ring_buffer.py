@@ -0,0 +1,63 @@
+"""
+Per-frame VAD buffering: torch.cat + re-slice (old) vs preallocated ring buffer (new).
+
+    python bench/vad_ring_buffer.py [frames]
+
+Feeds 20 ms 16 kHz int16 frames (320 samples), inference is replaced by a no-op,
+so only the buffering hot path is measured.
+"""
+
+import sys
+from time import perf_counter
+
+import numpy as np
+import torch
+from _common import SRC  # noqa: F401
+
+from utils.ring_buffer import ChunkRingBuffer
+
+CHUNK = 512
+FRAME = 320
+
+
+def old_path(frames):
+    buffer = torch.tensor([], dtype=torch.float32)
+    chunks = 0
+    for samples in frames:
+        frame_array = torch.tensor(samples, dtype=torch.float32) / 32_767
+        buffer = torch.cat([buffer, frame_array])
+        if buffer.size(0) >= CHUNK:
+            chunk = buffer[:CHUNK]
+            chunk.numpy()
+            buffer = buffer[CHUNK:]
+            chunks += 1
+    return chunks, buffer.size(0)
+
+
+def new_path(frames):
+    buffer = ChunkRingBuffer(CHUNK)
+    chunks = 0
+    for samples in frames:
+        buffer.write(samples)
+        while buffer.read_chunk() is not None:
+            chunks += 1
+    return chunks, len(buffer)
+
+
+def main(n=200_000):
+    rng = np.random.default_rng(0)
+    frames = [rng.integers(-3000, 3000, FRAME, dtype=np.int16) for _ in range(1000)]
+    frames = [frames[i % len(frames)] for i in range(n)]
+
+    for name, fn in (("torch.cat", old_path), ("ring buffer", new_path)):
+        start = perf_counter()
+        chunks, backlog = fn(frames)
+        elapsed = perf_counter() - start
+        print(
+            f"{name:>12}: {n / elapsed:>10,.0f} frames/s"
+            f"  chunks: {chunks}  backlog: {backlog} samples"
+        )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000)
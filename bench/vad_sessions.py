@@ -0,0 +1,57 @@
+"""
+Session setup latency and RSS as the number of VAD sessions grows.
+
+    python bench/vad_sessions.py [legacy|shared] [max_sessions]
+
+"legacy" loads a model per session inside the handler (old VADWorker behaviour),
+"shared" loads the process-wide model once and creates a VADStream per session.
+Run each mode in a separate process, RSS is per process.
+"""
+
+import asyncio
+import sys
+from time import perf_counter
+
+from _common import LoopLagProbe, percentile, rss_mb
+
+from silero_vad import load_silero_vad
+
+from utils.vad_model import load_vad_model
+
+
+async def main(mode="shared", max_sessions=50):
+    sessions = []
+    base_rss = rss_mb()
+
+    if mode == "shared":
+        start = perf_counter()
+        await asyncio.to_thread(load_vad_model)
+        print(f"boot load: {(perf_counter() - start) * 1000:.1f} ms")
+
+    probe = LoopLagProbe()
+    probe.start()
+
+    setup_times = []
+    print(f"{'sessions':>8} {'setup p50':>10} {'setup max':>10} {'loop lag':>10} {'rss MB':>8}")
+    for n in range(1, max_sessions + 1):
+        start = perf_counter()
+        if mode == "legacy":
+            sessions.append(load_silero_vad(onnx=False))
+        else:
+            sessions.append(load_vad_model().create_stream())
+        setup_times.append((perf_counter() - start) * 1000)
+        await asyncio.sleep(0.02)  # let the probe observe the stall
+
+        if n in (1, 5, 10, 20, 50, 100, max_sessions):
+            print(
+                f"{n:>8} {percentile(setup_times, 50):>8.2f}ms {max(setup_times):>8.2f}ms"
+                f" {probe.max_ms:>8.2f}ms {rss_mb() - base_rss:>8.1f}"
+            )
+
+    await probe.stop()
+
+
+if __name__ == "__main__":
+    mode = sys.argv[1] if len(sys.argv) > 1 else "shared"
+    max_sessions = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    asyncio.run(main(mode, max_sessions))
@@ -0,0 +1,287 @@
+"""
+Load test: N headless WebRTC sessions against rtc_server.py, ramped up step by step.
+
+    python loadtest/standins.py &
+    DEEPGRAM_URL=... OPENAI_BASE_URL=... python src/rtc_server.py &   (see standins.py)
+    python loadtest/harness.py [speech.wav] --ramp 1,2,4,8 --step 60
+
+Every session streams the WAV (or synthetic vowels) as its microphone in a loop,
+with `--pause` seconds of silence after each pass. Turn latency is the time from
+the end of the utterance to the first audible frame of the answer.
+
+For every step the harness prints turn latency percentiles, server CPU, RSS and
+event loop lag (from /metrics), and the loop lag of the harness itself.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import time
+from fractions import Fraction
+
+import av
+import numpy as np
+from _common import SRC  # noqa: F401
+from aiohttp import ClientSession
+from aiortc import MediaStreamTrack, RTCPeerConnection, RTCSessionDescription
+from aiortc.mediastreams import MediaStreamError
+from av import AudioFrame
+
+from utils.loop_monitor import LoopMonitor
+
+logger = logging.getLogger("harness")
+logger.setLevel(logging.INFO)
+
+RATE = 48000
+FRAME = 960  # 20 ms
+LEVEL = 0.02  # RMS of an audible frame
+
+
+def rms(samples: np.ndarray) -> float:
+    return float(np.sqrt(np.mean(samples.astype(np.float32) ** 2)) / 32767) if len(samples) else 0.0
+
+
+def load_wav(path) -> np.ndarray:
+    """
+    Any audio file -> 48 kHz mono int16, leading and trailing silence trimmed.
+    """
+    resampler = av.AudioResampler(format="s16", layout="mono", rate=RATE)
+    with av.open(path) as container:
+        chunks = [
+            f.to_ndarray()[0]
+            for frame in container.decode(audio=0)
+            for f in resampler.resample(frame)
+        ]
+    samples = np.concatenate(chunks)
+    loud = [i for i in range(0, len(samples) - FRAME, FRAME) if rms(samples[i : i + FRAME]) > LEVEL]
+    return samples[loud[0] : loud[-1] + FRAME] if loud else samples
+
+
+def synth_speech(syllables=12) -> np.ndarray:
+    """
+    Formant-synthesized vowels, close enough to speech for Silero VAD.
+    """
+    vowels = [
+        [(730, 90), (1090, 110), (2440, 170)],
+        [(270, 60), (2290, 100), (3010, 120)],
+        [(570, 80), (840, 90), (2410, 160)],
+        [(300, 60), (870, 90), (2240, 150)],
+    ]
+    n = int(0.2 * RATE)
+    t = np.arange(n)
+    out = []
+    for i in range(syllables):
+        f0 = 120 + 10 * (i % 3)
+        phase = np.cumsum(f0 * (1 + 0.05 * np.sin(2 * np.pi * 3 * t / RATE)) / RATE)
+        y = (np.diff(np.floor(phase), prepend=0) > 0).astype(np.float64)
+        for freq, bw in vowels[i % len(vowels)]:
+            # Two-pole resonator
+            r = np.exp(-np.pi * bw / RATE)
+            a1, a2 = -2 * r * np.cos(2 * np.pi * freq / RATE), r * r
+            z = np.zeros(n)
+            y1 = y2 = 0.0
+            for k in range(n):
+                y1, y2 = y[k] - a1 * y1 - a2 * y2, y1
+                z[k] = y1
+            y = z
+        out.append(y * np.hanning(n))
+    x = np.concatenate(out)
+    return (x / np.abs(x).max() * 0.5 * 32767).astype(np.int16)
+
+
+class MicTrack(MediaStreamTrack):
+    """
+    Loops speech + pause in real time, reports when every utterance ends.
+    """
+
+    kind = "audio"
+
+    def __init__(self, speech: np.ndarray, pause: float, on_speech_end):
+        super().__init__()
+        self.samples = np.concatenate([speech, np.zeros(int(pause * RATE), dtype=np.int16)])
+        self.speech_len = len(speech)
+        self.on_speech_end = on_speech_end
+        self.pos = 0
+        self._start = None
+
+    async def recv(self) -> AudioFrame:
+        if self._start is None:
+            self._start = time.time()
+        else:
+            wait = self._start + self.pos / RATE - time.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+        offset = self.pos % len(self.samples)
+        chunk = self.samples.take(range(offset, offset + FRAME), mode="wrap")
+        if offset < self.speech_len <= offset + FRAME:
+            self.on_speech_end(time.time() + (self.speech_len - offset) / RATE)
+
+        frame = AudioFrame.from_ndarray(chunk.reshape(1, -1), format="s16", layout="mono")
+        frame.sample_rate = RATE
+        frame.pts = self.pos
+        frame.time_base = Fraction(1, RATE)
+        self.pos += FRAME
+        return frame
+
+
+class Session:
+    def __init__(self, index, url, speech, pause):
+        self.index = index
+        self.url = url
+        self.pc = RTCPeerConnection()
+        self.mic = MicTrack(speech, pause, self.on_speech_end)
+
+        self.utterance_end: float | None = None
+        self.turns: list[tuple[float, float]] = []  # (utterance end, latency)
+        self.missed: list[float] = []  # utterance ends without an answer
+        self.setup_time = 0.0
+        self._listener: asyncio.Task | None = None
+
+    async def start(self, http: ClientSession):
+        start = time.time()
+        self.pc.createDataChannel("chat", ordered=True)
+        self.pc.addTrack(self.mic)
+
+        @self.pc.on("track")
+        def on_track(track):
+            self._listener = asyncio.create_task(self.listen(track))
+
+        await self.pc.setLocalDescription(await self.pc.createOffer())
+        offer = {"sdp": self.pc.localDescription.sdp, "type": self.pc.localDescription.type}
+        async with http.post(f"{self.url}/offer", json=offer) as resp:
+            answer = await resp.json()
+        await self.pc.setRemoteDescription(RTCSessionDescription(answer["sdp"], answer["type"]))
+        self.setup_time = time.time() - start
+
+    def on_speech_end(self, timestamp):
+        if self.utterance_end is not None:
+            self.missed.append(self.utterance_end)
+        self.utterance_end = timestamp
+
+    async def listen(self, track):
+        quiet = 0
+        while True:
+            try:
+                frame = await track.recv()
+            except MediaStreamError:
+                return
+            if rms(frame.to_ndarray()[0]) < LEVEL:
+                quiet += 1
+                continue
+
+            # An answer starts after silence, not in the tail of the previous one
+            if self.utterance_end is not None and quiet >= 5:
+                latency = time.time() - self.utterance_end
+                if latency > 0:
+                    self.turns.append((self.utterance_end, latency))
+                    self.utterance_end = None
+            quiet = 0
+
+    async def close(self):
+        await self.pc.close()
+        if self._listener:
+            self._listener.cancel()
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+
+async def server_metrics(http: ClientSession, url) -> list[dict]:
+    async with http.get(f"{url}/metrics") as resp:
+        data = await resp.json()
+    return [w for w in data.get("workers", [data]) if "cpu" in w]
+
+
+async def run(args):
+    speech = load_wav(args.wav) if args.wav else synth_speech()
+    logger.info(f"Utterance {len(speech) / RATE:.2f}s, pause {args.pause}s")
+
+    monitor = LoopMonitor(interval=0.01)
+    monitor.start()
+    sessions: list[Session] = []
+    results = []
+
+    header = (
+        f"{'N':>4} {'turns':>5} {'miss':>4} {'p50':>6} {'p95':>6} {'p99':>6} {'setup':>6}"
+        f" {'cpu%':>6} {'rss_mb':>7} {'lag99':>6} {'lagmax':>7} {'h_lag99':>7}"
+    )
+    print(header)
+
+    async with ClientSession() as http:
+        try:
+            for target in args.ramp:
+                while len(sessions) < target:
+                    session = Session(len(sessions), args.url, speech, args.pause)
+                    await session.start(http)
+                    sessions.append(session)
+                    await asyncio.sleep(args.stagger)
+
+                before = await server_metrics(http, args.url)
+                step_start = time.time()
+                monitor.lags.clear()
+                await asyncio.sleep(args.step)
+                after = await server_metrics(http, args.url)
+                step_end = time.time()
+
+                latencies = [
+                    latency
+                    for s in sessions
+                    for end, latency in s.turns
+                    if step_start <= end < step_end
+                ]
+                missed = sum(step_start <= end < step_end for s in sessions for end in s.missed)
+                cpu = sum(w["cpu"] for w in after) - sum(w["cpu"] for w in before)
+                row = {
+                    "sessions": len(sessions),
+                    "turns": len(latencies),
+                    "missed": missed,
+                    "p50": percentile(latencies, 50) * 1000,
+                    "p95": percentile(latencies, 95) * 1000,
+                    "p99": percentile(latencies, 99) * 1000,
+                    "setup": percentile([s.setup_time for s in sessions], 50) * 1000,
+                    "cpu": cpu / (step_end - step_start) * 100,
+                    "rss_mb": sum(w["rss_mb"] for w in after),
+                    "lag_p99": max(w["loop_lag_ms"]["p99"] for w in after),
+                    "lag_max": max(w["loop_lag_ms"]["max"] for w in after),
+                    "harness_lag_p99": monitor.stats()["p99"],
+                }
+                results.append(row)
+                print(
+                    f"{row['sessions']:>4} {row['turns']:>5} {row['missed']:>4}"
+                    f" {row['p50']:>6.0f} {row['p95']:>6.0f} {row['p99']:>6.0f} {row['setup']:>6.0f}"
+                    f" {row['cpu']:>6.1f} {row['rss_mb']:>7.1f} {row['lag_p99']:>6.1f}"
+                    f" {row['lag_max']:>7.1f} {row['harness_lag_p99']:>7.1f}"
+                )
+        finally:
+            await asyncio.gather(*(s.close() for s in sessions), return_exceptions=True)
+            await monitor.stop()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Multi-session load test for rtc_server.py")
+    parser.add_argument("wav", nargs="?", help="Utterance to speak (default: synthetic vowels)")
+    parser.add_argument("--url", default="http://127.0.0.1:8080")
+    parser.add_argument(
+        "--ramp",
+        type=lambda s: [int(n) for n in s.split(",")],
+        default=[1, 2, 4, 8],
+        help="Session counts of the steps (default: 1,2,4,8)",
+    )
+    parser.add_argument("--step", type=float, default=60, help="Step duration, s (default: 60)")
+    parser.add_argument("--pause", type=float, default=12, help="Silence after each utterance, s")
+    parser.add_argument("--stagger", type=float, default=0.5, help="Delay between new sessions, s")
+    parser.add_argument("--json", help="Write the results to this file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    asyncio.run(run(args))
@@ -0,0 +1,301 @@
+"""
+Local stand-ins for the speech and LLM providers, for load tests without API costs or limits.
+
+    python loadtest/standins.py [--port 8090] [--stt-delay 0.3] [--llm-delay 0.4] ...
+
+    DEEPGRAM_URL=http://127.0.0.1:8090 OPENAI_BASE_URL=http://127.0.0.1:8090/v1 \\
+    DEEPGRAM_API_KEY=standin OPENAI_API_KEY=standin python src/rtc_server.py
+
+Deepgram live, ws /v1/listen
+    Accepted `stt_connect` after the request. Energy VAD over the received linear16
+    or Ogg/Opus audio. After every utterance a final result (speech_final) with
+    a canned transcript is sent, `stt_delay` later.
+OpenAI chat completions, POST /v1/chat/completions
+    A canned reply streamed as SSE chunks: `llm_delay` to the first token, then
+    `llm_rate` tokens per second.
+OpenAI audio speech, POST /v1/audio/speech
+    Ogg/Opus tone as long as the text would take to speak, first byte after `tts_delay`,
+    then streamed `tts_speed` times faster than real time.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from itertools import count
+
+import numpy as np
+from _common import SRC  # noqa: F401
+from aiohttp import WSMsgType, web
+from av import AudioFrame, codec
+from av.packet import Packet
+
+from utils.ogg_processor import OggProcessor, OggWriter
+
+logger = logging.getLogger("standins")
+logger.setLevel(logging.INFO)
+
+TRANSCRIPTS = (
+    "Hello, can you hear me?",
+    "I would like to plan my day.",
+    "What should I start with?",
+    "Okay, that sounds good.",
+)
+
+REPLY = (
+    "Sure, let us start with the most important task of the day. "
+    "Write it down, split it into small steps and do the first one right now. "
+    "Then take a short break."
+)
+
+
+@dataclass
+class Latency:
+    stt_connect: float = 0.3  # s, websocket connect (TLS and handshake)
+    stt_delay: float = 0.3  # s, utterance end -> final result
+    llm_delay: float = 0.4  # s, request -> first token
+    llm_rate: float = 50.0  # tokens/s
+    tts_delay: float = 0.2  # s, request -> first byte
+    tts_speed: float = 4.0  # x real time
+    tts_char_time: float = 0.06  # s of speech per character
+
+
+# Deepgram live
+
+
+class LevelMeter:
+    """
+    RMS levels of 20 ms blocks of the uplink audio, linear16 or Ogg/Opus.
+    """
+
+    block = 0.02
+
+    def __init__(self, encoding, sample_rate, channels):
+        self.encoding = encoding
+        self.sample_rate = sample_rate if encoding == "linear16" else 48000
+        self.channels = channels if encoding == "linear16" else 1
+        self.pcm = np.empty(0, dtype=np.int16)
+
+        if encoding != "linear16":
+            # Containerized Opus (the "opus" uplink)
+            self.decoder = codec.CodecContext.create("opus", "r")
+            self.decoder.sample_rate = 48000
+            self.decoder.layout = "mono"
+            self.segments = []
+            self.ogg = OggProcessor(lambda segment, meta: self.segments.append(segment))
+
+    def feed(self, data: bytes) -> list[float]:
+        if self.encoding == "linear16":
+            samples = np.frombuffer(data, dtype=np.int16)[:: self.channels]
+        else:
+            self.ogg.addBuffer(data)
+            decoded = [
+                f.to_ndarray().reshape(-1)
+                for segment in self.segments
+                for f in self.decoder.decode(Packet(segment))
+            ]
+            self.segments.clear()
+            if not decoded:
+                return []
+            samples = (np.concatenate(decoded) * 32767).astype(np.int16)
+
+        self.pcm = np.concatenate([self.pcm, samples])
+        size = int(self.sample_rate * self.block)
+        n = len(self.pcm) // size
+        blocks = self.pcm[: n * size].reshape(n, size).astype(np.float32)
+        self.pcm = self.pcm[n * size :]
+        return list(np.sqrt(np.mean(blocks**2, axis=1)) / 32767)
+
+
+def result_message(text, start, duration, request_id):
+    return {
+        "type": "Results",
+        "channel_index": [0, 1],
+        "duration": duration,
+        "start": start,
+        "is_final": True,
+        "speech_final": True,
+        "channel": {"alternatives": [{"transcript": text, "confidence": 0.98, "words": []}]},
+        "metadata": {
+            "request_id": request_id,
+            "model_info": {"name": "standin", "version": "0", "arch": "standin"},
+            "model_uuid": request_id,
+        },
+    }
+
+
+async def listen(request):
+    cfg: Latency = request.app["latency"]
+    ws = web.WebSocketResponse()
+    await asyncio.sleep(cfg.stt_connect)
+    await ws.prepare(request)
+
+    query = request.query
+    meter = LevelMeter(
+        query.get("encoding"), int(query.get("sample_rate", 48000)), int(query.get("channels", 1))
+    )
+    endpointing = max(int(query.get("endpointing", 10)) / 1000, 0.3)
+    request_id = f"standin-{id(ws):x}"
+    utterances = count()
+
+    async def send_final(text, start, duration):
+        await asyncio.sleep(cfg.stt_delay)
+        if not ws.closed:
+            await ws.send_json(result_message(text, start, duration, request_id))
+
+    position = speech = silence = 0.0
+    speech_start = 0.0
+    tasks = set()
+    async for msg in ws:
+        if msg.type == WSMsgType.BINARY:
+            for level in meter.feed(msg.data):
+                position += meter.block
+                if level > 0.01:
+                    if not speech:
+                        speech_start = position
+                    speech += meter.block
+                    silence = 0.0
+                    continue
+                silence += meter.block
+                if speech and silence >= endpointing:
+                    if speech >= 0.2:
+                        text = TRANSCRIPTS[next(utterances) % len(TRANSCRIPTS)]
+                        task = asyncio.create_task(
+                            send_final(text, speech_start, position - speech_start)
+                        )
+                        tasks.add(task)
+                        task.add_done_callback(tasks.discard)
+                    speech = 0.0
+
+        elif msg.type == WSMsgType.TEXT:
+            if json.loads(msg.data).get("type") == "CloseStream":
+                await ws.send_json(
+                    {
+                        "type": "Metadata",
+                        "request_id": request_id,
+                        "duration": position,
+                        "channels": 1,
+                    }
+                )
+                break
+
+    await ws.close()
+    return ws
+
+
+# OpenAI
+
+
+async def chat_completions(request):
+    cfg: Latency = request.app["latency"]
+    body = await request.json()
+
+    resp = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+    await resp.prepare(request)
+    await asyncio.sleep(cfg.llm_delay)
+
+    chunk_id = f"chatcmpl-standin{id(resp):x}"
+
+    def event(delta, finish_reason=None):
+        chunk = {
+            "id": chunk_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": body.get("model", "standin"),
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+        return f"data: {json.dumps(chunk)}\n\n".encode()
+
+    words = REPLY.split(" ")
+    for i, word in enumerate(words):
+        token = word if i == 0 else " " + word
+        delta = {"role": "assistant", "content": token} if i == 0 else {"content": token}
+        await resp.write(event(delta))
+        await asyncio.sleep(1 / cfg.llm_rate)
+
+    await resp.write(event({}, "stop"))
+    await resp.write(b"data: [DONE]\n\n")
+    await resp.write_eof()
+    return resp
+
+
+@lru_cache(maxsize=64)
+def tone_ogg(duration: float, sample_rate=24000) -> bytes:
+    """
+    Ogg/Opus 220 Hz tone, 24 kHz mono like the OpenAI speech output.
+    """
+    encoder = codec.CodecContext.create("libopus", "w")
+    encoder.sample_rate = sample_rate
+    encoder.layout = "mono"
+    encoder.format = "s16"
+    # Packets must stay under 255 bytes: OggProcessor takes every lacing value as a packet
+    encoder.bit_rate = 32000
+    encoder.open()
+
+    ogg = OggWriter(bytes(encoder.extradata))
+    data = bytearray(ogg.headerPages())
+
+    frame_size = sample_rate // 50
+    frames = max(1, int(duration * 50))
+    t = np.arange(frames * frame_size) / sample_rate
+    tone = (np.sin(2 * np.pi * 220 * t) * 10000).astype(np.int16)
+
+    packets = []
+    for i in range(frames + 1):
+        frame = None
+        if i < frames:
+            pcm = tone[i * frame_size : (i + 1) * frame_size].reshape(1, -1)
+            frame = AudioFrame.from_ndarray(pcm, format="s16", layout="mono")
+            frame.sample_rate = sample_rate
+            frame.pts = i * frame_size
+        packets += [bytes(p) for p in encoder.encode(frame)]
+        if len(packets) >= 5 or (frame is None and packets):
+            data += ogg.addPage(packets, len(packets) * 960)
+            packets = []
+    return bytes(data)
+
+
+async def speech(request):
+    cfg: Latency = request.app["latency"]
+    body = await request.json()
+
+    duration = round(min(len(body.get("input", "")) * cfg.tts_char_time, 20.0), 1)
+    data = tone_ogg(duration)
+
+    await asyncio.sleep(cfg.tts_delay)
+    resp = web.StreamResponse(headers={"Content-Type": "audio/ogg"})
+    await resp.prepare(request)
+
+    chunk_size = 4096
+    interval = chunk_size / (len(data) / duration * cfg.tts_speed)
+    for i in range(0, len(data), chunk_size):
+        await resp.write(data[i : i + chunk_size])
+        await asyncio.sleep(interval)
+    await resp.write_eof()
+    return resp
+
+
+def make_app(latency: Latency) -> web.Application:
+    app = web.Application()
+    app["latency"] = latency
+    app.router.add_get("/v1/listen", listen)
+    app.router.add_post("/v1/chat/completions", chat_completions)
+    app.router.add_post("/v1/audio/speech", speech)
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Provider stand-ins for load tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    for name, value in vars(Latency()).items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=float, default=value)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    latency = Latency(**{name: getattr(args, name) for name in vars(Latency())})
+    logger.info(f"Stand-ins on {args.host}:{args.port}, {latency}")
+    web.run_app(make_app(latency), host=args.host, port=args.port, access_log=None)
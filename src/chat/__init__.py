@@ -1,9 +1,11 @@
 from .context import ChatContext
 from .message import ChatMessage, ChatRole, ChatContent
+from .summarizer import Summarizer
 
 __all__ = [
     "ChatContext",
     "ChatMessage",
     "ChatRole",
     "ChatContent",
+    "Summarizer",
 ]
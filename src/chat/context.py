@@ -1,8 +1,9 @@
 import logging
-from dataclasses import asdict, dataclass, field
+from dataclasses import dataclass, field
 from typing import Self
 
 from .message import ChatContent, ChatMessage, ChatRole
+from .tokens import count_tokens
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -18,6 +19,21 @@ class ChatContext:
     """
 
     messages: list[ChatMessage] = field(default_factory=list)
+    # Prompt tokens of the context sent, None for the whole history (see chat/summarizer.py)
+    token_budget: int | None = None
+
+    # Rolling summary, sent instead of the messages before `summarized`
+    summary: ChatMessage | None = field(default=None, init=False)
+    summarized: int = field(default=0, init=False)
+    # Changed with every change of the context sent: a request is for this version only
+    version: int = field(default=0, init=False)
+    _summary_tokens: int = field(default=0, init=False, repr=False)
+
+    # Wire dicts of the messages in the context with their tokens,
+    # and the context length before every message
+    _wire: list[dict] = field(default_factory=list, init=False, repr=False)
+    _tokens: list[int] = field(default_factory=list, init=False, repr=False)
+    _offsets: list[int] = field(default_factory=list, init=False, repr=False)
 
     def append(
         self,
@@ -26,29 +42,118 @@ class ChatContext:
         role: ChatRole = "system",
         tool_calls: list | None = None,
         tool_call_id: str | None = None,
+        turn: int | None = None,
     ) -> Self:
         content = ChatContent(content)
         message = ChatMessage(
             content=content,
             role=role,
+            turn=turn,
             tool_calls=tool_calls,
             tool_call_id=tool_call_id,
         )
+        return self.add(message)
+
+    def add(self, message: ChatMessage) -> Self:
         self.messages.append(message)
+        self.version += 1
         return self
 
     @property
-    def context(self):
-        return [asdict(m) for m in self.messages if not m.interrupted_early]
+    def context(self) -> list[dict]:
+        """
+        Wire dicts of the messages. Only the messages appended since the last call are
+        serialized, the list is new every time but the dicts are shared (read-only).
+
+        With a token budget: the system prompt, the summary and the recent messages.
+        Turns beyond the budget are dropped if the summary is behind.
+        """
+        self._sync()
+        if self.summary is None and self.token_budget is None:
+            return list(self._wire)
+
+        head = self._offset(self.head())
+        prefix = self._wire[:head]
+        start = head
+        if self.summary:
+            prefix.append(self.summary.to_dict())
+            start = max(head, self._offset(self.summarized))
+        if self.token_budget:
+            budget = self.token_budget - sum(self._tokens[:head]) - self._summary_tokens
+            start = self._fit(start, budget)
+        return prefix + self._wire[start:]
+
+    def head(self) -> int:
+        """
+        Number of system messages at the start (the system prompt), always sent.
+        """
+        for index, message in enumerate(self.messages):
+            if message.role != "system":
+                return index
+        return len(self.messages)
+
+    def tokens(self, start: int = 0, end: int | None = None) -> int:
+        """
+        Prompt tokens of messages[start:end].
+        """
+        self._sync()
+        end = len(self.messages) if end is None else end
+        return sum(self._tokens[self._offset(start) : self._offset(end)])
+
+    def set_summary(self, summary: ChatMessage, upto: int) -> None:
+        """
+        Swap in a summary of the messages before `upto`, sent from now on instead of them.
+        """
+        self.summary, self.summarized = summary, upto
+        self._summary_tokens = count_tokens(summary.to_dict())
+        self.version += 1
+
+    def invalidate(self, index: int = 0) -> None:
+        """
+        Serialize the messages from `index` on again, after they were changed in place.
+        """
+        self.version += 1
+        if index < len(self._offsets):
+            del self._wire[self._offsets[index] :]
+            del self._tokens[self._offsets[index] :]
+            del self._offsets[index:]
+
+    def _sync(self):
+        for message in self.messages[len(self._offsets) :]:
+            self._offsets.append(len(self._wire))
+            if not message.interrupted_early:
+                wire = message.to_dict()
+                self._wire.append(wire)
+                self._tokens.append(count_tokens(wire))
+
+    def _offset(self, index: int) -> int:
+        return self._offsets[index] if index < len(self._offsets) else len(self._wire)
+
+    def _fit(self, start: int, budget: int) -> int:
+        """
+        First wire message to send so that the rest fits in the budget, at least the last one.
+        """
+        end = len(self._wire)
+        cut, total = end, 0
+        while cut > start and total + self._tokens[cut - 1] <= budget:
+            cut -= 1
+            total += self._tokens[cut]
+        cut = min(cut, max(end - 1, start))
+        # A tool result is sent only with its tool call
+        while cut < end - 1 and self._wire[cut]["role"] == "tool":
+            cut += 1
+        return cut
 
     def interrupt(self, turn: int, time: float) -> None:
         """
         Marks the last agent message as interrupted, saves time played (ms);
         """
-        for message in self.messages[-5:]:
-            if message.turn == turn:
+        start = max(len(self.messages) - 5, 0)
+        for index, message in enumerate(self.messages[start:], start):
+            if message.turn == turn and message.role == "assistant":
                 message.interruption_time = int(time * 1000)  # convert to ms
-                logger.error("INTERRUPTED:", message)
+                self.invalidate(index)
+                logger.error("INTERRUPTED: %s", message)
 
     # def copy(self) -> Self:
     #     copied_chat_ctx = ChatContext(messages=[m.copy() for m in self.messages])
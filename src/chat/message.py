@@ -1,5 +1,4 @@
 import json
-from dataclasses import asdict, dataclass, field
 from datetime import datetime
 from typing import Literal, Union
 
@@ -8,21 +7,71 @@ ChatRole = Literal["system", "user", "assistant", "tool"]
 ChatContent = Union[str]
 
 
-@dataclass
 class ChatMessage:
-    ts: int = field(default_factory=lambda: int(datetime.now().timestamp() * 1000))
-    role: ChatRole | None = None
-    name: str | None = None
-    turn: int | None = None
-    content: ChatContent | list[ChatContent] | None = None
-    tool_call_id: str | None = None
-    tool_calls: list | None = None
-    interruption_time: int | None = None
+    """
+    One chat message. Its wire dict is built once and cached until a field changes.
+    """
+
+    __slots__ = (
+        "ts",
+        "role",
+        "name",
+        "turn",
+        "content",
+        "tool_call_id",
+        "tool_calls",
+        "interruption_time",
+        "_wire",
+    )
+    fields = __slots__[:-1]
+
+    def __init__(
+        self,
+        ts: int | None = None,
+        role: ChatRole | None = None,
+        name: str | None = None,
+        turn: int | None = None,
+        content: ChatContent | list[ChatContent] | None = None,
+        tool_call_id: str | None = None,
+        tool_calls: list | None = None,
+        interruption_time: int | None = None,
+    ):
+        self.ts = int(datetime.now().timestamp() * 1000) if ts is None else ts
+        self.role = role
+        self.name = name
+        self.turn = turn
+        self.content = content
+        self.tool_call_id = tool_call_id
+        self.tool_calls = tool_calls
+        self.interruption_time = interruption_time
+
+    def __setattr__(self, key, value):
+        object.__setattr__(self, key, value)
+        if key != "_wire":
+            object.__setattr__(self, "_wire", None)
+
+    def __repr__(self) -> str:
+        args = ", ".join(f"{f}={getattr(self, f)!r}" for f in self.fields)
+        return f"ChatMessage({args})"
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, ChatMessage):
+            return NotImplemented
+        return all(getattr(self, f) == getattr(other, f) for f in self.fields)
 
     @property
     def interrupted_early(self) -> bool:
         return self.interruption_time and self.interruption_time < 3000
 
+    def to_dict(self) -> dict:
+        """
+        Wire dict, shared by every context it is in: read-only.
+        Lists in the fields are not copied, replace them instead of mutating in place.
+        """
+        if self._wire is None:
+            self._wire = {f: getattr(self, f) for f in self.fields}
+        return self._wire
+
     def to_json(self) -> str:
-        """Convert the dataclass instance to a JSON string."""
-        return json.dumps(asdict(self), ensure_ascii=False, default=str)
+        """Convert the message to a JSON string."""
+        return json.dumps(self.to_dict(), ensure_ascii=False, default=str)
@@ -0,0 +1,284 @@
+"""
+Indexed conversation store: every message of every call in SQLite, for resuming sessions.
+
+    python -m chat.store import ../db.jsonl [more.jsonl.gz ...]
+
+imports the flat conversation logs (utils/conversation_log.py), written before the store
+or alongside it: the messages already in the store are skipped.
+"""
+
+import argparse
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import os
+import secrets
+import sqlite3
+import threading
+from time import monotonic, time
+
+from utils.jsonl_writer import BatchWriter
+
+from .message import ChatMessage
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+
+CONVERSATION_DB = os.getenv("CONVERSATION_DB", os.path.join(ROOT, "db.sqlite3"))
+# Messages loaded into the context of a resumed session
+RESUME_MESSAGES = int(os.getenv("RESUME_MESSAGES", "50"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    session TEXT NOT NULL,
+    user TEXT,
+    turn INTEGER,
+    ts INTEGER,
+    role TEXT,
+    message TEXT NOT NULL,
+    digest TEXT
+);
+CREATE INDEX IF NOT EXISTS messages_session ON messages (session, id);
+CREATE INDEX IF NOT EXISTS messages_session_turn ON messages (session, turn);
+CREATE INDEX IF NOT EXISTS messages_ts ON messages (ts);
+-- Resume tokens by their sha256, the tokens themselves are only known to the clients
+CREATE TABLE IF NOT EXISTS sessions (
+    token TEXT PRIMARY KEY,
+    session TEXT NOT NULL,
+    user TEXT,
+    ts INTEGER
+);
+"""
+
+# A message is stored once per session, however many times it is saved or imported
+DIGEST_INDEX = "CREATE UNIQUE INDEX IF NOT EXISTS messages_digest ON messages (session, digest)"
+
+INSERT = (
+    "INSERT OR IGNORE INTO messages (session, user, turn, ts, role, message, digest)"
+    " VALUES (?, ?, ?, ?, ?, ?, ?)"
+)
+
+
+def _token_hash(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def connect(path) -> sqlite3.Connection:
+    db = sqlite3.connect(path, timeout=10)
+    # Readers do not block the writer, pre-fork workers share the file
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    return db
+
+
+def create_schema(db: sqlite3.Connection):
+    db.executescript(SCHEMA)
+    # Stores created before the digests: add them, and drop the messages imported twice
+    if "digest" not in {row[1] for row in db.execute("PRAGMA table_info(messages)")}:
+        db.create_function("sha256", 1, lambda text: hashlib.sha256(text.encode()).hexdigest())
+        with db:
+            db.execute("ALTER TABLE messages ADD COLUMN digest TEXT")
+            db.execute("UPDATE messages SET digest = sha256(message)")
+            db.execute(
+                "DELETE FROM messages WHERE id NOT IN"
+                " (SELECT min(id) FROM messages GROUP BY session, digest)"
+            )
+    db.execute(DIGEST_INDEX)
+
+
+def message_row(session_id: str, user: str | None, message: dict) -> tuple:
+    """
+    The row of a message wire dict, its digest is that of its JSON (the timestamp included).
+    """
+    data = json.dumps(message, ensure_ascii=False, default=str)
+    digest = hashlib.sha256(data.encode()).hexdigest()
+    return (session_id, user, message["turn"], message["ts"], message["role"], data, digest)
+
+
+class _MessageWriter(BatchWriter):
+    """
+    Inserts the saved messages, one transaction per batch.
+    """
+
+    def __init__(self, path, flush_size, flush_interval):
+        self.path = path
+        self._db: sqlite3.Connection | None = None
+        super().__init__(flush_size, flush_interval, name="chat_store")
+
+    def _encode(self, record) -> tuple:
+        return message_row(*record)
+
+    def _write_batch(self, rows):
+        if self._db is None:
+            self._db = connect(self.path)  # used by the thread only
+        with self._db:
+            self._db.executemany(INSERT, rows)
+
+    def _closed(self):
+        if self._db is not None:
+            self._db.close()
+
+
+class ConversationStore:
+    """
+    Messages by session, user, turn and time.
+
+    save() only queues the message: a BatchWriter thread inserts them in batches, one
+    transaction per `flush_size` messages or `flush_interval` seconds. The reads are
+    indexed lookups, blocking, run them with asyncio.to_thread() on the loop.
+    """
+
+    def __init__(self, path=CONVERSATION_DB, flush_size=256, flush_interval=0.5):
+        self.path = path
+
+        db = connect(path)
+        create_schema(db)
+        db.close()
+
+        self._local = threading.local()
+        self._writer = _MessageWriter(path, flush_size, flush_interval)
+
+    def save(self, session_id: str, message: ChatMessage, user: str | None = None) -> None:
+        # The wire dict is read-only, serialized by the thread
+        self._writer.write((session_id, user, message.to_dict()))
+
+    def create_session(self, session_id: str, user: str | None = None) -> str:
+        """
+        Issue the resume token of a new session, only its hash is stored. Blocking.
+        """
+        token = secrets.token_urlsafe(32)
+        with self._db as db:
+            db.execute(
+                "INSERT INTO sessions (token, session, user, ts) VALUES (?, ?, ?, ?)",
+                (_token_hash(token), session_id, user, int(time() * 1000)),
+            )
+        return token
+
+    def resume_session(self, token: str) -> tuple[str, str | None] | None:
+        """
+        (session, user) the resume token was issued for, None for an unknown token. Blocking.
+        """
+        return self._db.execute(
+            "SELECT session, user FROM sessions WHERE token = ?", (_token_hash(token),)
+        ).fetchone()
+
+    def load(self, session_id: str, limit: int = RESUME_MESSAGES) -> list[ChatMessage]:
+        """
+        The last `limit` messages of the session, oldest first, not starting with tool results.
+        """
+        rows = self._db.execute(
+            "SELECT message FROM messages WHERE session = ? ORDER BY id DESC LIMIT ?",
+            (session_id, limit),
+        ).fetchall()
+        messages = [ChatMessage(**json.loads(row[0])) for row in reversed(rows)]
+        while messages and messages[0].role == "tool":
+            messages.pop(0)
+        return messages
+
+    def stats(self) -> dict:
+        return self._writer.stats()
+
+    def close(self) -> None:
+        """
+        Insert everything queued and stop the thread. Blocking.
+        """
+        self._writer.close()
+
+    @property
+    def _db(self) -> sqlite3.Connection:
+        # A read connection per thread (asyncio.to_thread runs in a pool)
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = self._local.db = connect(self.path)
+        return db
+
+
+def import_jsonl(db: sqlite3.Connection, path) -> int:
+    """
+    Insert the messages of a conversation log (.jsonl or .jsonl.gz) that are not in the
+    store yet, returns their number.
+
+    Records written before session ids (plain db.jsonl) are split into sessions where
+    the turn numbering starts over.
+    """
+    opener = gzip.open if path.endswith(".gz") else open
+    legacy = f"legacy-{os.path.basename(path)}"
+    sessions, previous_turn, rows = 0, None, []
+    with opener(path, "rt", encoding="utf-8") as file:
+        for line in file:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if "role" not in record:
+                continue
+            session_id = record.pop("session", None)
+            user = record.pop("user", None)
+            if session_id is None:
+                turn = record.get("turn")
+                if not sessions or (turn is not None and turn < (previous_turn or 0)):
+                    sessions += 1
+                previous_turn = turn if turn is not None else previous_turn
+                session_id = f"{legacy}-{sessions}"
+            message = ChatMessage(**{k: v for k, v in record.items() if k in ChatMessage.fields})
+            rows.append(message_row(session_id, user, message.to_dict()))
+    with db:
+        before = db.total_changes
+        db.executemany(INSERT, rows)
+        return db.total_changes - before
+
+
+_store: ConversationStore | None = None
+
+
+def start_conversation_store(path=CONVERSATION_DB) -> ConversationStore:
+    """
+    Process-wide store, opened after the fork in pre-fork mode (workers share the file).
+    """
+    global _store
+    if _store is None:
+        _store = ConversationStore(path)
+    return _store
+
+
+def get_conversation_store() -> ConversationStore:
+    """
+    The shared store, opened on first use if not started.
+    """
+    return start_conversation_store()
+
+
+def conversation_store_stats() -> dict | None:
+    return _store.stats() if _store else None
+
+
+async def stop_conversation_store():
+    global _store
+    if _store is not None:
+        await asyncio.to_thread(_store.close)
+        _store = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import conversation logs into the store")
+    commands = parser.add_subparsers(dest="command", required=True)
+    command = commands.add_parser("import", help="Import .jsonl or .jsonl.gz conversation logs")
+    command.add_argument("paths", nargs="+")
+    command.add_argument("--db", default=CONVERSATION_DB)
+    args = parser.parse_args()
+
+    db = connect(args.db)
+    create_schema(db)
+    for path in args.paths:
+        start = monotonic()
+        count = import_jsonl(db, path)
+        print(f"{path}: {count} messages in {monotonic() - start:.2f}s")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+import asyncio
+import json
+import logging
+import os
+from time import monotonic
+
+from prompts import SUMMARY_PROMPT
+from utils.openai_client import get_openai_client
+
+from .context import ChatContext
+from .message import ChatMessage
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+MODEL = "gpt-4o-mini"
+# Prompt tokens of the context sent to the LLM, 0 sends the whole history
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "6000"))
+
+# Summarize when the messages after the summary take this share of the budget,
+# keep this share of the budget of the most recent messages verbatim
+TRIGGER = 0.6
+KEEP = 0.3
+KEEP_MESSAGES = 4
+
+
+def transcript_line(message: ChatMessage) -> str:
+    if message.tool_calls:
+        calls = ", ".join(
+            f"{c['function']['name']}({c['function']['arguments']})" for c in message.tool_calls
+        )
+        return f"assistant called {calls}"
+    content = message.content
+    if not isinstance(content, str):
+        content = json.dumps(content, ensure_ascii=False)
+    return f"{message.role}: {content}"
+
+
+class Summarizer:
+    """
+    Rolling summary of the older turns of a ChatContext, made in the background.
+
+    update() is called after a turn and starts a summary when the history has grown.
+    Requests never wait for it: the summary is swapped in when it is ready, until
+    then the context is cut to the budget.
+    """
+
+    def __init__(self, chat: ChatContext, model=MODEL):
+        self.chat = chat
+        self.model = model
+        self.client = get_openai_client()
+        self.summaries = 0
+        self.failures = 0
+        self._task: asyncio.Task | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def update(self):
+        budget = self.chat.token_budget
+        if not budget or self.running:
+            return
+
+        start = max(self.chat.summarized, self.chat.head())
+        end = len(self.chat.messages)
+        if self.chat.tokens(start, end) < budget * TRIGGER:
+            return
+
+        # The most recent messages stay verbatim
+        cut, kept = end, 0
+        while cut > start and kept + self.chat.tokens(cut - 1, cut) <= budget * KEEP:
+            cut -= 1
+            kept += self.chat.tokens(cut, cut + 1)
+        cut = min(cut, end - KEEP_MESSAGES)
+        # Tool results stay with their calls
+        while start < cut < end and self.chat.messages[cut].role == "tool":
+            cut -= 1
+        if cut <= start:
+            return
+
+        self._task = asyncio.create_task(self._summarize(start, cut), name="summarizer")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _summarize(self, start: int, cut: int):
+        began = monotonic()
+        previous = self.chat.summary
+        lines = [
+            transcript_line(m) for m in self.chat.messages[start:cut] if not m.interrupted_early
+        ]
+        text = "\n".join(lines)
+        if previous:
+            text = f"Earlier summary:\n{previous.content}\n\nConversation:\n{text}"
+
+        try:
+            response = await self.client.chat.completions.create(
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": SUMMARY_PROMPT},
+                    {"role": "user", "content": text},
+                ],
+                temperature=0.2,
+                max_tokens=max(self.chat.token_budget // 8, 100),
+            )
+            summary = response.choices[0].message.content.strip()
+        except Exception as e:
+            self.failures += 1
+            logger.warning(f"Summary failed: {e!r}")
+            return
+
+        saved = self.chat.tokens(start, cut)
+        self.chat.set_summary(
+            ChatMessage(role="system", content=f"Summary of the earlier conversation: {summary}"),
+            cut,
+        )
+        self.summaries += 1
+        logger.info(
+            f"Summarized messages {start}-{cut} ({saved} tokens) in {monotonic() - began:.2f}s"
+        )
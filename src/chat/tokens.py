@@ -0,0 +1,33 @@
+import json
+
+try:
+    import tiktoken
+except ImportError:  # optional, token counts are estimated without it
+    tiktoken = None
+
+# Role, separators and the reply priming of every message
+MESSAGE_OVERHEAD = 4
+
+_encoding = None
+
+
+def _encode_len(text: str) -> int:
+    global _encoding
+    if tiktoken is None:
+        return (len(text) + 3) // 4
+    if _encoding is None:
+        # The gpt-4o family
+        _encoding = tiktoken.get_encoding("o200k_base")
+    return len(_encoding.encode(text, disallowed_special=()))
+
+
+def count_tokens(message: dict) -> int:
+    """
+    Prompt tokens of a wire message: exact with tiktoken, else about len / 4.
+    """
+    content = message.get("content") or ""
+    if not isinstance(content, str):
+        content = json.dumps(content, ensure_ascii=False)
+    if message.get("tool_calls"):
+        content += json.dumps(message["tool_calls"], ensure_ascii=False)
+    return _encode_len(content) + MESSAGE_OVERHEAD
@@ -8,18 +8,35 @@ from time import monotonic
 
 from termcolor import colored, cprint
 
-from chat import ChatContext, ChatMessage
+from chat import ChatContext, ChatMessage, Summarizer
+from chat.store import RESUME_MESSAGES, get_conversation_store
+from chat.summarizer import CONTEXT_TOKEN_BUDGET
 from prompts import SP
 from tools import ToolsHandler
+from utils.conversation_log import get_conversation_log
 from utils.lang import is_last_sentence_a_question
 from workers.base import BaseWorker
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+# Start the LLM on every final transcript, before the turn is taken (see LLMWorker).
+# Off by default: every final transcript of a turn costs an LLM request, the ones
+# restarted or discarded included (see the speculation stats of LLMWorker).
+LLM_SPECULATION = os.getenv("LLM_SPECULATION", "0") == "1"
+
 
 class Coordinator(BaseWorker):
-    def __init__(self, event_bus):
+    # Only the latest VAD data matters if the coordinator falls behind
+    mailbox_overflow = "coalesce"
+
+    def __init__(
+        self,
+        event_bus,
+        session_id: str | None = None,
+        user: str | None = None,
+        resume: bool = False,
+    ):
         super().__init__(event_bus)
         self._request_id = None
         self.event_types = [
@@ -42,9 +59,16 @@ class Coordinator(BaseWorker):
         self.data_channel = None
 
         project_root = os.path.dirname(os.path.dirname(__file__))
-        self.conversation_file = os.path.join(project_root, "db.jsonl")
-
-        self.chat: ChatContext = ChatContext()
+        # Messages of the call in the process-wide log (utils/conversation_log.py)
+        # and in the store, a resumed session continues its history (chat/store.py)
+        self.session_id = session_id or token_hex(4)
+        self.user = user
+        self.resume = resume
+        self.conversation_log = get_conversation_log()
+        self.store = get_conversation_store()
+
+        self.chat: ChatContext = ChatContext(token_budget=CONTEXT_TOKEN_BUDGET or None)
+        self.summarizer = Summarizer(self.chat)
         self.tools = ToolsHandler(self.chat, root_path=project_root)
 
         date = datetime.now().strftime("%Y-%m-%d")
@@ -61,6 +85,10 @@ class Coordinator(BaseWorker):
 
         self.unhandled_text = ""
 
+        # Speculative LLM request: (text, chat version, user message, key)
+        self.speculative = LLM_SPECULATION
+        self.speculation: tuple[str, int, ChatMessage, str] | None = None
+
         self.current_turn = 1
 
     def set_data_channel(self, channel):
@@ -69,9 +97,33 @@ class Coordinator(BaseWorker):
     async def start(self):
         await super().start()
         self.chat.append(role="system", content=self.system_prompt)
+        if self.resume:
+            await self.load_history()
         self.tts_speech_active = False
         self.tts_last_speech_start = None
 
+    async def load_history(self, limit=RESUME_MESSAGES):
+        """
+        Continue the session: its last messages from the store after the system prompt.
+        """
+        start = monotonic()
+        messages = await asyncio.to_thread(self.store.load, self.session_id, limit)
+        for message in messages:
+            self.chat.add(message)
+        turns = [m.turn for m in messages if m.turn is not None]
+        if turns:
+            self.current_turn = max(turns)
+        logger.info(
+            f"Resumed session {self.session_id}: {len(messages)} messages"
+            f" in {(monotonic() - start) * 1000:.1f} ms"
+        )
+
+    async def stop(self):
+        if self.speculation:
+            self._cancel_speculation()
+        await self.summarizer.stop()
+        await super().stop()
+
     async def handle_custom_message(self, message):
         match message["type"]:
             case "on_vad_start":
@@ -207,6 +259,7 @@ class Coordinator(BaseWorker):
         if self.silence_duration > 6.0 and self.unhandled_text:
             logger.error(f"Reset old unhandled text: {self.unhandled_text}")
             self.unhandled_text = ""
+            self._cancel_speculation()
 
         self.last_vad_data = message.get("payload")
 
@@ -220,30 +273,44 @@ class Coordinator(BaseWorker):
         except Exception as e:
             logger.exception(e)
 
+    @staticmethod
+    def _is_command(text) -> bool:
+        # Technical commands are not appended
+        return text.lower().strip(".").strip("!").strip() in ["stop", "pause"]
+
+    @staticmethod
+    def _user_message(text) -> ChatMessage:
+        # Timestamp
+        dt = datetime.now().strftime("%H:%M:%S")
+        return ChatMessage(content=f"[{dt}] {text}", role="user")
+
     def _process_user_speech(self, text):
         append = True
         start_llm = True
-        clean_text = text.lower().strip(".").strip("!").strip()
 
-        # Don't append technical commands
-        if clean_text in ["stop", "pause"]:
+        if self._is_command(text):
             append = False
             start_llm = False
 
-        # Timestamp
-        dt = datetime.now().strftime("%H:%M:%S")
-        text = f"[{dt}] {text}"
+        # Reuse the message of the speculative request if nothing changed since
+        speculation, self.speculation = self.speculation, None
+        if speculation and speculation[:2] == (text, self.chat.version):
+            message, key = speculation[2], speculation[3]
+        else:
+            message, key = self._user_message(text), None
 
         # before the next line appended
         self._abort_agent_speech()
 
         self.current_turn += 1
+        self.mark("turn_taken", self.current_turn)
 
-        info = f"  {self.current_turn:03d}. {text} "
+        info = f"  {self.current_turn:03d}. {message.content} "
         cprint(info, "cyan" if append else "red", attrs=["reverse"])
 
         if append:
-            self.chat.append(content=text, role="user")
+            message.turn = self.current_turn
+            self.chat.add(message)
             self.dump_history(self.chat.messages[-1])
 
         if start_llm:
@@ -252,7 +319,35 @@ class Coordinator(BaseWorker):
                 "tools_ctx": self.tools.options,
                 "turn": self.current_turn,
             }
+            if self.speculative:
+                # LLMWorker releases the speculation with this key, or cancels it
+                payload["speculation"] = key
+            self.mark("llm_request", self.current_turn)
             self.emit("llm_request", payload)
+        elif speculation:
+            self._cancel_speculation()
+
+    def _speculate(self):
+        """
+        Start the LLM on the text so far, its answer is held back until the turn is taken.
+        """
+        text = self.unhandled_text
+        if not self.speculative or self._is_command(text):
+            return
+        message = self._user_message(text)
+        key = token_hex(4)
+        self.speculation = (text, self.chat.version, message, key)
+        payload = {
+            "key": key,
+            "chat_ctx": self.chat.context + [message.to_dict()],
+            "tools_ctx": self.tools.options,
+        }
+        self.emit("llm_speculate", payload)
+
+    def _cancel_speculation(self):
+        if self.speculative:
+            self.speculation = None
+            self.emit("llm_speculate", {"key": None})
 
     def _handle_speech_interim(self, message):
         # text = message["payload"]["text"]
@@ -277,8 +372,10 @@ class Coordinator(BaseWorker):
             # Это какой-то паразитный сигнал после долгой тишины, игнорировать.
             logger.error(f"Speech, no VAD, silence: {self.silence_duration:.2f}")
             self.unhandled_text = ""
+            self._cancel_speculation()
         else:
             self.unhandled_text += f" {text}"
+            self._speculate()
 
     def _handle_llm_response(self, message):
         """
@@ -288,7 +385,7 @@ class Coordinator(BaseWorker):
 
         cprint(f"  {self.current_turn:03d}. {text} ", "magenta", attrs=["reverse"])
 
-        self.chat.append(content=text, role="assistant")
+        self.chat.append(content=text, role="assistant", turn=self.current_turn)
 
         self.dump_history(self.chat.messages[-1])
 
@@ -301,11 +398,8 @@ class Coordinator(BaseWorker):
         Сохранение сообщения для истории.
         """
         if msg and isinstance(msg, ChatMessage):
-            try:
-                with open(self.conversation_file, "a") as file:
-                    file.write(msg.to_json() + "\n")
-            except Exception as e:
-                logger.error("ChatMessage to json error: %s", e)
+            self.conversation_log.log(self.session_id, msg)
+            self.store.save(self.session_id, msg, user=self.user)
 
     async def _handle_llm_tool_calls(self, message):
         """ """
@@ -313,7 +407,7 @@ class Coordinator(BaseWorker):
 
         cprint(f"  {tool_calls} ", "yellow", attrs=["reverse"])
 
-        self.chat.append(tool_calls=tool_calls, role="assistant")
+        self.chat.append(tool_calls=tool_calls, role="assistant", turn=self.current_turn)
 
         self.dump_history(self.chat.messages[-1])
 
@@ -323,7 +417,9 @@ class Coordinator(BaseWorker):
         for result in results:
             content = result["content"]
             cprint(f" 󰊕 {content} ", "blue")
-            self.chat.append(content=content, tool_call_id=result["id"], role="tool")
+            self.chat.append(
+                content=content, tool_call_id=result["id"], role="tool", turn=self.current_turn
+            )
 
             self.dump_history(self.chat.messages[-1])
 
@@ -336,6 +432,8 @@ class Coordinator(BaseWorker):
 
     def _handle_llm_response_done(self, message):
         cprint(" LLM DONE ", attrs=["reverse"])
+        # Off the critical path: the next request does not wait for it
+        self.summarizer.update()
 
     def _handle_rtc_message(self, message):
         """
@@ -366,12 +464,14 @@ class Coordinator(BaseWorker):
                     "function": {"name": "get_local_date_time", "arguments": "{}"},
                 }
             ]
-            self.chat.append(tool_calls=tool_calls, role="assistant")
+            self.chat.append(tool_calls=tool_calls, role="assistant", turn=self.current_turn)
 
             # Here is the answer
             time = datetime.now().strftime("%H:%M:%S")
             content = f"Local time is {time}"
-            self.chat.append(content=content, tool_call_id=call_id, role="tool")
+            self.chat.append(
+                content=content, tool_call_id=call_id, role="tool", turn=self.current_turn
+            )
 
             print()
             print(json.dumps(self.chat.context, indent=2, default=str))
@@ -0,0 +1,125 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import tempfile
+
+from aiohttp import ClientSession, UnixConnector, web
+
+logger = logging.getLogger("prefork")
+logger.setLevel(logging.INFO)
+
+
+# Pre-fork mode.
+#
+# Models are loaded by the parent before forking, so the workers share them copy-on-write.
+# Every worker runs its own event loop and serves /offer on a unix socket, the parent only
+# routes offers to the least loaded worker. Media then flows directly to that worker:
+# its ICE candidates are in the SDP answer.
+
+
+class WorkerPool:
+    def __init__(self, size, make_app, socket_dir=None):
+        """
+        make_app(index, load) -> web.Application, called in the forked worker.
+        """
+        self.size = size
+        self.make_app = make_app
+        self.socket_dir = socket_dir or tempfile.mkdtemp(prefix="buratino_")
+        self.socket_paths = [os.path.join(self.socket_dir, f"w{i}.sock") for i in range(size)]
+
+        self._ctx = multiprocessing.get_context("fork")
+        # Active peer connections per worker, written by the workers
+        self.load = self._ctx.Array("i", size, lock=False)
+        # Offers routed to a worker but not answered yet
+        self.pending = [0] * size
+
+        self.processes: list[multiprocessing.Process] = []
+        self.sessions: list[ClientSession] = []
+
+    def start(self):
+        """
+        Fork the workers. Call before the parent starts its event loop.
+        """
+        for index, path in enumerate(self.socket_paths):
+            process = self._ctx.Process(
+                target=self._run_worker, args=(index, path), name=f"worker-{index}"
+            )
+            process.start()
+            self.processes.append(process)
+            logger.info(f"Worker {index} started, pid {process.pid}")
+
+    def _run_worker(self, index, path):
+        if os.path.exists(path):
+            os.unlink(path)
+        app = self.make_app(index, self.load)
+        web.run_app(app, path=path, access_log=None, print=None)
+
+    def pick(self) -> int:
+        alive = [i for i, p in enumerate(self.processes) if p.is_alive()]
+        if not alive:
+            raise web.HTTPServiceUnavailable(text="No workers")
+        return min(alive, key=lambda i: self.load[i] + self.pending[i])
+
+    async def offer(self, request):
+        index = self.pick()
+        self.pending[index] += 1
+        try:
+            headers = {
+                "Content-Type": "application/json",
+                "X-Forwarded-For": request.remote or "",
+            }
+            session = self.sessions[index]
+            async with session.post(
+                "http://worker/offer", data=await request.read(), headers=headers
+            ) as resp:
+                text = await resp.text()
+                return web.Response(status=resp.status, content_type="application/json", text=text)
+        finally:
+            self.pending[index] -= 1
+
+    async def metrics(self, request):
+        """
+        /metrics of every live worker.
+        """
+
+        async def fetch(index):
+            if not self.processes[index].is_alive():
+                return {"worker": index, "alive": False}
+            async with self.sessions[index].get("http://worker/metrics") as resp:
+                return await resp.json()
+
+        workers = await asyncio.gather(*map(fetch, range(self.size)), return_exceptions=True)
+        workers = [w if isinstance(w, dict) else {"error": str(w)} for w in workers]
+        return web.json_response({"workers": workers})
+
+    def stats(self):
+        return [
+            {"pid": p.pid, "alive": p.is_alive(), "pcs": self.load[i], "pending": self.pending[i]}
+            for i, p in enumerate(self.processes)
+        ]
+
+    async def on_startup(self, app):
+        self.sessions = [ClientSession(connector=UnixConnector(path=p)) for p in self.socket_paths]
+
+    async def on_shutdown(self, app):
+        """
+        Gracefully stop every worker: SIGTERM makes a worker close its peer connections.
+        """
+        # Keep-alive connections to the workers would delay their shutdown
+        await asyncio.gather(*(s.close() for s in self.sessions))
+
+        for process in self.processes:
+            if process.is_alive():
+                process.terminate()
+
+        await asyncio.gather(*(asyncio.to_thread(p.join, 10) for p in self.processes))
+
+        for process in self.processes:
+            if process.is_alive():
+                logger.warning(f"Worker {process.name} did not stop, killing")
+                process.kill()
+
+        for path in self.socket_paths:
+            if os.path.exists(path):
+                os.unlink(path)
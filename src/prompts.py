@@ -16,3 +16,11 @@ SP = (
     "IMPORTANT: always remember that you are a voice assistant with no visual interface. "
     "IMPORTANT: Avoid follow-up questions. Use laconic and concise language. "
 )
+
+SUMMARY_PROMPT = (
+    "You maintain the memory of a voice conversation between a user and an assistant. "
+    "Write a short summary of the conversation below, merged with the earlier summary if "
+    "there is one. Keep facts about the user, their goals, decisions, promises, open "
+    "questions, names, numbers and times. Drop small talk. Plain text, third person, "
+    "no more than 200 words."
+)
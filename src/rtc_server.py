@@ -8,13 +8,39 @@ import uuid
 import coloredlogs
 from aiohttp import web
 from aiortc import RTCConfiguration, RTCIceServer, RTCPeerConnection, RTCSessionDescription
-from aiortc.contrib.media import MediaBlackhole, MediaRecorder, MediaRelay
+from aiortc.contrib.media import MediaBlackhole, MediaRecorder
 
+from chat.store import (
+    conversation_store_stats,
+    get_conversation_store,
+    start_conversation_store,
+    stop_conversation_store,
+)
 from coordinator import Coordinator
+from prefork import WorkerPool
+from tracks.fanout import AudioFanout
+from utils.conversation_log import (
+    conversation_log_stats,
+    start_conversation_log,
+    stop_conversation_log,
+)
 from utils.event_bus import EventBus
-from workers.event_tracer import EventTracer
+from utils.loop_monitor import LoopMonitor, process_stats
+from utils.media_jobs import get_media_executor
+from utils.openai_client import (
+    OPENAI_WARM_CONNECTIONS,
+    openai_client_stats,
+    start_openai_client,
+    stop_openai_client,
+)
+from utils.provider_tape import TAPE_MODE, ProviderTape
+from utils.rate_limit import rate_limit_stats
+from utils.stt_pool import get_stt_pool, start_stt_pool, stop_stt_pool
+from utils.tts_cache import tts_cache_stats
+from utils.vad_model import get_vad_scheduler, load_vad_model, stop_vad_scheduler
+from workers.event_tracer import EventTracer, turn_latency_stats
 from workers.llm import LLMWorker
-from workers.stt import STTWorker
+from workers.stt import STTWorker, client_options, live_options
 from workers.tts import TTSWorker
 from workers.vad import VADWorker
 
@@ -32,6 +58,11 @@ logging.getLogger("aiortc").setLevel(logging.INFO)
 logging.getLogger("websockets.client").setLevel(logging.INFO)
 
 pcs = set()
+loop_monitor = LoopMonitor()
+
+# Pre-fork mode: index of this worker and the shared per-worker load array
+worker_index: int | None = None
+worker_load = None
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 ROOT = os.path.dirname(__file__)
@@ -51,37 +82,54 @@ async def offer(request):
     )
     configuration = RTCConfiguration(iceServers=[ice_server])
     pc = RTCPeerConnection(configuration)
-    pcs.add(pc)
+    track_pc(pc)
 
     pc_id = "PC_%s" % (uuid.uuid4().hex[:5]).upper()
+    if worker_index is not None:
+        pc_id = f"W{worker_index}_{pc_id}"
 
     def log_info(msg, *args):
         logger.info(pc_id + " " + msg, *args)
 
-    log_info("Peer Connection created for %s", request.remote)
-
-    relay = MediaRelay()  # копирует стрим в указанный трек
+    remote = request.headers.get("X-Forwarded-For") or request.remote
+    log_info("Peer Connection created for %s", remote)
 
     # Main event bus
     event_bus = EventBus()
     await event_bus.start()
 
+    # Provider streams recorded or replayed, see utils/provider_tape.py
+    tape = ProviderTape() if TAPE_MODE else None
+
     vad = VADWorker(event_bus)
     await vad.start()
 
-    stt = STTWorker(event_bus)
+    stt = STTWorker(event_bus, tape=tape)
     await stt.start()
 
-    llm = LLMWorker(event_bus)
+    llm = LLMWorker(event_bus, tape=tape)
     await llm.start()
 
-    tts = TTSWorker(event_bus)
+    tts = TTSWorker(event_bus, tape=tape)
     await tts.start()
 
-    event_tracer = EventTracer(event_bus)
+    event_tracer = EventTracer(event_bus, name=pc_id)
     await event_tracer.start()
 
-    coordinator = Coordinator(event_bus)
+    # A returning client sends the resume token of its previous call to continue it,
+    # the session and its user are the ones the token was issued for
+    store = get_conversation_store()
+    token = params.get("resume")
+    resumed = await asyncio.to_thread(store.resume_session, token) if token else None
+    if resumed:
+        session_id, user = resumed
+    else:
+        if token:
+            log_info("Unknown resume token, new session")
+        session_id, user = uuid.uuid4().hex, params.get("user")
+        token = await asyncio.to_thread(store.create_session, session_id, user)
+    log_info("Session %s", session_id)
+    coordinator = Coordinator(event_bus, session_id=session_id, user=user, resume=bool(resumed))
     await coordinator.start()
 
     if args.save:
@@ -89,9 +137,29 @@ async def offer(request):
     else:
         recorder = MediaBlackhole()
 
+    closed = False
+
+    async def close():
+        nonlocal closed
+        if closed:
+            return
+        closed = True
+        untrack_pc(pc)
+        await pc.close()
+        # The workers, then the bus and its mailbox tasks: nothing of the call is left running
+        for worker in (coordinator, llm, tts, stt, vad, event_tracer):
+            try:
+                await worker.stop()
+            except Exception as e:
+                logger.exception(e)
+        await event_bus.stop()
+        log_info("Session closed")
+
     @pc.on("connectionstatechange")
     async def on_connectionstatechange():
         log_info("Connection state: %s" % str(pc.connectionState).upper())
+        if pc.connectionState in ("failed", "closed"):
+            await close()
 
     @pc.on("signalingstatechange")
     async def on_signalingstatechange():
@@ -122,12 +190,13 @@ async def offer(request):
         if track.kind != "audio":
             return
 
-        proxy_track = relay.subscribe(track)
-        vad_track = vad.create_track(proxy_track)
+        # Decoded and converted once for every consumer
+        fanout = AudioFanout(track)
+
+        vad_track = vad.create_track(fanout.subscribe())
         recorder.addTrack(vad_track)
 
-        proxy_track = relay.subscribe(track)
-        stt_track = stt.create_track(proxy_track)
+        stt_track = stt.create_track(fanout.subscribe())
         recorder.addTrack(stt_track)
 
         pc.addTrack(tts.ttsTrack)
@@ -146,11 +215,24 @@ async def offer(request):
     answer = await pc.createAnswer()
     await pc.setLocalDescription(answer)
 
-    content = json.dumps({"sdp": pc.localDescription.sdp, "type": pc.localDescription.type})
+    description = pc.localDescription
+    content = json.dumps({"sdp": description.sdp, "type": description.type, "resume": token})
     return web.Response(content_type="application/json", text=content)
 
 
-async def index(request):
+def track_pc(pc):
+    pcs.add(pc)
+    if worker_load is not None:
+        worker_load[worker_index] = len(pcs)
+
+
+def untrack_pc(pc):
+    pcs.discard(pc)
+    if worker_load is not None:
+        worker_load[worker_index] = len(pcs)
+
+
+async def index_page(request):
     content = open(os.path.join(ROOT, "static/rtc.html"), "r").read()
     return web.Response(content_type="text/html", text=content)
 
@@ -160,11 +242,95 @@ async def javascript(request):
     return web.Response(content_type="application/javascript", text=content)
 
 
+async def metrics(request):
+    """
+    Load metrics of this process, polled by loadtest/harness.py.
+    """
+    vad = get_vad_scheduler()
+    data = {
+        "worker": worker_index,
+        "pcs": len(pcs),
+        **process_stats(),
+        "loop_lag_ms": loop_monitor.stats(),
+        "vad": {"batches": vad.batches, "mean_batch": round(vad.mean_batch, 2)},
+        "media_jobs": get_media_executor().stats(),
+    }
+    if openai := openai_client_stats():
+        data["openai"] = openai
+    if pool := get_stt_pool():
+        data["stt_pool"] = pool.stats()
+    if conversation_log := conversation_log_stats():
+        data["conversation_log"] = conversation_log
+    if store := conversation_store_stats():
+        data["conversation_store"] = store
+    if limiters := rate_limit_stats():
+        data["rate_limit"] = limiters
+    if tts_cache := tts_cache_stats():
+        data["tts_cache"] = tts_cache
+    if turn_latency := turn_latency_stats():
+        data["turn_latency_ms"] = turn_latency
+    return web.json_response(data)
+
+
+async def on_startup(app):
+    # Shared models are loaded once per process, off the event loop
+    await asyncio.to_thread(load_vad_model)
+    get_vad_scheduler()
+    loop_monitor.start()
+    if TAPE_MODE != "replay":
+        # Deepgram connections opened ahead of the calls, see utils/stt_pool.py
+        start_stt_pool(client_options(), live_options())
+    # One OpenAI client per process, its connections warmed at boot and kept warm
+    start_openai_client(warm=0 if TAPE_MODE == "replay" else OPENAI_WARM_CONNECTIONS)
+    # Messages of all the calls, written in batches off the loop
+    start_conversation_log(worker_index)
+    start_conversation_store()
+
+
 async def on_shutdown(app):
     # close peer connections
     coros = [pc.close() for pc in pcs]
     await asyncio.gather(*coros, return_exceptions=True)
     pcs.clear()
+    if worker_load is not None:
+        worker_load[worker_index] = 0
+    await stop_vad_scheduler()
+    await stop_stt_pool()
+    await stop_openai_client()
+    await stop_conversation_log()
+    await stop_conversation_store()
+    await loop_monitor.stop()
+
+
+def make_app(index=None, load=None):
+    """
+    Application serving calls. In pre-fork mode it runs in every worker process.
+    """
+    global worker_index, worker_load
+    worker_index, worker_load = index, load
+
+    app = web.Application()
+    app.on_startup.append(on_startup)
+    app.on_shutdown.append(on_shutdown)
+    app.router.add_get("/", index_page)
+    app.router.add_get("/client.js", javascript)
+    app.router.add_post("/offer", offer)
+    app.router.add_get("/metrics", metrics)
+    return app
+
+
+def make_front_app(pool: WorkerPool):
+    """
+    Parent application in pre-fork mode, routes offers to the least loaded worker.
+    """
+    app = web.Application()
+    app.on_startup.append(pool.on_startup)
+    app.on_shutdown.append(pool.on_shutdown)
+    app.router.add_get("/", index_page)
+    app.router.add_get("/client.js", javascript)
+    app.router.add_post("/offer", pool.offer)
+    app.router.add_get("/metrics", pool.metrics)
+    return app
 
 
 if __name__ == "__main__":
@@ -172,6 +338,12 @@ if __name__ == "__main__":
     parser.add_argument("--host", default="0.0.0.0", help="Host (default: 0.0.0.0)")
     parser.add_argument("--port", type=int, default=8080, help="Port (default: 8080)")
     parser.add_argument("--save", help="Write received media to a file.")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        help="Pre-fork N worker processes sharing the loaded models (default: 0, single process)",
+    )
     parser.add_argument("--verbose", "-v", action="count")
     args = parser.parse_args()
 
@@ -180,11 +352,14 @@ if __name__ == "__main__":
     else:
         logging.basicConfig(level=logging.INFO)
 
-    app = web.Application()
-    app.on_shutdown.append(on_shutdown)
-    app.router.add_get("/", index)
-    app.router.add_get("/client.js", javascript)
-    app.router.add_post("/offer", offer)
+    if args.workers > 0:
+        # Load models in the parent, the forked workers share them copy-on-write
+        load_vad_model()
+        pool = WorkerPool(args.workers, make_app)
+        pool.start()
+        app = make_front_app(pool)
+    else:
+        app = make_app()
 
     loop = asyncio.new_event_loop()
     web.run_app(app, access_log=None, host=args.host, port=args.port, loop=loop)
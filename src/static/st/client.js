@@ -118,6 +118,13 @@ const enumerateInputDevices = async () => {
     }
 };
 
+// Open with ?resume to continue the previous conversation of this browser
+const resumeParams = () => {
+    const token = localStorage.getItem("resume");
+    const resume = new URLSearchParams(window.location.search).has("resume");
+    return resume && token ? { resume: token } : {};
+};
+
 // Negotiate Connection
 const negotiate = async () => {
     try {
@@ -136,9 +143,10 @@ const negotiate = async () => {
         const response = await fetch("/offer", {
             method: "POST",
             headers: { "Content-Type": "application/json" },
-            body: JSON.stringify({ sdp: offer.sdp, type: offer.type }),
+            body: JSON.stringify({ sdp: offer.sdp, type: offer.type, ...resumeParams() }),
         });
         const answer = await response.json();
+        localStorage.setItem("resume", answer.resume);
         await pc.setRemoteDescription(answer);
     } catch (error) {
         console.error(error);
@@ -0,0 +1,112 @@
+import asyncio
+import logging
+
+import numpy as np
+from aiortc import MediaStreamTrack
+from aiortc.mediastreams import MediaStreamError
+from av import AudioFrame, AudioResampler
+
+logger = logging.getLogger("pc")
+logger.setLevel(logging.INFO)
+
+
+# Fan-out of one inbound audio track, like aiortc MediaRelay, but every frame is
+# converted once for all consumers: VAD, STT, recorder and whatever comes next.
+
+
+class DecodedFrame:
+    """
+    One inbound frame with its shared read-only views.
+
+    pcm48: 48 kHz interleaved s16 as received (stereo from WebRTC)
+    pcm16: 16 kHz mono s16, may be empty while the resampler fills up
+    """
+
+    __slots__ = ("frame", "pcm48", "pcm16")
+
+    def __init__(self, frame: AudioFrame, pcm48: np.ndarray, pcm16: np.ndarray):
+        pcm48.flags.writeable = False
+        pcm16.flags.writeable = False
+        self.frame = frame
+        self.pcm48 = pcm48
+        self.pcm16 = pcm16
+
+
+class FanoutTrack(MediaStreamTrack):
+    kind = "audio"
+
+    def __init__(self, fanout: "AudioFanout"):
+        super().__init__()
+        self._fanout = fanout
+        self._queue: asyncio.Queue[DecodedFrame | None] = asyncio.Queue()
+
+    async def recv_decoded(self) -> DecodedFrame:
+        if self.readyState != "live":
+            raise MediaStreamError
+
+        self._fanout._start(self)
+        decoded = await self._queue.get()
+        if decoded is None:
+            self.stop()
+            raise MediaStreamError
+        return decoded
+
+    async def recv(self) -> AudioFrame:
+        return (await self.recv_decoded()).frame
+
+    def stop(self):
+        super().stop()
+        if self._fanout is not None:
+            self._fanout._stop(self)
+            self._fanout = None
+
+
+class AudioFanout:
+    """
+    Reads the source track once and pushes every DecodedFrame to all subscribers.
+    """
+
+    def __init__(self, track: MediaStreamTrack):
+        self.track = track
+        self.resampler = AudioResampler(format="s16", layout="mono", rate=16_000)
+        self.consumers: set[FanoutTrack] = set()
+        self._task: asyncio.Task | None = None
+        self.frames = 0
+
+    def subscribe(self) -> FanoutTrack:
+        return FanoutTrack(self)
+
+    def decode(self, frame: AudioFrame) -> DecodedFrame:
+        pcm48 = frame.to_ndarray()[0]
+        frames_16 = self.resampler.resample(frame)
+        if len(frames_16) == 1:
+            pcm16 = frames_16[0].to_ndarray()[0]
+        elif frames_16:
+            pcm16 = np.concatenate([f.to_ndarray()[0] for f in frames_16])
+        else:
+            pcm16 = np.empty(0, dtype=np.int16)
+        return DecodedFrame(frame, pcm48, pcm16)
+
+    def _start(self, consumer: FanoutTrack):
+        self.consumers.add(consumer)
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="audio_fanout")
+
+    def _stop(self, consumer: FanoutTrack):
+        self.consumers.discard(consumer)
+
+    async def _run(self):
+        while True:
+            try:
+                decoded = self.decode(await self.track.recv())
+                self.frames += 1
+            except MediaStreamError:
+                decoded = None
+            except Exception as e:
+                logger.exception(e)
+                decoded = None
+
+            for consumer in self.consumers:
+                consumer._queue.put_nowait(decoded)
+            if decoded is None:
+                break
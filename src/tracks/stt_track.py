@@ -4,37 +4,48 @@ import logging
 from aiortc import AudioStreamTrack
 from av import AudioFrame
 
+from tracks.fanout import FanoutTrack
+from utils.uplink import UplinkEncoder
+
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
 
 class STTTrack(AudioStreamTrack):
-    def __init__(self, track, callback):
+    def __init__(self, track: FanoutTrack, callback, encoder: UplinkEncoder | None = None):
+        """
+        callback(pcm, uplink): original 48 kHz stereo PCM and the same audio encoded for STT.
+        """
         super().__init__()
         self.track = track
         self.callback = callback
+        self.encoder = encoder or UplinkEncoder()
 
         self.buffer = bytearray()
+        self.uplink = bytearray()
         self.segments_amount = 10
         self.segment_size = None
         self.lock = asyncio.Lock()
 
     async def recv(self) -> AudioFrame:
-        frame: AudioFrame = await self.track.recv()
+        decoded = await self.track.recv_decoded()
 
-        segment = frame.to_ndarray()[0].tobytes()
+        segment = decoded.pcm48
 
-        # Determine segment size dynamically if not already done
+        # Determine segment size (bytes) dynamically if not already done
         if self.segment_size is None:
-            self.segment_size = len(segment)
+            self.segment_size = segment.nbytes
 
-        self.buffer.extend(segment)
+        self.buffer += segment.data
+        self.uplink += self.encoder.encode(decoded)
 
         if (
             len(self.buffer) >= (self.segment_size * self.segments_amount)
-            or len(segment) < self.segment_size
+            or segment.nbytes < self.segment_size
         ):
-            await self.callback(self.buffer)
+            self.uplink += self.encoder.flush()
+            await self.callback(self.buffer, self.uplink)
             self.buffer.clear()
+            self.uplink.clear()
 
-        return frame
+        return decoded.frame
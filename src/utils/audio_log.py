@@ -0,0 +1,149 @@
+import logging
+import os
+import queue
+import threading
+from datetime import datetime
+
+import av
+import numpy as np
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+_ROTATE = object()
+_CLOSE = object()
+
+# format -> (container, codec, extension)
+FORMATS = {
+    "flac": ("flac", "flac", "flac"),
+    "opus": ("ogg", "libopus", "opus"),
+}
+
+
+class AudioLogWriter:
+    """
+    Session audio log, encoded incrementally into rotating files by a background thread.
+
+    write() only queues the PCM bytes, so memory does not grow with the call length:
+    at most `max_queue` chunks wait for the encoder, anything beyond is dropped.
+    A segment is closed by rotate() or after `max_segment` seconds, then
+    on_closed(file_name, duration) is called from the writer thread.
+    """
+
+    def __init__(
+        self,
+        directory,
+        on_closed=None,
+        sample_rate=48000,
+        channels=2,
+        fmt="flac",
+        max_segment=600.0,
+        max_queue=256,
+    ):
+        self.directory = os.path.abspath(directory)
+        self.on_closed = on_closed
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.container_format, self.codec, self.extension = FORMATS[fmt]
+        self.max_segment = max_segment
+
+        # Stats
+        self.segments = 0
+        self.bytes_in = 0
+        self.dropped = 0
+
+        self.max_queue = max_queue
+        self._queue = queue.Queue()
+        self._container = None
+        self._stream = None
+        self._file_name = None
+        self._samples = 0
+        self._thread = threading.Thread(target=self._run, name="audio_log", daemon=True)
+        self._thread.start()
+
+    def write(self, pcm: bytes) -> None:
+        """
+        Interleaved s16 PCM. Pass a copy: the caller's buffer may be reused.
+        """
+        if self._queue.qsize() >= self.max_queue:
+            self.dropped += 1
+            return
+        self._queue.put_nowait(pcm)
+        self.bytes_in += len(pcm)
+
+    def rotate(self) -> None:
+        """
+        Close the current segment, the next write starts a new one.
+        """
+        self._queue.put_nowait(_ROTATE)
+
+    def close(self) -> None:
+        """
+        Flush the current segment and stop the thread. Blocking, use asyncio.to_thread().
+        """
+        if self._thread.is_alive():
+            self._queue.put(_CLOSE)
+            self._thread.join()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is _CLOSE:
+                    self._close_segment()
+                    return
+                if item is _ROTATE:
+                    self._close_segment()
+                    continue
+                self._encode(item)
+                if self._samples >= self.max_segment * self.sample_rate:
+                    self._close_segment()
+            except Exception as e:
+                logger.exception(e)
+                if self._container is not None:
+                    try:
+                        self._container.close()
+                    except Exception:
+                        pass
+                    self._container = None
+
+    def _open_segment(self):
+        os.makedirs(self.directory, exist_ok=True)
+        name = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        self._file_name = f"{name}.{self.extension}"
+        path = os.path.join(self.directory, self._file_name)
+        self._container = av.open(path, "w", format=self.container_format)
+        self._stream = self._container.add_stream(self.codec, rate=self.sample_rate)
+        self._stream.layout = "stereo" if self.channels == 2 else "mono"
+        self._samples = 0
+
+    def _encode(self, pcm):
+        if self._container is None:
+            self._open_segment()
+
+        samples = np.frombuffer(pcm, dtype=np.int16).reshape(1, -1)
+        layout = "stereo" if self.channels == 2 else "mono"
+        frame = av.AudioFrame.from_ndarray(samples, format="s16", layout=layout)
+        frame.sample_rate = self.sample_rate
+        frame.pts = self._samples
+        self._samples += frame.samples
+
+        for packet in self._stream.encode(frame):
+            self._container.mux(packet)
+
+    def _close_segment(self):
+        if self._container is None:
+            return
+        try:
+            for packet in self._stream.encode(None):
+                self._container.mux(packet)
+        finally:
+            self._container.close()
+            self._container = None
+
+        self.segments += 1
+        duration = self._samples / self.sample_rate
+        logger.info(f"Audio log segment {self._file_name}, duration: {duration:.1f}")
+        if self.on_closed:
+            self.on_closed(self._file_name, duration)
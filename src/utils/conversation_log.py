@@ -0,0 +1,84 @@
+import asyncio
+import logging
+import os
+from typing import TYPE_CHECKING
+
+from .jsonl_writer import JsonlWriter
+
+if TYPE_CHECKING:
+    from chat import ChatMessage
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+
+CONVERSATION_LOG = os.getenv("CONVERSATION_LOG", os.path.join(ROOT, "db.jsonl"))
+# Rotated and gzipped past this size, the most recent archives are kept
+CONVERSATION_LOG_MAX_MB = float(os.getenv("CONVERSATION_LOG_MAX_MB", "64"))
+CONVERSATION_LOG_BACKUPS = int(os.getenv("CONVERSATION_LOG_BACKUPS", "20"))
+
+
+class ConversationLog:
+    """
+    Messages of every call of the process, one JSON line each tagged with the session id.
+
+    log() copies the wire dict into a queue, the file is written in batches by the
+    JsonlWriter thread, so calls never touch the disk on the event loop.
+    """
+
+    def __init__(self, path=CONVERSATION_LOG, flush_size=256, flush_interval=1.0):
+        self.path = path
+        self.writer = JsonlWriter(
+            path,
+            flush_size=flush_size,
+            flush_interval=flush_interval,
+            max_bytes=int(CONVERSATION_LOG_MAX_MB * 1024 * 1024) or None,
+            backups=CONVERSATION_LOG_BACKUPS,
+            name="conversation_log",
+        )
+
+    def log(self, session_id: str, message: "ChatMessage") -> None:
+        self.writer.write({"session": session_id, **message.to_dict()})
+
+    def stats(self) -> dict:
+        return self.writer.stats()
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+_log: ConversationLog | None = None
+
+
+def start_conversation_log(worker_index: int | None = None) -> ConversationLog:
+    """
+    Process-wide log. In pre-fork mode every worker writes (and rotates) its own file.
+    """
+    global _log
+    if _log is None:
+        path = CONVERSATION_LOG
+        if worker_index is not None:
+            root, ext = os.path.splitext(path)
+            path = f"{root}.W{worker_index}{ext}"
+        _log = ConversationLog(path)
+    return _log
+
+
+def get_conversation_log() -> ConversationLog:
+    """
+    The shared log, opened on first use if not started.
+    """
+    return start_conversation_log()
+
+
+def conversation_log_stats() -> dict | None:
+    return _log.stats() if _log else None
+
+
+async def stop_conversation_log():
+    global _log
+    if _log is not None:
+        # Flushes the last batch
+        await asyncio.to_thread(_log.close)
+        _log = None
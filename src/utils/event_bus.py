@@ -1,7 +1,8 @@
 import asyncio
 import logging
 import re
-from collections import defaultdict
+from collections import defaultdict, deque
+from itertools import count
 
 from termcolor import colored
 
@@ -12,6 +13,167 @@ logger.setLevel(logging.INFO)
 
 FLASH = colored("", "magenta")  # 
 
+# Priority lanes, a lower lane is always dispatched first.
+# Barge-in control must never wait behind a backlog of VAD telemetry.
+#
+# Ordering: the events of one publisher are delivered in the order they were published,
+# except the telemetry, which anything may overtake. A control event published while
+# the same publisher still has transcript events queued goes behind them.
+#
+# Control events are put in the mailboxes as they are published: they never wait behind
+# the bus queue or for a full mailbox (a mailbox takes them past its size).
+CONTROL, TRANSCRIPT, TELEMETRY = 0, 1, 2
+LANE_NAMES = ("control", "transcript", "telemetry")
+
+EVENT_LANES = {
+    "abort": CONTROL,
+    "tts_abort": CONTROL,
+    "llm_abort": CONTROL,
+    "on_vad_start": CONTROL,
+    "on_vad_end": CONTROL,
+    "speech_started": CONTROL,
+    "on_vad_data": TELEMETRY,
+    "audio_chunk": TELEMETRY,
+}
+
+# Only these events may be dropped by a full mailbox, the others always wait
+LOSSY_EVENTS = {"on_vad_data", "audio_chunk"}
+
+# Mailbox overflow policies
+BLOCK = "block"  # the bus waits until the subscriber catches up
+DROP_OLDEST = "drop_oldest"  # the oldest lossy event is dropped, else block
+COALESCE = "coalesce"  # the oldest queued event of the same lossy type is replaced, else block
+
+
+def _pending_done(pending: dict, source):
+    pending[source] -= 1
+    if not pending[source]:
+        del pending[source]
+
+
+class Mailbox:
+    """
+    Bounded inbox of one subscriber, drained by a single long-lived task.
+
+    Events are handled one at a time, in order within a lane, higher lanes first
+    (FIFO per publisher, see the lanes above).
+    Delivery only appends to a deque: no task is created per event.
+    """
+
+    def __init__(self, callback, maxsize: int = 1000, overflow: str = BLOCK):
+        self.callback = callback
+        self.maxsize = maxsize
+        self.overflow = overflow
+
+        self.lanes = [deque() for _ in LANE_NAMES]
+        self.size = 0
+        # publisher -> its events in the transcript lane
+        self._transcript = defaultdict(int)
+        self._not_empty = asyncio.Event()
+        self._not_full = asyncio.Event()
+        self._not_full.set()
+        self._task: asyncio.Task | None = None
+
+        # Stats
+        self.handled = 0
+        self.dropped = 0
+        self.max_size = 0
+
+    @property
+    def name(self) -> str:
+        owner = getattr(self.callback, "__self__", None)
+        return type(owner).__name__ if owner else getattr(self.callback, "__name__", "?")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._drain(), name=f"mailbox_{self.name}")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def put_nowait(self, lane: int, event_type: str, message, source=None) -> bool:
+        """
+        Returns False if the mailbox is full and the policy is to wait (never for control).
+        """
+        if self.size >= self.maxsize and lane != CONTROL:
+            match self.overflow:
+                case "drop_oldest" if self._drop_oldest():
+                    pass
+                case "coalesce" if self._coalesce(lane, event_type):
+                    pass
+                case _:
+                    return False
+
+        if lane == CONTROL and self._transcript.get(source):
+            lane = TRANSCRIPT
+        if lane == TRANSCRIPT:
+            self._transcript[source] += 1
+        self.lanes[lane].append((event_type, message, source))
+        self.size += 1
+        if self.size > self.max_size:
+            self.max_size = self.size
+        self._not_empty.set()
+        return True
+
+    async def put(self, lane: int, event_type: str, message, source=None):
+        while not self.put_nowait(lane, event_type, message, source):
+            self._not_full.clear()
+            await self._not_full.wait()
+
+    def _drop_oldest(self) -> bool:
+        for i, (queued_type, _, _) in enumerate(self.lanes[TELEMETRY]):
+            if queued_type in LOSSY_EVENTS:
+                del self.lanes[TELEMETRY][i]
+                self.size -= 1
+                self.dropped += 1
+                return True
+        return False
+
+    def _coalesce(self, lane, event_type) -> bool:
+        if event_type not in LOSSY_EVENTS:
+            return False
+        queue = self.lanes[lane]
+        for i, (queued_type, _, _) in enumerate(queue):
+            if queued_type == event_type:
+                del queue[i]
+                self.size -= 1
+                self.dropped += 1
+                return True
+        return False
+
+    def _pop(self):
+        for lane, queue in enumerate(self.lanes):
+            if queue:
+                self.size -= 1
+                event = queue.popleft()
+                if lane == TRANSCRIPT:
+                    _pending_done(self._transcript, event[2])
+                return event
+
+    async def _drain(self):
+        while True:
+            if not self.size:
+                self._not_empty.clear()
+                await self._not_empty.wait()
+                continue
+
+            _, message, _ = self._pop()
+            self._not_full.set()
+            try:
+                await self.callback(message)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception(e)
+            self.handled += 1
+
+            if not self.handled % 32:
+                # A long backlog must not starve the other mailboxes
+                await asyncio.sleep(0)
+
 
 class EventBus(BaseWorker):
     def __init__(self):
@@ -24,38 +186,125 @@ class EventBus(BaseWorker):
             "on_speech_interim",
             "on_speech_final",
         ]
-        self.event_queue = asyncio.Queue()
-        self.consumers = defaultdict(list)
+        # Items are (lane, seq, event_type, message, source), seq keeps FIFO order inside a lane
+        self.event_queue = asyncio.PriorityQueue()
+        self._seq = count()
+        # publisher -> its events queued in the transcript lane
+        self._transcript = defaultdict(int)
+        self.consumers: dict[str, list[Mailbox]] = defaultdict(list)
+        self.mailboxes: dict = {}
         self._task: asyncio.Task | None = None
 
-    def subscribe(self, callback, message_types: list | None = None):
+        # Per-lane metrics
+        self.lane_depth = [0] * len(LANE_NAMES)
+        self.lane_max_depth = [0] * len(LANE_NAMES)
+        self.lane_dispatched = [0] * len(LANE_NAMES)
+
+    def subscribe(
+        self,
+        callback,
+        message_types: list | None = None,
+        *,
+        maxsize: int = 1000,
+        overflow: str = BLOCK,
+    ):
+        """
+        All message types of one callback share a single ordered mailbox.
+        """
         message_types = ["*"] if message_types is None else message_types
+
+        mailbox = self.mailboxes.get(callback)
+        if mailbox is None:
+            mailbox = self.mailboxes[callback] = Mailbox(callback, maxsize, overflow)
+            if self._running:
+                mailbox.start()
+
         for mt in message_types:
-            self.consumers[mt].append(callback)
+            if mailbox not in self.consumers[mt]:
+                self.consumers[mt].append(mailbox)
 
     def show_subs(self):
         for msg, subs in self.consumers.items():
-            subs_str = ", ".join(re.search(r"<(\S+) ", str(s.__self__)).group(1) for s in subs)
+            subs_str = ", ".join(
+                re.search(r"<(\S+) ", str(m.callback.__self__)).group(1) for m in subs
+            )
             print(f"  {msg}: {subs_str}")
 
-    def publish(self, message):
+    def mailbox_stats(self) -> dict:
+        return {
+            mailbox.name: {
+                "size": mailbox.size,
+                "max_size": mailbox.max_size,
+                "handled": mailbox.handled,
+                "dropped": mailbox.dropped,
+            }
+            for mailbox in self.mailboxes.values()
+        }
+
+    def lane_stats(self) -> dict:
+        return {
+            name: {
+                "depth": self.lane_depth[lane],
+                "max_depth": self.lane_max_depth[lane],
+                "dispatched": self.lane_dispatched[lane],
+            }
+            for lane, name in enumerate(LANE_NAMES)
+        }
+
+    def publish(self, message, source=None):
+        """
+        `source`: the publisher (emit() passes the worker), its events keep their order.
+        """
+        event_type = message.get("type", "*")
+        lane = EVENT_LANES.get(event_type, TRANSCRIPT)
+        if lane == CONTROL and self._transcript.get(source):
+            lane = TRANSCRIPT
+        if lane == CONTROL:
+            self.lane_dispatched[CONTROL] += 1
+            self._log(event_type)
+            for mailbox in self.consumers.get(event_type, ()):
+                mailbox.put_nowait(CONTROL, event_type, message, source)
+            return
         try:
-            self.event_queue.put_nowait((message.get("type", "*"), message))
+            self.event_queue.put_nowait((lane, next(self._seq), event_type, message, source))
         except Exception as e:
             logger.exception(e)
+            return
+        if lane == TRANSCRIPT:
+            self._transcript[source] += 1
+
+        depth = self.lane_depth[lane] = self.lane_depth[lane] + 1
+        if depth > self.lane_max_depth[lane]:
+            self.lane_max_depth[lane] = depth
 
     async def _process_events(self) -> None:
         while self._running:
-            event_type, event_data = await self.event_queue.get()
-            if event_type not in self._skip_info:
-                logger.info(f"{FLASH} {event_type}")
-            for callback in self.consumers.get(event_type, []):
-                asyncio.create_task(callback(event_data))
-            self.event_queue.task_done()
+            lane, _, event_type, event_data, source = await self.event_queue.get()
+            if lane == TRANSCRIPT:
+                _pending_done(self._transcript, source)
+            self.lane_depth[lane] -= 1
+            self.lane_dispatched[lane] += 1
+            self._log(event_type)
+            try:
+                for mailbox in self.consumers.get(event_type, ()):
+                    if not mailbox.put_nowait(lane, event_type, event_data, source):
+                        # Blocking policy, the subscriber is behind (control is still delivered)
+                        await mailbox.put(lane, event_type, event_data, source)
+            finally:
+                self.event_queue.task_done()
+            if not self.lane_dispatched[lane] % 32:
+                # A long backlog must not hold up the mailboxes, control events included
+                await asyncio.sleep(0)
+
+    def _log(self, event_type):
+        if event_type not in self._skip_info:
+            logger.info(f"{FLASH} {event_type}")
 
     async def start(self) -> None:
         self._running = True
         self._task = asyncio.create_task(self._process_events())
+        for mailbox in self.mailboxes.values():
+            mailbox.start()
 
     async def stop(self) -> None:
         self._running = False
@@ -68,4 +317,6 @@ class EventBus(BaseWorker):
         except Exception as e:
             logger.exception(e)
 
+        await asyncio.gather(*(m.stop() for m in self.mailboxes.values()))
+
         await super().stop()
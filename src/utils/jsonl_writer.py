@@ -0,0 +1,160 @@
+import glob
+import gzip
+import json
+import logging
+import os
+import queue
+import shutil
+import threading
+from datetime import datetime
+from time import monotonic
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+_CLOSE = object()
+
+
+class BatchWriter:
+    """
+    Records written in batches by a background thread.
+
+    write() only puts the record into a queue, so it costs microseconds on the event loop.
+    The thread encodes the records and writes them when `flush_size` are buffered or
+    `flush_interval` seconds have passed since the first one. Subclasses implement
+    _encode(), _write_batch() and _closed(), all called from the thread.
+    """
+
+    def __init__(self, flush_size=256, flush_interval=1.0, name="batch_writer"):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+
+        self.written = 0
+        self.flushes = 0
+
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def write(self, record) -> None:
+        self._queue.put(record)
+
+    def stats(self) -> dict:
+        return {"written": self.written, "flushes": self.flushes, "pending": self._queue.qsize()}
+
+    def close(self) -> None:
+        """
+        Flush everything and stop the thread. Blocking, use asyncio.to_thread() on the loop.
+        """
+        if self._thread.is_alive():
+            self._queue.put(_CLOSE)
+            self._thread.join()
+
+    def _encode(self, record):
+        return record
+
+    def _write_batch(self, batch: list) -> None:
+        raise NotImplementedError
+
+    def _closed(self) -> None:
+        pass
+
+    def _run(self):
+        batch = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(deadline - monotonic(), 0)
+            try:
+                record = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                record = None
+
+            if record is _CLOSE:
+                self._flush(batch)
+                self._closed()
+                return
+
+            if record is not None:
+                try:
+                    batch.append(self._encode(record))
+                except Exception as e:
+                    logger.error("Record encoding error: %s", e)
+                if deadline is None:
+                    deadline = monotonic() + self.flush_interval
+
+            if len(batch) >= self.flush_size or (deadline and monotonic() >= deadline):
+                self._flush(batch)
+                batch = []
+                deadline = None
+
+    def _flush(self, batch):
+        if not batch:
+            return
+        try:
+            self._write_batch(batch)
+            self.written += len(batch)
+            self.flushes += 1
+        except Exception as e:
+            logger.exception(e)
+
+
+class JsonlWriter(BatchWriter):
+    """
+    Append-only newline-delimited JSON file written by a background thread (BatchWriter).
+
+    With `max_bytes` the file is rotated when it grows past it: renamed with a timestamp
+    and gzipped by the thread, only the `backups` most recent archives are kept.
+    """
+
+    def __init__(
+        self,
+        path,
+        flush_size=256,
+        flush_interval=1.0,
+        truncate=False,
+        max_bytes: int | None = None,
+        backups: int | None = None,
+        name="jsonl_writer",
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.rotations = 0
+
+        self._file = open(path, "w" if truncate else "a", encoding="utf-8")
+        super().__init__(flush_size, flush_interval, name)
+
+    def stats(self) -> dict:
+        return {**super().stats(), "rotations": self.rotations}
+
+    def _encode(self, record: dict) -> str:
+        return json.dumps(record, ensure_ascii=False, default=str)
+
+    def _write_batch(self, lines: list[str]):
+        self._file.write("\n".join(lines) + "\n")
+        self._file.flush()
+        if self.max_bytes and self._file.tell() >= self.max_bytes:
+            self._rotate()
+
+    def _closed(self):
+        self._file.close()
+
+    def _rotate(self):
+        root, ext = os.path.splitext(self.path)
+        # Archive names sort in rotation order
+        rotated = f"{root}.{datetime.now():%Y%m%d-%H%M%S-%f}{ext}"
+
+        self._file.close()
+        os.replace(self.path, rotated)
+        self._file = open(self.path, "a", encoding="utf-8")
+        self.rotations += 1
+
+        with open(rotated, "rb") as src, gzip.open(rotated + ".gz", "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(rotated)
+
+        if self.backups is not None:
+            archives = sorted(glob.glob(f"{glob.escape(root)}.[0-9]*{ext}.gz"))
+            for archive in archives[: max(len(archives) - self.backups, 0)]:
+                os.remove(archive)
@@ -0,0 +1,72 @@
+import asyncio
+import os
+import resource
+import time
+from collections import deque
+
+
+def percentile(values, p):
+    """
+    The p-th percentile (nearest rank) of the values, 0.0 if there are none.
+    """
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = min(len(values) - 1, max(0, round(p / 100 * (len(values) - 1))))
+    return values[k]
+
+
+class LoopMonitor:
+    """
+    Event loop lag: how late a periodic sleeper wakes up, over the last `window` ticks.
+    """
+
+    def __init__(self, interval=0.05, window=1200):
+        self.interval = interval
+        self.lags = deque(maxlen=window)
+        self.max_lag = 0.0
+        self._task: asyncio.Task | None = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="loop_monitor")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = time.perf_counter() - start - self.interval
+            self.lags.append(lag)
+            if lag > self.max_lag:
+                self.max_lag = lag
+
+    def stats(self) -> dict:
+        """
+        Lag percentiles over the window and the all-time maximum, ms.
+        """
+        lags = sorted(self.lags)
+
+        def pick(p):
+            return round(percentile(lags, p) * 1000, 2)
+
+        return {"p50": pick(50), "p99": pick(99), "max": round(self.max_lag * 1000, 2)}
+
+
+def process_stats() -> dict:
+    """
+    CPU time (user + system, s) and resident memory (MB) of this process, Linux.
+    """
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    with open("/proc/self/statm") as f:
+        rss_pages = int(f.read().split()[1])
+    return {
+        "pid": os.getpid(),
+        "cpu": round(usage.ru_utime + usage.ru_stime, 3),
+        "rss_mb": round(rss_pages * os.sysconf("SC_PAGE_SIZE") / 2**20, 1),
+    }
@@ -0,0 +1,88 @@
+import asyncio
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+class MediaJobExecutor:
+    """
+    Process-wide pool for CPU-heavy media work: encoding, decoding, format conversions.
+
+    Jobs run in threads: pydub hands encoding to ffmpeg and PyAV codecs release the GIL,
+    so the event loop stays responsive while a job runs.
+    """
+
+    def __init__(self, max_workers: int = 2):
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix="media")
+        self._lock = threading.Lock()
+
+        # Stats
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.durations = deque(maxlen=500)  # seconds, last jobs
+        self.waits = deque(maxlen=500)  # seconds in the queue, last jobs
+
+    def submit(self, fn, /, *args, **kwargs) -> asyncio.Future:
+        """
+        Run fn(*args, **kwargs) in the pool, returns an awaitable future.
+        """
+        with self._lock:
+            self.queued += 1
+        loop = asyncio.get_running_loop()
+        return loop.run_in_executor(self._executor, self._run, fn, args, kwargs, perf_counter())
+
+    def _run(self, fn, args, kwargs, submitted):
+        started = perf_counter()
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+            self.waits.append(started - submitted)
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            with self._lock:
+                self.failed += 1
+            raise
+        finally:
+            with self._lock:
+                self.running -= 1
+                self.completed += 1
+                self.durations.append(perf_counter() - started)
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            durations = sorted(self.durations)
+            waits = list(self.waits)
+            return {
+                "queued": self.queued,
+                "running": self.running,
+                "completed": self.completed,
+                "failed": self.failed,
+                "duration_p50": durations[len(durations) // 2] if durations else 0.0,
+                "duration_max": durations[-1] if durations else 0.0,
+                "wait_max": max(waits, default=0.0),
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_executor: MediaJobExecutor | None = None
+
+
+def get_media_executor() -> MediaJobExecutor:
+    """
+    Created on first use, so pre-forked workers each get their own threads.
+    """
+    global _executor
+    if _executor is None:
+        _executor = MediaJobExecutor()
+    return _executor
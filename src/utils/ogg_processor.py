@@ -71,3 +71,68 @@ class OggProcessor:
                 i = 0
                 continue
             i = i + 1
+
+
+def _crcTable():
+    table = []
+    for i in range(256):
+        r = i << 24
+        for _ in range(8):
+            r = ((r << 1) ^ 0x04C11DB7) if r & 0x80000000 else r << 1
+        table.append(r & 0xFFFFFFFF)
+    return table
+
+
+class OggWriter:
+    """
+    Minimal Ogg Opus stream writer, the counterpart of OggProcessor.
+
+    Every addPage() call returns one complete page, so the stream can be sent
+    to the network as it is produced.
+    """
+
+    crcTable = _crcTable()
+    vendor = b"buratino"
+
+    def __init__(self, opusHead: bytes, serial=0x62757261):
+        self.opusHead = opusHead
+        self.serial = serial
+        self.sequence = 0
+        self.granule = 0
+
+    def headerPages(self) -> bytes:
+        tags = b"OpusTags" + struct.pack("<I", len(self.vendor)) + self.vendor + b"\0\0\0\0"
+        return self._page([self.opusHead], 0, 0x02) + self._page([tags], 0, 0)
+
+    def addPage(self, packets, samples) -> bytes:
+        """
+        packets: Opus packets, samples: their duration at 48 kHz.
+        """
+        self.granule += samples
+        return self._page(packets, self.granule, 0)
+
+    def _page(self, packets, granule, flags):
+        lacing = bytearray()
+        for p in packets:
+            lacing += b"\xff" * (len(p) // 255) + bytes([len(p) % 255])
+        if len(lacing) > 255:
+            raise ValueError("Too many packets for one Ogg page")
+
+        page = bytearray(
+            struct.pack(
+                "<4sBBqIIIB", b"OggS", 0, flags, granule, self.serial, self.sequence, 0, len(lacing)
+            )
+        )
+        page += lacing
+        for p in packets:
+            page += p
+        struct.pack_into("<I", page, 22, self._crc(page))
+        self.sequence += 1
+        return bytes(page)
+
+    def _crc(self, data):
+        crc = 0
+        table = self.crcTable
+        for b in data:
+            crc = ((crc << 8) & 0xFFFFFFFF) ^ table[(crc >> 24) ^ b]
+        return crc
@@ -0,0 +1,164 @@
+import asyncio
+import logging
+import os
+from collections import defaultdict
+from time import monotonic
+
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+# httpx pool limits of the process-wide client
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))
+OPENAI_KEEPALIVE_CONNECTIONS = int(os.getenv("OPENAI_KEEPALIVE_CONNECTIONS", "20"))
+OPENAI_KEEPALIVE_EXPIRY = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "60"))
+# Connections opened at boot and kept warm while there are no calls, 0 disables
+OPENAI_WARM_CONNECTIONS = int(os.getenv("OPENAI_WARM_CONNECTIONS", "2"))
+
+
+class ConnectionStats:
+    """
+    Requests and new connections per host, from the httpcore trace of every request.
+    Connections opened by the warm-up requests are counted apart as `warmed`.
+    """
+
+    def __init__(self):
+        self.hosts = defaultdict(
+            lambda: {"requests": 0, "connections": 0, "warmed": 0, "connect_time": 0.0}
+        )
+        self.last_request = 0.0
+
+    async def on_request(self, request: httpx.Request):
+        host = self.hosts[request.url.host]
+        warmup = request.extensions.get("warmup", False)
+        if not warmup:
+            host["requests"] += 1
+            self.last_request = monotonic()
+        connect_start = None
+
+        async def trace(event, info):
+            nonlocal connect_start
+            if event == "connection.connect_tcp.started":
+                connect_start = monotonic()
+                host["warmed" if warmup else "connections"] += 1
+            elif event.endswith("send_request_headers.started") and connect_start is not None:
+                # TCP, TLS and the proxy if any
+                host["connect_time"] += monotonic() - connect_start
+                connect_start = None
+
+        request.extensions["trace"] = trace
+
+    def stats(self) -> dict:
+        stats = {}
+        for name, host in self.hosts.items():
+            opened = host["connections"] + host["warmed"]
+            requests = host["requests"]
+            stats[name] = {
+                "requests": requests,
+                "connections": host["connections"],
+                "warmed": host["warmed"],
+                # Share of the requests sent over an already open connection
+                "reused": round(1 - host["connections"] / requests, 3) if requests else None,
+                "connect_ms": round(host["connect_time"] / max(opened, 1) * 1000, 1),
+            }
+        return stats
+
+
+class OpenAIClient:
+    """
+    AsyncOpenAI shared by the sessions of the process, so its HTTP connections are
+    reused across calls. Keeps `warm` connections open while the process is idle.
+    """
+
+    def __init__(self, warm=OPENAI_WARM_CONNECTIONS, api_key=OPENAI_API_KEY):
+        self.warm = warm
+        self.connections = ConnectionStats()
+        self.http = DefaultAsyncHttpxClient(
+            limits=httpx.Limits(
+                max_connections=OPENAI_MAX_CONNECTIONS,
+                max_keepalive_connections=OPENAI_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY,
+            ),
+            event_hooks={"request": [self.connections.on_request]},
+        )
+        self.client = AsyncOpenAI(api_key=api_key, http_client=self.http)
+        self.warmups = 0
+        self._task: asyncio.Task | None = None
+
+    def start(self):
+        if self._task is None and self.warm > 0:
+            self._task = asyncio.create_task(self._keep_warm(), name="openai_warm")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.client.close()
+
+    async def warm_up(self):
+        """
+        Opens `warm` connections at once with a cheap request, the answer does not matter.
+        """
+        url = self.client.base_url.join("models")
+        headers = {"Authorization": f"Bearer {self.client.api_key}"}
+        results = await asyncio.gather(
+            *(
+                self.http.get(url, headers=headers, timeout=5.0, extensions={"warmup": True})
+                for _ in range(self.warm)
+            ),
+            return_exceptions=True,
+        )
+        self.warmups += 1
+        errors = [r for r in results if isinstance(r, Exception)]
+        if errors:
+            logger.warning(f"OpenAI warm-up: {errors[0]!r}")
+
+    async def _keep_warm(self):
+        # Re-warm before the idle connections expire, unless the calls keep them open
+        interval = OPENAI_KEEPALIVE_EXPIRY * 0.8
+        while True:
+            if monotonic() - self.connections.last_request >= interval:
+                await self.warm_up()
+            await asyncio.sleep(interval)
+
+    def stats(self) -> dict:
+        return {"warmups": self.warmups, "hosts": self.connections.stats()}
+
+
+_client: OpenAIClient | None = None
+
+
+def start_openai_client(warm=OPENAI_WARM_CONNECTIONS) -> OpenAIClient:
+    """
+    Process-wide client, started in the running loop (after the fork in pre-fork mode).
+    """
+    global _client
+    if _client is None:
+        _client = OpenAIClient(warm)
+    _client.start()
+    return _client
+
+
+def get_openai_client() -> AsyncOpenAI:
+    """
+    The shared AsyncOpenAI, created without warm-up on first use if not started.
+    """
+    global _client
+    if _client is None:
+        _client = OpenAIClient(warm=0)
+    return _client.client
+
+
+def openai_client_stats() -> dict | None:
+    return _client.stats() if _client else None
+
+
+async def stop_openai_client():
+    global _client
+    if _client is not None:
+        await _client.stop()
+        _client = None
@@ -0,0 +1,123 @@
+import asyncio
+import base64
+import json
+import logging
+import os
+from collections import defaultdict
+from itertools import count
+from time import monotonic
+
+from utils.jsonl_writer import JsonlWriter
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+# Record/replay of the provider streams, for reproducible offline latency benchmarks.
+#
+#   PROVIDER_TAPE_MODE=record  every session writes its provider streams to a cassette
+#   PROVIDER_TAPE_MODE=replay  sessions get their provider streams from the cassettes
+#   PROVIDER_TAPE_DIR          cassettes directory (default: <project>/tapes)
+#   PROVIDER_TAPE_SPEED        replay speed, 1.0 is the original timing
+#
+# A cassette is a directory per session, with one JSONL file per provider stream:
+# stt_000.jsonl (the whole Deepgram connection), llm_000.jsonl, llm_001.jsonl, ...
+# (one per request). Records are {"t": seconds from the stream start, "kind", "data"}.
+# On replay the n-th session plays the n-th cassette and the n-th request of a provider
+# plays its n-th stream, both wrapping around.
+
+TAPE_MODE = os.getenv("PROVIDER_TAPE_MODE", "")
+TAPE_DIR = os.getenv("PROVIDER_TAPE_DIR", os.path.join(os.path.dirname(__file__), "../../tapes/"))
+TAPE_SPEED = float(os.getenv("PROVIDER_TAPE_SPEED", "1.0"))
+
+
+class TapeRecorder:
+    """
+    One provider stream being recorded with its timing.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.start = monotonic()
+        self._writer = JsonlWriter(path, flush_interval=0.5, truncate=True)
+
+    def record(self, kind: str, data):
+        if isinstance(data, bytes):
+            data = base64.b64encode(data).decode()
+        self._writer.write({"t": round(monotonic() - self.start, 4), "kind": kind, "data": data})
+
+    async def close(self):
+        await asyncio.to_thread(self._writer.close)
+
+
+async def play(path, speed=1.0, binary=False):
+    """
+    Yields (kind, data) of a recorded stream, at its original pace divided by `speed`.
+    """
+    with open(path, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+
+    start = monotonic()
+    for record in records:
+        delay = start + record["t"] / speed - monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        data = record["data"]
+        yield record["kind"], base64.b64decode(data) if binary else data
+
+
+class ProviderTape:
+    """
+    Cassette of one session.
+    """
+
+    _sessions = count()
+
+    def __init__(self, mode=TAPE_MODE, directory=TAPE_DIR, speed=TAPE_SPEED):
+        self.mode = mode
+        self.speed = speed
+        self.directory = os.path.abspath(directory)
+        self.session = next(self._sessions)
+        self._streams = defaultdict(count)
+
+        if self.replaying:
+            cassettes = sorted(
+                d
+                for d in os.listdir(self.directory)
+                if os.path.isdir(os.path.join(self.directory, d))
+            )
+            if not cassettes:
+                raise FileNotFoundError(f"No cassettes in {self.directory}")
+            self.path = os.path.join(self.directory, cassettes[self.session % len(cassettes)])
+        elif self.recording:
+            name = f"{os.getpid()}_{self.session:03d}"
+            self.path = os.path.join(self.directory, name)
+            os.makedirs(self.path, exist_ok=True)
+        else:
+            self.path = None
+
+        if self.path:
+            logger.info(f"Provider tape {self.mode}: {self.path}")
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == "record"
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    def recorder(self, provider: str) -> TapeRecorder:
+        n = next(self._streams[provider])
+        return TapeRecorder(os.path.join(self.path, f"{provider}_{n:03d}.jsonl"))
+
+    def player(self, provider: str, binary=False):
+        """
+        The next recorded stream of the provider.
+        """
+        n = next(self._streams[provider])
+        streams = sorted(f for f in os.listdir(self.path) if f.startswith(f"{provider}_"))
+        if not streams:
+            raise FileNotFoundError(f"No {provider} streams in {self.path}")
+        path = os.path.join(self.path, streams[n % len(streams)])
+        return play(path, self.speed, binary)
@@ -0,0 +1,82 @@
+import asyncio
+import os
+from time import monotonic
+
+# Requests per minute to the OpenAI speech endpoint from this process, and the burst allowed
+TTS_RPM = float(os.getenv("TTS_RPM", "500"))
+TTS_BURST = int(os.getenv("TTS_BURST", "10"))
+
+
+class TokenBucket:
+    """
+    Token bucket rate limiter: `rate` tokens a second, up to `burst` saved up.
+
+    Waiters are served in order (asyncio.Lock is fair), a cancelled waiter takes nothing.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = monotonic()
+
+        self.acquired = 0
+        self.waited = 0  # acquisitions that had to wait
+        self.wait_time = 0.0
+
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, tokens: float = 1) -> float:
+        """
+        Take `tokens`, waiting for them if needed. Returns the seconds waited.
+        """
+        start = monotonic()
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    break
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+
+        waited = monotonic() - start
+        self.acquired += 1
+        if waited > 0.001:
+            self.waited += 1
+            self.wait_time += waited
+        return waited
+
+    def stats(self) -> dict:
+        self._refill()
+        return {
+            "rate": self.rate,
+            "tokens": round(self.tokens, 2),
+            "acquired": self.acquired,
+            "waited": self.waited,
+            "wait_s": round(self.wait_time, 3),
+        }
+
+    def _refill(self):
+        now = monotonic()
+        self.tokens = min(self.tokens + (now - self.updated) * self.rate, self.burst)
+        self.updated = now
+
+
+_limiters: dict[str, TokenBucket] = {}
+
+
+def get_rate_limiter(name: str, rate: float, burst: int) -> TokenBucket:
+    """
+    Process-wide limiter of a provider, shared by all the calls (created on first use).
+    """
+    if name not in _limiters:
+        _limiters[name] = TokenBucket(rate, burst)
+    return _limiters[name]
+
+
+def get_tts_limiter() -> TokenBucket:
+    return get_rate_limiter("tts", TTS_RPM / 60, TTS_BURST)
+
+
+def rate_limit_stats() -> dict:
+    return {name: limiter.stats() for name, limiter in _limiters.items()}
@@ -0,0 +1,60 @@
+import numpy as np
+
+
+class ChunkRingBuffer:
+    """
+    Preallocated float32 ring buffer that is read in fixed-size chunks.
+
+    The capacity is a multiple of the chunk size and reads always consume one
+    whole chunk, so a chunk never wraps around and is returned as a view.
+    Only writes may wrap. Nothing is allocated after construction.
+    """
+
+    def __init__(self, chunk_size: int, chunks: int = 8, scale: float = 1 / 32_767):
+        self.chunk_size = chunk_size
+        self.capacity = chunk_size * chunks
+        self.scale = np.float32(scale)
+        self.data = np.zeros(self.capacity, dtype=np.float32)
+        self.read_pos = 0
+        self.write_pos = 0
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def write(self, samples: np.ndarray) -> int:
+        """
+        Convert int16 samples to float32 in place. Returns the number of dropped samples.
+        """
+        n = len(samples)
+        dropped = 0
+        if n > self.capacity - self.size:
+            # Overrun (the reader fell behind): start over with the newest audio
+            dropped = self.size + max(0, n - self.capacity)
+            samples = samples[-self.capacity :]
+            n = len(samples)
+            self.clear()
+
+        first = min(n, self.capacity - self.write_pos)
+        end = self.write_pos + first
+        np.multiply(samples[:first], self.scale, out=self.data[self.write_pos : end])
+        if first < n:
+            np.multiply(samples[first:], self.scale, out=self.data[: n - first])
+
+        self.write_pos = (self.write_pos + n) % self.capacity
+        self.size += n
+        return dropped
+
+    def read_chunk(self) -> np.ndarray | None:
+        """
+        The oldest complete chunk as a view, valid until the next write.
+        """
+        if self.size < self.chunk_size:
+            return None
+        start = self.read_pos
+        self.read_pos = (start + self.chunk_size) % self.capacity
+        self.size -= self.chunk_size
+        return self.data[start : start + self.chunk_size]
+
+    def clear(self):
+        self.read_pos = self.write_pos = self.size = 0
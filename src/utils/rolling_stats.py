@@ -0,0 +1,87 @@
+from dataclasses import dataclass
+from typing import Iterable
+
+
+@dataclass(frozen=True)
+class WindowStat:
+    """
+    A statistic over the last `window` values.
+
+    Without a threshold it is the mean of the values, with a threshold it is the ratio
+    of values below it (or at/above it when below=False).
+    Until `min_fill` of the window is collected the statistic is 0.0.
+    """
+
+    name: str
+    window: int
+    threshold: float | None = None
+    below: bool = True
+    min_fill: float = 0.0
+
+    def measure(self, value: float) -> float:
+        if self.threshold is None:
+            return value
+        if self.below:
+            return 1.0 if value < self.threshold else 0.0
+        return 1.0 if value >= self.threshold else 0.0
+
+
+class RollingStats:
+    """
+    Running sums for several window/threshold pairs over one stream of values.
+
+    Every push updates all statistics in O(1) each: the new value is added to every sum
+    and the value that leaves a window is subtracted. History is a fixed ring list.
+    """
+
+    resync_every = 10_000  # recompute float sums from history to stop drift
+
+    def __init__(self, stats: Iterable[WindowStat]):
+        self.stats = tuple(stats)
+        self.capacity = max(stat.window for stat in self.stats)
+        self.history = [0.0] * self.capacity
+        self.sums = [0.0] * len(self.stats)
+        self.pos = 0
+        self.count = 0
+        self.last = 0.0
+
+    def push(self, value: float) -> None:
+        pos = self.pos
+        history = self.history
+        for i, stat in enumerate(self.stats):
+            self.sums[i] += stat.measure(value)
+            if self.count >= stat.window:
+                # The oldest value of this window is still in the slot history[pos - window]
+                self.sums[i] -= stat.measure(history[(pos - stat.window) % self.capacity])
+
+        history[pos] = value
+        self.pos = (pos + 1) % self.capacity
+        self.count += 1
+        self.last = value
+
+        if self.count % self.resync_every == 0:
+            self._resync()
+
+    def value(self, index: int) -> float:
+        stat = self.stats[index]
+        n = min(self.count, stat.window)
+        if not n or n < stat.window * stat.min_fill:
+            return 0.0
+        return self.sums[index] / n
+
+    def values(self) -> dict[str, float]:
+        return {stat.name: self.value(i) for i, stat in enumerate(self.stats)}
+
+    def reset(self) -> None:
+        self.history = [0.0] * self.capacity
+        self.sums = [0.0] * len(self.stats)
+        self.pos = 0
+        self.count = 0
+        self.last = 0.0
+
+    def _resync(self) -> None:
+        for i, stat in enumerate(self.stats):
+            n = min(self.count, stat.window)
+            self.sums[i] = sum(
+                stat.measure(self.history[(self.pos - k) % self.capacity]) for k in range(1, n + 1)
+            )
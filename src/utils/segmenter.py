@@ -0,0 +1,174 @@
+import re
+from time import monotonic
+
+# Speaking rate of the TTS voice, to estimate the audio queued ahead of the listener
+CHARS_PER_SECOND = 15.0
+
+# The first segment: any sentence, or a clause of at least this many characters
+CLAUSE_MIN = 15
+# Flushed at a word boundary when the tokens stall: no token for this long, and not
+# before this long before the queued audio runs out
+STALL_BUDGET = 0.35
+STALL_MARGIN = 0.6
+STALL_MIN_WORDS = 3
+# Clauses are split off while less audio than this is queued
+CLAUSE_HEADROOM = 1.0
+MAX_CHARS = 300
+
+ABBREVIATIONS = {
+    "mr", "mrs", "ms", "dr", "prof", "sr", "jr", "st", "mt", "vs", "etc", "approx", "dept",
+    "est", "inc", "ltd", "co", "corp", "vol", "fig", "e.g", "i.e", "a.m", "p.m", "u.s",
+    "jan", "feb", "mar", "apr", "jun", "jul", "aug", "sep", "sept", "oct", "nov", "dec",
+}  # fmt: skip
+
+# Sentence end: punctuation with closing quotes or brackets, then a space (the next token
+# tells "Dr. Smith" and "3.5" from an end), or a line break
+SENTENCE_END = re.compile(r"[.!?…]+[\"'”’)\]]*(?=\s)|\n")
+CLAUSE_END = re.compile(r"[,;:—–](?=\s)|\s-(?=\s)")
+WORD_BEFORE = re.compile(r"([\w.]+)\.+$")
+
+
+def _is_abbreviation(text: str) -> bool:
+    """
+    Whether the period ending `text` belongs to a word: "Dr.", "J.", "e.g.", "1." of a list.
+    """
+    match = WORD_BEFORE.search(text)
+    if not match:
+        return False
+    word = match.group(1)
+    if word.lower() in ABBREVIATIONS:
+        return True
+    # An initial
+    if len(word) == 1 and word.isupper():
+        return True
+    # A list item number at the start of a line
+    if word.isdigit() and len(word) <= 2:
+        start = match.start(1)
+        return start == 0 or text[start - 1] == "\n"
+    return False
+
+
+class Segmenter:
+    """
+    Splits streamed LLM text into segments for TTS, starting the audio as early as possible.
+
+    The first segment is the first sentence or clause. Then segments grow with the audio
+    queued ahead of the listener (estimated from the characters sent): a segment at least
+    as long as the audio queued, so synthesis keeps ahead while the prosody improves.
+    When the tokens stall, a segment is flushed at a word boundary after timeout().
+    """
+
+    def __init__(self, clock=monotonic):
+        self.clock = clock
+        self.buffer = ""
+        self.sent = 0  # characters sent
+        self.started: float | None = None  # first segment sent
+        self.last_token: float | None = None
+
+    def headroom(self) -> float:
+        """
+        Seconds of audio queued ahead of the listener.
+        """
+        if self.started is None:
+            return 0.0
+        return max(self.started + self.sent / CHARS_PER_SECOND - self.clock(), 0.0)
+
+    def push(self, text: str) -> list[str]:
+        if text:
+            self.last_token = self.clock()
+        self.buffer += text
+        return self._split()
+
+    def timeout(self) -> float | None:
+        """
+        Seconds until the buffer is flushed if no token comes, None to wait for the next one.
+        """
+        if len(self.buffer.split()) <= STALL_MIN_WORDS:
+            return None
+        deadline = self.last_token + STALL_BUDGET
+        if self.started is not None:
+            audio_end = self.started + self.sent / CHARS_PER_SECOND
+            deadline = max(deadline, audio_end - STALL_MARGIN)
+        return max(deadline - self.clock(), 0.0)
+
+    def stall(self) -> list[str]:
+        """
+        The tokens stalled: send the buffer up to the last boundary or the last whole word,
+        even one after "Dr." if there is no other. Sending nothing waits a budget again.
+        """
+        cut = self._last_boundary(clauses=True) or self._last_space() or self._last_space(hard=True)
+        segment = self._send(cut) if cut > 0 else ""
+        if not segment:
+            self.last_token = self.clock()
+            return []
+        return [segment]
+
+    def flush(self) -> list[str]:
+        """
+        End of the stream: the rest of the buffer.
+        """
+        segments = self._split()
+        if self.buffer.strip():
+            segments.append(self._send(len(self.buffer)))
+        self.buffer = ""
+        return segments
+
+    def _split(self) -> list[str]:
+        segments = []
+        while cut := self._next_cut():
+            if segment := self._send(cut):
+                segments.append(segment)
+        return segments
+
+    def _next_cut(self) -> int | None:
+        if self.started is None:
+            target, clauses = 0, True
+        else:
+            headroom = self.headroom()
+            target = min(headroom * CHARS_PER_SECOND, MAX_CHARS)
+            clauses = headroom < CLAUSE_HEADROOM
+
+        for end in self._boundaries(clauses):
+            if end >= target and (end >= CLAUSE_MIN or self._sentence_end(end)):
+                return end
+        if len(self.buffer) > MAX_CHARS:
+            # A hard cut if there is not even a space
+            cut = self._last_boundary(clauses=True) or self.buffer.rfind(" ", 0, MAX_CHARS) + 1
+            return cut or MAX_CHARS
+        return None
+
+    def _boundaries(self, clauses: bool):
+        ends = [m.end() for m in SENTENCE_END.finditer(self.buffer)]
+        ends = [
+            e for e in ends if self.buffer[e - 1] != "." or not _is_abbreviation(self.buffer[:e])
+        ]
+        if clauses:
+            ends += [m.end() for m in CLAUSE_END.finditer(self.buffer)]
+        return sorted(ends)
+
+    def _sentence_end(self, end: int) -> bool:
+        return self.buffer[end - 1] not in ",;:—–-"
+
+    def _last_boundary(self, clauses: bool) -> int:
+        ends = self._boundaries(clauses)
+        return ends[-1] if ends else 0
+
+    def _last_space(self, hard: bool = False) -> int:
+        # The last word may be incomplete, and "Dr." or "3." may not end a segment unless hard
+        for match in reversed(list(re.finditer(r"\s+", self.buffer.rstrip()))):
+            head = self.buffer[: match.start()]
+            if (
+                hard
+                or not head.endswith(".")
+                or not _is_abbreviation(head)
+                and not head[-2:-1].isdigit()
+            ):
+                return match.start()
+        return 0
+
+    def _send(self, cut: int) -> str:
+        segment, self.buffer = self.buffer[:cut].strip(), self.buffer[cut:]
+        if segment and self.started is None:
+            self.started = self.clock()
+        self.sent += len(segment)
+        return segment
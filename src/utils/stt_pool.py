@@ -0,0 +1,188 @@
+import asyncio
+import logging
+import os
+from collections import deque
+from time import monotonic
+
+from deepgram import AsyncLiveClient, DeepgramClientOptions, LiveOptions
+from deepgram import LiveTranscriptionEvents as LTE
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Deepgram live connections kept open per process, 0 disables the pool
+STT_POOL_SIZE = int(os.getenv("STT_POOL_SIZE", "2"))
+# Idle connections are replaced after this many seconds
+STT_POOL_MAX_IDLE = float(os.getenv("STT_POOL_MAX_IDLE", "300"))
+
+RETRY_MIN = 1.0
+RETRY_MAX = 30.0
+
+
+class DeepgramPool:
+    """
+    Live connections opened ahead of the calls and kept alive by the client keepalive.
+
+    A session checks a connection out and owns it from then on, the pool opens
+    another one in the background. Idle connections closed by the server or older
+    than `max_idle` are replaced.
+    """
+
+    def __init__(
+        self,
+        client_options: DeepgramClientOptions,
+        options: LiveOptions,
+        size=STT_POOL_SIZE,
+        max_idle=STT_POOL_MAX_IDLE,
+    ):
+        self.client_options = client_options
+        self.options = options
+        self.size = size
+        self.max_idle = max_idle
+
+        self._idle: deque[tuple[float, AsyncLiveClient]] = deque()  # (opened at, client)
+        self._closing: set[asyncio.Task] = set()
+        self._wakeup: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+
+        self.hits = 0
+        self.misses = 0
+        self.opened = 0
+        self.recycled = 0
+        self.dropped = 0  # closed by the server while idle
+        self.failed = 0
+        self.connect_times = deque(maxlen=100)
+
+    def start(self):
+        if self._task is None and self.size > 0:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run(), name="stt_pool")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        while self._idle:
+            self._close(self._idle.popleft()[1])
+        await asyncio.gather(*self._closing, return_exceptions=True)
+
+    async def checkout(self, options: LiveOptions) -> AsyncLiveClient | None:
+        """
+        An open connection with the same options, None if there is none ready.
+        """
+        if self._task is None or options.to_dict() != self.options.to_dict():
+            return None
+
+        try:
+            while self._idle:
+                _, client = self._idle.popleft()
+                if await client.is_connected():
+                    self.hits += 1
+                    return client
+                self.dropped += 1
+            self.misses += 1
+            return None
+        finally:
+            self._wakeup.set()
+
+    def stats(self) -> dict:
+        times = sorted(self.connect_times)
+        return {
+            "size": self.size,
+            "idle": len(self._idle),
+            "hits": self.hits,
+            "misses": self.misses,
+            "opened": self.opened,
+            "recycled": self.recycled,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "connect_p50_ms": round(times[len(times) // 2] * 1000, 1) if times else 0.0,
+        }
+
+    async def _run(self):
+        retry = RETRY_MIN
+        while True:
+            self._recycle()
+
+            missing = self.size - len(self._idle)
+            if missing > 0:
+                results = await asyncio.gather(
+                    *(self._connect() for _ in range(missing)), return_exceptions=True
+                )
+                errors = [r for r in results if isinstance(r, BaseException)]
+                self._idle.extend(
+                    (monotonic(), r) for r in results if not isinstance(r, BaseException)
+                )
+                if errors:
+                    self.failed += len(errors)
+                    logger.warning(f"STT pool: {errors[0]!r}, retry in {retry:.0f}s")
+                    await asyncio.sleep(retry)
+                    retry = min(retry * 2, RETRY_MAX)
+                else:
+                    retry = RETRY_MIN
+                continue
+
+            # Sleep until a checkout, a drop or the next idle connection expires
+            oldest = self._idle[0][0] if self._idle else monotonic()
+            self._wakeup.clear()
+            try:
+                async with asyncio.timeout(max(oldest + self.max_idle - monotonic(), 0.0)):
+                    await self._wakeup.wait()
+            except TimeoutError:
+                pass
+
+    async def _connect(self) -> AsyncLiveClient:
+        start = monotonic()
+        client = AsyncLiveClient(self.client_options)
+        client.on(LTE.Close, self._on_close)
+        if not await client.start(self.options):
+            raise ConnectionError("Deepgram not connected")
+        self.connect_times.append(monotonic() - start)
+        self.opened += 1
+        return client
+
+    def _recycle(self):
+        now = monotonic()
+        while self._idle and now - self._idle[0][0] >= self.max_idle:
+            self.recycled += 1
+            self._close(self._idle.popleft()[1])
+
+    def _close(self, client: AsyncLiveClient):
+        task = asyncio.create_task(client.finish())
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    async def _on_close(self, client, *args, **kwargs):
+        # Stays subscribed after a checkout, then the client is not in the pool any more
+        for entry in self._idle:
+            if entry[1] is client:
+                self._idle.remove(entry)
+                self.dropped += 1
+                self._wakeup.set()
+                break
+
+
+_pool: DeepgramPool | None = None
+
+
+def start_stt_pool(client_options: DeepgramClientOptions, options: LiveOptions) -> DeepgramPool:
+    """
+    Process-wide pool, started in the running loop (after the fork in pre-fork mode).
+    """
+    global _pool
+    if _pool is None:
+        _pool = DeepgramPool(client_options, options)
+    _pool.start()
+    return _pool
+
+
+def get_stt_pool() -> DeepgramPool | None:
+    return _pool
+
+
+async def stop_stt_pool():
+    global _pool
+    if _pool is not None:
+        await _pool.stop()
+        _pool = None
@@ -0,0 +1,204 @@
+import asyncio
+import hashlib
+import logging
+import mmap
+import os
+import struct
+from collections import OrderedDict
+from itertools import count
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", os.path.join(ROOT, "tts_cache"))
+TTS_CACHE_MEMORY_MB = float(os.getenv("TTS_CACHE_MEMORY_MB", "32"))
+TTS_CACHE_DISK_MB = float(os.getenv("TTS_CACHE_DISK_MB", "512"))
+# Longer texts are unlikely to be said again
+TTS_CACHE_MAX_CHARS = int(os.getenv("TTS_CACHE_MAX_CHARS", "120"))
+
+# File: magic, segment count, then (size, duration) per segment, then the segments
+MAGIC = b"TTSC\x01\x00\x00\x00"
+COUNT = struct.Struct("<I")
+SEGMENT = struct.Struct("<Id")
+# The disk tier is pruned every this many writes
+PRUNE_EVERY = 100
+
+Segments = list[tuple[bytes | memoryview, float]]
+
+
+def cache_key(text: str, voice: str, model: str, response_format: str) -> str:
+    return hashlib.sha256(f"{model}\0{voice}\0{response_format}\0{text}".encode()).hexdigest()
+
+
+def _size(segments: Segments) -> int:
+    return sum(len(segment) for segment, _ in segments)
+
+
+class TTSCache:
+    """
+    Opus segments and durations of synthesized texts, by (text, voice, model, format).
+
+    Two tiers: an LRU in memory, and one file per text on disk that pre-fork workers
+    share. The files are memory-mapped, so the segments read from them are views into
+    the page cache: one copy for all the workers.
+    """
+
+    def __init__(
+        self,
+        directory=TTS_CACHE_DIR,
+        memory_bytes=int(TTS_CACHE_MEMORY_MB * 2**20),
+        disk_bytes=int(TTS_CACHE_DISK_MB * 2**20),
+    ):
+        self.directory = directory
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        os.makedirs(directory, exist_ok=True)
+
+        self._memory: OrderedDict[str, Segments] = OrderedDict()
+        self._memory_size = 0
+        self._writes = count(1)
+        self._tasks = set()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self.audio_saved = 0.0  # seconds
+
+    async def get(self, key: str) -> Segments | None:
+        """
+        The cached segments, from memory or from disk (read off the loop).
+        """
+        segments = self._memory.get(key)
+        if segments is not None:
+            self._memory.move_to_end(key)
+            self.memory_hits += 1
+        else:
+            try:
+                segments = await asyncio.to_thread(self._read, key)
+            except Exception as e:
+                logger.warning(f"TTS cache read failed: {e!r}")
+            if segments is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._remember(key, segments)
+
+        self.bytes_saved += _size(segments)
+        self.audio_saved += sum(duration for _, duration in segments)
+        return segments
+
+    def put(self, key: str, segments: Segments) -> None:
+        """
+        Cache the segments of a complete synthesis. The file is written in the background.
+        """
+        if not segments or key in self._memory:
+            return
+        self._remember(key, segments)
+        task = asyncio.create_task(asyncio.to_thread(self._write, key, segments))
+        self._tasks.add(task)
+        task.add_done_callback(self._written)
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 3) if lookups else 0.0,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "bytes_saved": self.bytes_saved,
+            "audio_saved_s": round(self.audio_saved, 1),
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_size,
+        }
+
+    def _remember(self, key: str, segments: Segments):
+        self._memory[key] = segments
+        self._memory_size += _size(segments)
+        while self._memory_size > self.memory_bytes and len(self._memory) > 1:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_size -= _size(evicted)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.opus")
+
+    def _read(self, key: str) -> Segments | None:
+        try:
+            with open(self._path(key), "rb") as file:
+                data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):  # ValueError: empty file
+            return None
+
+        view = memoryview(data)
+        if view[: len(MAGIC)] != MAGIC:
+            return None
+        offset = len(MAGIC)
+        (n,) = COUNT.unpack_from(view, offset)
+        offset += COUNT.size
+        headers = [SEGMENT.unpack_from(view, offset + i * SEGMENT.size) for i in range(n)]
+        offset += n * SEGMENT.size
+
+        segments = []
+        for size, duration in headers:
+            segments.append((view[offset : offset + size], duration))
+            offset += size
+        return segments
+
+    def _write(self, key: str, segments: Segments):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Written aside and renamed: other workers never map a partial file
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as file:
+            file.write(MAGIC + COUNT.pack(len(segments)))
+            file.write(b"".join(SEGMENT.pack(len(s), d) for s, d in segments))
+            for segment, _ in segments:
+                file.write(segment)
+        os.replace(tmp, path)
+
+        if next(self._writes) % PRUNE_EVERY == 0:
+            self._prune()
+
+    def _prune(self):
+        """
+        Delete the oldest files while the disk tier is over its size.
+        """
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.is_dir():
+                for file in os.scandir(entry):
+                    stat = file.stat()
+                    files.append((stat.st_mtime, stat.st_size, file.path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def _written(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception():
+            logger.warning(f"TTS cache write failed: {task.exception()!r}")
+
+
+_cache: TTSCache | None = None
+
+
+def get_tts_cache() -> TTSCache:
+    """
+    Process-wide cache, created on first use.
+    """
+    global _cache
+    if _cache is None:
+        _cache = TTSCache()
+    return _cache
+
+
+def tts_cache_stats() -> dict | None:
+    return _cache.stats() if _cache else None
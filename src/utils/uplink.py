@@ -0,0 +1,112 @@
+import numpy as np
+from av import AudioFrame, codec
+
+from tracks.fanout import DecodedFrame
+from utils.ogg_processor import OggWriter
+
+# STT uplink encodings.
+#
+# WebRTC delivers 48 kHz stereo s16 frames with both channels identical (mono mic),
+# linear16 stereo is ~1.5 Mbit/s per session. Deepgram needs neither the second channel
+# nor 48 kHz: mono halves it, 16 kHz mono is 6x less, Ogg/Opus ~20-30x less.
+#
+# The Opus payload of the incoming RTP packets cannot be forwarded as is:
+# aiortc decodes it inside the receiver and tracks only yield decoded frames.
+# So the "opus" uplink re-encodes mono 48 kHz with libopus.
+
+
+def downmix(samples: np.ndarray) -> np.ndarray:
+    """
+    Interleaved stereo int16 -> mono int16, mean of the two channels.
+    """
+    stereo = samples.reshape(-1, 2)
+    return ((stereo[:, 0].astype(np.int32) + stereo[:, 1]) >> 1).astype(np.int16)
+
+
+class UplinkEncoder:
+    """
+    Converts decoded frames (see tracks/fanout.py) to the bytes sent to the STT service.
+
+    encode() is called for every frame, flush() before every send: encoders that
+    group frames (Ogg pages) return the group there.
+    """
+
+    name = "stereo"
+    # LiveOptions fields
+    options = {"encoding": "linear16", "channels": 2, "sample_rate": 48000}
+
+    def encode(self, frame: DecodedFrame) -> bytes:
+        return frame.pcm48.tobytes()
+
+    def flush(self) -> bytes:
+        return b""
+
+
+class MonoEncoder(UplinkEncoder):
+    name = "mono"
+    options = {"encoding": "linear16", "channels": 1, "sample_rate": 48000}
+
+    def encode(self, frame: DecodedFrame) -> bytes:
+        return downmix(frame.pcm48).tobytes()
+
+
+class Mono16kEncoder(UplinkEncoder):
+    name = "mono16k"
+    options = {"encoding": "linear16", "channels": 1, "sample_rate": 16000}
+
+    def encode(self, frame: DecodedFrame) -> bytes:
+        # Resampled once by the fan-out, shared with VAD
+        return frame.pcm16.tobytes()
+
+
+class OggOpusEncoder(UplinkEncoder):
+    name = "opus"
+    # Containerized audio: Deepgram reads the format from the stream
+    options = {"encoding": None, "channels": None, "sample_rate": None}
+
+    def __init__(self, bit_rate=24_000):
+        self.codec = codec.CodecContext.create("libopus", "w")
+        self.codec.sample_rate = 48000
+        self.codec.layout = "mono"
+        self.codec.format = "s16"
+        self.codec.bit_rate = bit_rate
+        self.codec.open()
+
+        self.ogg = OggWriter(bytes(self.codec.extradata))
+        self.header = self.ogg.headerPages()
+        self.packets = []
+        self.samples = 0
+        self.pts = 0
+
+    def encode(self, frame: DecodedFrame) -> bytes:
+        mono = AudioFrame.from_ndarray(
+            downmix(frame.pcm48).reshape(1, -1), format="s16", layout="mono"
+        )
+        mono.sample_rate = 48000
+        mono.pts = self.pts
+        self.pts += mono.samples
+
+        for packet in self.codec.encode(mono):
+            self.packets.append(bytes(packet))
+            self.samples += packet.duration
+        return b""
+
+    def flush(self) -> bytes:
+        data, self.header = self.header, b""
+        if self.packets:
+            data += self.ogg.addPage(self.packets, self.samples)
+            self.packets = []
+            self.samples = 0
+        return data
+
+
+UPLINK_ENCODERS = {
+    cls.name: cls for cls in (UplinkEncoder, MonoEncoder, Mono16kEncoder, OggOpusEncoder)
+}
+
+
+def create_uplink_encoder(name: str) -> UplinkEncoder:
+    try:
+        return UPLINK_ENCODERS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown uplink encoding: {name}, expected {list(UPLINK_ENCODERS)}")
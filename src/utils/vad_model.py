@@ -0,0 +1,211 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+import numpy as np
+from silero_vad import load_silero_vad
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+# A single ONNX session is shared by every call in the process.
+# The recurrent state (and the 64-sample context window) of Silero VAD lives outside
+# the model, so each session keeps its own small VADStream instead of a model copy.
+
+
+class SileroVAD:
+    sampling_rate = 16_000
+    chunk_size = 512
+    context_size = 64
+    state_shape = (2, 1, 128)
+
+    def __init__(self):
+        # OnnxWrapper is used only as a loader, its own state is never touched
+        wrapper = load_silero_vad(onnx=True)
+        self.session = wrapper.session
+        self._sr = np.array(self.sampling_rate, dtype=np.int64)
+
+    def infer(self, chunks: np.ndarray, states: np.ndarray, contexts: np.ndarray):
+        """
+        Run a forward pass for a batch of chunks.
+
+        chunks:   (batch, chunk_size) float32
+        states:   (2, batch, 128) float32
+        contexts: (batch, context_size) float32
+
+        Returns speech probabilities (batch,) and the new states (2, batch, 128).
+        """
+        x = np.concatenate([contexts, chunks], axis=1)
+        ort_inputs = {"input": x, "state": states, "sr": self._sr}
+        out, new_states = self.session.run(None, ort_inputs)
+        return out[:, 0], new_states
+
+    def create_stream(self) -> "VADStream":
+        return VADStream(self)
+
+
+class VADStream:
+    """
+    Per-session recurrent state for the shared model.
+    """
+
+    def __init__(self, model: SileroVAD):
+        self.model = model
+        self.reset()
+
+    def reset(self):
+        self.state = np.zeros(self.model.state_shape, dtype=np.float32)
+        self.context = np.zeros((1, self.model.context_size), dtype=np.float32)
+
+    def update(self, chunk: np.ndarray, state: np.ndarray):
+        self.state = state
+        self.context = chunk[-self.model.context_size :].reshape(1, -1).copy()
+
+    def __call__(self, chunk: np.ndarray) -> float:
+        chunks = chunk.reshape(1, -1)
+        probs, state = self.model.infer(chunks, self.state, self.context)
+        self.update(chunk, state)
+        return float(probs[0])
+
+
+class VADScheduler:
+    """
+    Collects pending chunks from all sessions and runs one batched forward pass per tick.
+
+    The first chunk of a tick waits at most `max_wait` seconds for other sessions to join,
+    inference itself runs in a dedicated thread, so the event loop is never blocked.
+    """
+
+    def __init__(self, model: SileroVAD, max_batch: int = 64, max_wait: float = 0.002):
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+
+        self._pending: list[tuple[VADStream, np.ndarray, asyncio.Future]] = []
+        self._has_pending = asyncio.Event()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="vad")
+        self._task: asyncio.Task | None = None
+        self._running = False
+
+        # Stats
+        self.batches = 0
+        self.chunks = 0
+        self.max_tick_time = 0.0
+
+    async def infer(self, stream: VADStream, chunk: np.ndarray) -> float:
+        """
+        Queue a chunk of a session and wait for its speech probability.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((stream, chunk, future))
+        self._has_pending.set()
+        return await future
+
+    def start(self):
+        if self._task is None:
+            self._running = True
+            self._task = asyncio.create_task(self._run(), name="vad_scheduler")
+
+    async def stop(self):
+        self._running = False
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        for _, _, future in self._pending:
+            future.cancel()
+        self._pending.clear()
+
+    @property
+    def mean_batch(self) -> float:
+        return self.chunks / self.batches if self.batches else 0.0
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while self._running:
+            await self._has_pending.wait()
+
+            # Let the other sessions join the batch
+            if len(self._pending) < self.max_batch:
+                await asyncio.sleep(self.max_wait)
+
+            batch = self._pending[: self.max_batch]
+            del self._pending[: self.max_batch]
+            if not self._pending:
+                self._has_pending.clear()
+
+            start = perf_counter()
+            try:
+                probs = await loop.run_in_executor(self._executor, self._forward, batch)
+            except Exception as e:
+                logger.exception(e)
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.max_tick_time = max(self.max_tick_time, perf_counter() - start)
+            self.batches += 1
+            self.chunks += len(batch)
+
+            for (_, _, future), prob in zip(batch, probs):
+                if not future.done():
+                    future.set_result(float(prob))
+
+    def _forward(self, batch) -> np.ndarray:
+        chunks = np.stack([chunk for _, chunk, _ in batch])
+        states = np.concatenate([stream.state for stream, _, _ in batch], axis=1)
+        contexts = np.concatenate([stream.context for stream, _, _ in batch])
+
+        probs, new_states = self.model.infer(chunks, states, contexts)
+
+        for i, (stream, chunk, _) in enumerate(batch):
+            stream.update(chunk, new_states[:, i : i + 1])
+        return probs
+
+
+_model: SileroVAD | None = None
+_scheduler: VADScheduler | None = None
+_lock = threading.Lock()
+
+
+def load_vad_model() -> SileroVAD:
+    """
+    Load the process-wide model. Safe to call many times, loads only once.
+    Blocking: call it at boot or through asyncio.to_thread().
+    """
+    global _model
+    with _lock:
+        if _model is None:
+            logger.info("Loading Silero VAD model")
+            _model = SileroVAD()
+    return _model
+
+
+def get_vad_model() -> SileroVAD:
+    if _model is None:
+        # Not preloaded (e.g. a script), fall back to a blocking load
+        logger.warning("Silero VAD model was not preloaded")
+        return load_vad_model()
+    return _model
+
+
+def get_vad_scheduler() -> VADScheduler:
+    """
+    Process-wide batching scheduler, started on first use in the running loop.
+    """
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = VADScheduler(get_vad_model())
+    _scheduler.start()
+    return _scheduler
+
+
+async def stop_vad_scheduler():
+    global _scheduler
+    if _scheduler is not None:
+        await _scheduler.stop()
+        _scheduler = None
@@ -1,22 +1,34 @@
 import abc
 import asyncio
 import logging
+import time
+from typing import TYPE_CHECKING
 
-from utils.event_bus import EventBus
+if TYPE_CHECKING:
+    from utils.event_bus import EventBus
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
 
 class BaseWorker(abc.ABC):
-    def __init__(self, event_bus: EventBus):
-        self._event_bus: EventBus = event_bus
+    # Event bus mailbox of the worker, see utils.event_bus.Mailbox
+    mailbox_size = 1000
+    mailbox_overflow = "block"
+
+    def __init__(self, event_bus: "EventBus"):
+        self._event_bus: "EventBus" = event_bus
         self._running = False
         self.event_types = []
 
     async def start(self):
         self._running = True
-        self._event_bus.subscribe(self.handle_message, self.event_types + ["abort"])
+        self._event_bus.subscribe(
+            self.handle_message,
+            self.event_types + ["abort"],
+            maxsize=self.mailbox_size,
+            overflow=self.mailbox_overflow,
+        )
 
     async def run_forever(self):
         while self._running:
@@ -29,7 +41,15 @@ class BaseWorker(abc.ABC):
     def emit(self, name, payload, /, **kwargs):
         pl = {"type": name, "payload": payload}
         pl.update(kwargs)
-        self._event_bus.publish(pl)
+        self._event_bus.publish(pl, source=self)
+
+    def mark(self, stage, turn=None, /, **args):
+        """
+        Timestamp a pipeline stage of a turn (see EventTracer).
+        """
+        payload = {"stage": stage, "turn": turn, "ts": time.time()}
+        payload.update(args)
+        self.emit("trace_mark", payload)
 
     async def handle_message(self, message):
         await self.handle_custom_message(message)
@@ -1,32 +1,90 @@
+import asyncio
 import json
+import logging
 import os
+import sys
 import time
+from collections import OrderedDict, defaultdict, deque
 from datetime import datetime
 
+from utils.jsonl_writer import JsonlWriter
+from utils.loop_monitor import percentile
+
 from .base import BaseWorker
 
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# One trace per connection: <name>.jsonl while it runs, <name>.json once it is stopped
+TRACE_DIR = os.getenv("TRACE_DIR", os.path.join(os.path.dirname(__file__), "../../traces/"))
+
+# Stages of a turn, in pipeline order, from the user stopping to the agent speaking
+STAGES = (
+    "vad_end",
+    "turn_taken",
+    "llm_request",
+    "llm_first_token",
+    "llm_first_sentence",
+    "tts_request",
+    "tts_first_page",
+    "tts_first_packet",
+)
+
+
+# stage -> seconds since vad_end of the recent turns of all the calls of the process
+_latencies: dict[str, deque] = defaultdict(lambda: deque(maxlen=1000))
+
+
+def stage_percentiles(latencies) -> dict[str, dict[str, float]]:
+    """
+    p50/p95/p99 in ms since vad_end for every stage with latencies.
+    """
+    return {
+        stage: {f"p{p}": round(percentile(latencies[stage], p) * 1000, 1) for p in (50, 95, 99)}
+        for stage in STAGES
+        if latencies.get(stage)
+    }
+
+
+def turn_latency_stats() -> dict | None:
+    """
+    Stage percentiles over the calls of this process, for /metrics.
+    """
+    return stage_percentiles(_latencies) or None
+
 
 class EventTracer(BaseWorker):
-    def __init__(self, event_bus, save_path="trace_events.json"):
+    def __init__(self, event_bus, name="trace_events", directory=TRACE_DIR):
         super().__init__(event_bus)
-        self.save_path = save_path
-        self.events = []
-        self.event_types = ["*"]
+        name = f"{datetime.now():%Y%m%d_%H%M%S}_{name}"
+        self.save_path = os.path.join(directory, f"{name}.json")
+        self.log_path = os.path.join(directory, f"{name}.jsonl")
+        self.writer: JsonlWriter | None = None
+        self.event_types = ["speech_started", "on_speech_final", "on_utterance_end", "trace_mark"]
+
+        # turn -> {stage: ts}, only recent turns are kept
+        self.turns: OrderedDict[int, dict[str, float]] = OrderedDict()
+        self.max_turns = 20
+        self.last_vad_end: float | None = None
+
+        # stage -> seconds since vad_end, for p50/p95/p99
+        self.latencies: dict[str, deque] = defaultdict(lambda: deque(maxlen=1000))
 
     async def start(self):
         """Start tracing all events."""
         await super().start()
 
-        # Create a template file
+        # Events are appended to a newline-delimited log by a background thread,
+        # the Chrome trace JSON is produced on stop (or with to_chrome_trace)
         metadata = {
             "source": "DevTools",
             "startTime": datetime.now().isoformat(),
             "networkThrottling": "No throttling",
             "dataOrigin": "TraceEvents",
         }
-        content = {"metadata": metadata, "traceEvents": []}
-        with open(self.save_path, "w") as f:
-            f.write(json.dumps(content, indent=2, default=str))
+        os.makedirs(os.path.dirname(self.log_path), exist_ok=True)
+        self.writer = JsonlWriter(self.log_path, name="event_tracer")
+        self.writer.write({"metadata": metadata})
 
     async def handle_custom_message(self, message):
         """Process incoming messages based on their type."""
@@ -35,6 +93,8 @@ class EventTracer(BaseWorker):
                 await self.trace_event("Speech", "S")
             case "on_speech_final" | "on_utterance_end":
                 await self.trace_event("Speech", "E")
+            case "trace_mark":
+                await self._handle_mark(message["payload"])
             # case "llm_request":
             #     pass
             # case "llm_response":
@@ -42,68 +102,97 @@ class EventTracer(BaseWorker):
             # case "llm_response_done":
             #     await self._handle_llm_response_done(message)
 
-    async def trace_event(self, name, phase="I", args=None):
+    async def _handle_mark(self, payload):
+        """
+        Record the first occurrence of a stage in a turn as a span from the previous stage.
+        """
+        stage, turn, ts = payload["stage"], payload["turn"], payload["ts"]
+
+        if stage == "vad_end":
+            self.last_vad_end = ts
+            return
+
+        stages = self.turns.get(turn)
+        if stages is None:
+            if stage != "turn_taken":
+                return  # not a turn started by the user
+            stages = self.turns[turn] = {"vad_end": self.last_vad_end or ts}
+            while len(self.turns) > self.max_turns:
+                self.turns.popitem(last=False)
+
+        if stage in stages:
+            return
+
+        start = stages["vad_end"]
+        prev = max(stages.values())
+        stages[stage] = ts
+        self.latencies[stage].append(ts - start)
+        _latencies[stage].append(ts - start)
+
+        args = {"turn": turn, "since_vad_end_ms": round((ts - start) * 1000, 1)}
+        await self.trace_event(stage, "X", args, ts=prev, dur=max(ts - prev, 0.0), tid=2)
+
+        if stage == STAGES[-1]:
+            steps = "  ".join(
+                f"{s}: {(stages[s] - start) * 1000:.0f}" for s in STAGES[1:] if s in stages
+            )
+            logger.info(f"Turn {turn} latency, ms  {steps}")
+
+    def percentiles(self) -> dict[str, dict[str, float]]:
+        """
+        p50/p95/p99 in ms since vad_end for every stage seen so far.
+        """
+        return stage_percentiles(self.latencies)
+
+    async def trace_event(self, name, phase="I", args=None, ts=None, dur=None, tid=1):
         """Handle and record an incoming event."""
-        timestamp = time.time()
+        timestamp = time.time() if ts is None else ts
         trace_event = {
-            "ts": int(timestamp * 100),  # Convert to microseconds
+            "ts": int(timestamp * 1_000_000),  # Convert to microseconds
             "ph": phase,
             "name": name,
             "cat": "event",
             "pid": 1,  # Process ID
-            "tid": 1,  # Thread ID
+            "tid": tid,  # Thread ID
             "args": args or {},
         }
-        self.events.append(trace_event)
-        # Periodically flush to disk
-        if len(self.events) >= 1:
-            await self.flush_to_disk()
-
-    async def flush_to_disk(self):
-        """Write buffered events to disk."""
-
-        if not self.events:
-            return
-
-        # Prepare the JSON dumps for new events
-        event_dumps = [json.dumps(event) for event in self.events]
-        self.events = []
-
-        with open(self.save_path, "r+") as f:
-            # Move the pointer to the end of the file
-            pos = f.seek(0, os.SEEK_END)
-
-            # Scan backward for the closing of the traceEvents array
-            while pos > 0:
-                pos -= 1
-                f.seek(pos, os.SEEK_SET)
-                if f.read(1) == "]":
-                    break
-
-            # Find prev non-empty symbol
-            has_events = False
-            while pos > 0:
-                f.seek(pos - 1, os.SEEK_SET)
-                match f.read(1):
-                    case " " | "\n":  # empty space
-                        pos -= 1
-                        continue
-                    case "]" | "}":  # last element closing
-                        has_events = True
-                        break
-                    case _:
-                        break
-
-            f.truncate(pos)
-            f.seek(0, os.SEEK_END)
-
-            if has_events:
-                f.write(",")
-
-            # Write the new events and restore the file structure
-            f.write("\n    " + ",\n".join(event_dumps) + "\n  ]\n}")
+        if dur is not None:
+            trace_event["dur"] = int(dur * 1_000_000)
+        if self.writer:  # None once stopped
+            self.writer.write(trace_event)
 
     async def stop(self):
-        """File footer"""
+        """Flush the trace log and convert it to the Chrome trace format."""
+        if self.writer is None:
+            return
         await super().stop()
-        await self.flush_to_disk()
+        if percentiles := self.percentiles():
+            logger.info(f"Turn latency percentiles, ms: {percentiles}")
+        writer, self.writer = self.writer, None
+        await asyncio.to_thread(writer.close)
+        await asyncio.to_thread(to_chrome_trace, self.log_path, self.save_path)
+
+
+def to_chrome_trace(src, dst):
+    """
+    Convert a newline-delimited trace log into the Chrome `traceEvents` JSON.
+    """
+    metadata = {}
+    events = []
+    with open(src, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if "metadata" in record:
+                metadata = record["metadata"]
+            else:
+                events.append(record)
+
+    with open(dst, "w", encoding="utf-8") as f:
+        json.dump({"metadata": metadata, "traceEvents": events}, f, indent=2, default=str)
+
+
+if __name__ == "__main__":
+    # python -m workers.event_tracer trace_events.jsonl trace_events.json
+    to_chrome_trace(sys.argv[1], sys.argv[2])
@@ -1,25 +1,55 @@
 import asyncio
 import logging
-import os
 
-from openai import AsyncOpenAI
+from openai.types.chat import ChatCompletionChunk
 
+from utils.openai_client import get_openai_client
+from utils.provider_tape import ProviderTape
+from utils.segmenter import Segmenter
 from workers.base import BaseWorker
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
 MODEL = "gpt-4o-mini"
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+
+
+class Speculation:
+    """
+    Generation started before the turn is taken. Its parts are held back until the turn
+    is taken with the same context, or it is cancelled.
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self.parts = asyncio.Queue()
+        self.tokens = 0  # content chunks received
+        self.turn = None  # set when released
+        self.failed = False
+        self.task: asyncio.Task | None = None
+
+    async def released(self):
+        while (part := await self.parts.get()) is not None:
+            yield part
+
+    def cancel(self):
+        if self.task:
+            self.task.cancel()
 
 
 class LLMWorker(BaseWorker):
-    def __init__(self, event_bus):
+    def __init__(self, event_bus, tape: ProviderTape | None = None):
         super().__init__(event_bus)
+        self.tape = tape
         self.current_task = None
-        self.client = AsyncOpenAI(api_key=OPENAI_API_KEY)
-        self.event_types = ["llm_request", "llm_abort"]
-        self.sentence_delimiter = (".", "!", "?", "\n", "\t", ";")
+        self.client = get_openai_client()
+        self.event_types = ["llm_request", "llm_abort", "llm_speculate"]
+
+        self.speculation: Speculation | None = None
+        self.speculation_hits = 0
+        self.speculation_misses = 0
+        self.speculation_restarts = 0
+        self.wasted_tokens = 0
 
     async def handle_custom_message(self, message):
         match message.get("type"):
@@ -28,14 +58,115 @@ class LLMWorker(BaseWorker):
 
                 chat_ctx = message["payload"].get("chat_ctx")
                 tools_ctx = message["payload"].get("tools_ctx")
+                turn = message["payload"].get("turn")
+
+                # A user turn settles the speculation, tool call follow-ups leave it running
+                spec = None
+                if "speculation" in message["payload"]:
+                    spec = self.settle_speculation(message["payload"]["speculation"])
 
-                task_coro = self.make_llm_call(chat_ctx, tools_ctx)
+                if spec:
+                    task_coro = self.release_speculation(spec, chat_ctx, tools_ctx, turn)
+                else:
+                    task_coro = self.make_llm_call(chat_ctx, tools_ctx, turn)
                 self.current_task = asyncio.create_task(task_coro)
 
+            case "llm_speculate":
+                # Not stopped by llm_abort: the user is still speaking when it starts
+                self.speculate(message["payload"])
+
             case "llm_abort":
                 self.handle_abort()
 
-    async def make_llm_call(self, chat_ctx, tools_ctx=None):
+    def speculate(self, payload):
+        key = payload.get("key")
+        if self.speculation and self.speculation.key == key:
+            return
+        if self.speculation:
+            self.speculation_restarts += 1
+            self._cancel_speculation(self.speculation)
+            self.speculation = None
+        if key is None:
+            return
+
+        self.speculation = Speculation(key)
+        params = self._params(payload["chat_ctx"], payload.get("tools_ctx"))
+        self.speculation.task = asyncio.create_task(self._speculate(self.speculation, params))
+
+    def settle_speculation(self, key) -> Speculation | None:
+        """
+        The speculation to release if it was started for this turn, else it is cancelled.
+        """
+        spec, self.speculation = self.speculation, None
+        hit = spec is not None and key is not None and spec.key == key and not spec.failed
+        if hit:
+            self.speculation_hits += 1
+        else:
+            self.speculation_misses += 1
+            if spec:
+                self._cancel_speculation(spec)
+        logger.info(f"LLM speculation {'hit' if hit else 'miss'}: {self.speculation_stats()}")
+        return spec if hit else None
+
+    def speculation_stats(self) -> dict:
+        settled = self.speculation_hits + self.speculation_misses
+        return {
+            "hits": self.speculation_hits,
+            "misses": self.speculation_misses,
+            "hit_rate": round(self.speculation_hits / settled, 3) if settled else None,
+            "restarts": self.speculation_restarts,
+            "wasted_tokens": self.wasted_tokens,
+        }
+
+    def _cancel_speculation(self, spec: Speculation):
+        self.wasted_tokens += spec.tokens
+        spec.cancel()
+
+    async def _speculate(self, spec: Speculation, params):
+        try:
+            result = await self._completion(params)
+            async for part in self._group_chunks(self._count_tokens(result, spec)):
+                spec.parts.put_nowait(part)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            spec.failed = True
+            logger.exception(e)
+        finally:
+            spec.parts.put_nowait(None)
+
+    async def _count_tokens(self, completion, spec: Speculation):
+        async for chunk in completion:
+            if chunk.choices and chunk.choices[0].delta.content is not None:
+                if not spec.tokens and spec.turn is not None:
+                    self.mark("llm_first_token", spec.turn)
+                spec.tokens += 1
+            yield chunk
+
+    async def release_speculation(self, spec: Speculation, chat_ctx, tools_ctx=None, turn=None):
+        """
+        Emit the parts of the speculation, the context is for a new request if it failed.
+        """
+        spec.turn = turn
+        if spec.tokens:
+            self.mark("llm_first_token", turn)
+        try:
+            emitted = await self._emit_parts(spec.released(), turn)
+            if spec.failed and not emitted:
+                logger.warning("LLM speculation failed, new request")
+                result = await self._completion(self._params(chat_ctx, tools_ctx))
+                await self._emit_parts(self._group_chunks(result, turn), turn)
+
+        except asyncio.CancelledError:
+            spec.cancel()
+            logger.error("LLM request was aborted")
+
+        finally:
+            old_task = self.current_task
+            self.current_task = None
+            self.emit("llm_response_done", {"task": old_task})
+
+    def _params(self, chat_ctx, tools_ctx=None) -> dict:
         params = dict(
             model=MODEL,
             messages=chat_ctx,
@@ -49,16 +180,12 @@ class LLMWorker(BaseWorker):
                 tool_choice="auto",
                 parallel_tool_calls=False,
             )
+        return params
 
+    async def make_llm_call(self, chat_ctx, tools_ctx=None, turn=None):
         try:
-            result = await self.client.chat.completions.create(**params)
-
-            async for part in self._group_chunks(result):
-                if "text" in part:
-                    self.emit("llm_response", part)
-
-                if "tool_calls" in part:
-                    self.emit("llm_tool_calls", part)
+            result = await self._completion(self._params(chat_ctx, tools_ctx))
+            await self._emit_parts(self._group_chunks(result, turn), turn)
 
         except asyncio.CancelledError:
             logger.error("LLM request was aborted")
@@ -68,24 +195,74 @@ class LLMWorker(BaseWorker):
             self.current_task = None
             self.emit("llm_response_done", {"task": old_task})
 
-    async def _group_chunks(self, completion):
-        buffer = ""
-        tool_calls = {}
+    async def _emit_parts(self, parts, turn=None) -> int:
+        """
+        Emit the parts as responses and tool calls, returns their number.
+        """
         first = True
+        emitted = 0
+        async for part in parts:
+            emitted += 1
+            if "text" in part:
+                if first:
+                    first = False
+                    self.mark("llm_first_sentence", turn)
+                self.emit("llm_response", part)
+
+            if "tool_calls" in part:
+                self.emit("llm_tool_calls", part)
+        return emitted
+
+    async def _completion(self, params):
+        """
+        Chunk stream of the request: from OpenAI, recorded or replayed if there is a tape.
+        """
+        if self.tape and self.tape.replaying:
+            return (
+                ChatCompletionChunk.model_validate_json(data)
+                async for _, data in self.tape.player("llm")
+            )
+        if self.tape and self.tape.recording:
+            recorder = self.tape.recorder("llm")
+            try:
+                completion = await self.client.chat.completions.create(**params)
+            except BaseException:
+                await recorder.close()
+                raise
+            return self._record(completion, recorder)
+        return await self.client.chat.completions.create(**params)
+
+    async def _record(self, completion, recorder):
+        try:
+            async for chunk in completion:
+                recorder.record("chunk", chunk.model_dump_json())
+                yield chunk
+        finally:
+            await recorder.close()
+
+    async def _group_chunks(self, completion, turn=None):
+        segmenter = Segmenter()
+        tool_calls = {}
+        first_token = True
+
+        async for chunk in _stalled(completion, segmenter):
+            # No token within the time budget
+            if chunk is None:
+                for text in segmenter.stall():
+                    yield {"text": text}
+                continue
 
-        async for chunk in completion:
             delta = chunk.choices[0].delta
             finish_reason = chunk.choices[0].finish_reason
 
             # Process content chunks
             if delta.content is not None:
-                buffer += delta.content
-                # Send the first chunk short(ly) to minimize latency
-                min_len = 50 if first else 150
-                if buffer.endswith(self.sentence_delimiter) and len(buffer) > min_len:
-                    first = False
-                    yield {"text": buffer.strip()}
-                    buffer = ""
+                if first_token and turn is not None:
+                    first_token = False
+                    self.mark("llm_first_token", turn)
+                # The first clause as soon as it is complete, then longer segments
+                for text in segmenter.push(delta.content):
+                    yield {"text": text}
 
             # Process tool calls
             for tool_call in delta.tool_calls or []:
@@ -111,11 +288,48 @@ class LLMWorker(BaseWorker):
                 tool_calls = {}
 
         # Emit any remaining context buffer
-        if buffer:
-            yield {"text": buffer.strip()}
+        for text in segmenter.flush():
+            yield {"text": text}
+
+    async def stop(self):
+        self.handle_abort()
+        if self.speculation:
+            self._cancel_speculation(self.speculation)
+            self.speculation = None
+        await super().stop()
 
     def handle_abort(self):
         if self.current_task and not self.current_task.done():
             logger.error("Abort llm task")
             self.current_task.cancel()
             self.current_task = None
+
+
+_END = object()
+
+
+async def _stalled(chunks, segmenter: Segmenter):
+    """
+    The chunks, with None when the segmenter's time budget runs out before the next one.
+    """
+    chunks = aiter(chunks)
+    pending = None
+    try:
+        while True:
+            timeout = segmenter.timeout()
+            if pending is None and timeout is None:
+                chunk = await anext(chunks, _END)
+            else:
+                if pending is None:
+                    pending = asyncio.ensure_future(anext(chunks, _END))
+                done, _ = await asyncio.wait({pending}, timeout=timeout)
+                if not done:
+                    yield None
+                    continue
+                chunk, pending = pending.result(), None
+            if chunk is _END:
+                return
+            yield chunk
+    finally:
+        if pending is not None:
+            pending.cancel()
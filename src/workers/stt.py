@@ -1,16 +1,26 @@
-import io
+import asyncio
 import logging
 import os
 from datetime import datetime
-
-from deepgram import AsyncLiveClient, DeepgramClientOptions, LiveOptions, LiveResultResponse
+from time import monotonic
+
+from deepgram import (
+    AsyncLiveClient,
+    DeepgramClientOptions,
+    LiveOptions,
+    LiveResultResponse,
+    UtteranceEndResponse,
+)
 from deepgram import LiveTranscriptionEvents as LTE
 from dotenv import load_dotenv
-from pydub import AudioSegment
 from termcolor import colored
 
 from tracks.stt_track import STTTrack
+from utils.audio_log import AudioLogWriter
 from utils.event_bus import EventBus
+from utils.provider_tape import ProviderTape
+from utils.stt_pool import get_stt_pool
+from utils.uplink import create_uplink_encoder
 from workers.base import BaseWorker
 
 logger = logging.getLogger(__name__)
@@ -22,159 +32,204 @@ load_dotenv()
 
 DT = "%H:%M:%S.%f"
 DEEPGRAM_API_KEY = os.getenv("DEEPGRAM_API_KEY")
+# Another Deepgram endpoint, e.g. the local stand-in of loadtest/standins.py
+DEEPGRAM_URL = os.getenv("DEEPGRAM_URL", "")
 AUDIO_LOG_PATH = os.path.join(os.path.dirname(__file__), "../../audio_log/")
-
-
-def stereo_to_mono(pcm_data: bytearray) -> bytes:
-    """
-    Convert stereo PCM audio (16-bit, 48kHz) to mono using pydub.
-    """
-    audio = AudioSegment.from_raw(
-        io.BytesIO(pcm_data),
-        sample_width=2,  # 16-bit audio = 2 bytes
-        frame_rate=48000,
-        channels=2,  # Stereo
+# stereo | mono | mono16k | opus, see utils/uplink.py
+STT_UPLINK = os.getenv("STT_UPLINK", "mono16k")
+
+
+def live_options(uplink: str = STT_UPLINK) -> LiveOptions:
+    # Configure live transcription options
+    #
+    # https://developers.deepgram.com/docs/understand-endpointing-interim-results
+    #
+    options = LiveOptions(
+        model="nova-2",
+        language="en-US",
+        filler_words=False,
+        profanity_filter=False,
+        numerals=False,
+        no_delay=True,  # не ждать номер после любой цифры
+        smart_format=False,  # разметка текста
+        #
+        punctuate=True,
+        #
+        # The utterance_end feature is based on word timings,
+        # and words can be detected in either final or interim results.
+        # Interim results are created around once every second.
+        # utterance_end_ms="3000",  # require interim_results=True
+        #
+        # Endpointing: bool or int (silence window, ms)
+        # Time in milliseconds of silence to wait for before finalizing speech
+        #
+        # Uses VAD to detect silence and set the speech_final flag.
+        #
+        # Works well only in a silent environment.
+        # A significant amount of background noise may prevent
+        # the speech_final=true flag from being sent.
+        #
+        # By default, Deepgram identifies an endpoint after 10 milliseconds (ms) of silence.
+        #
+        endpointing=100,  # for SPEECH_FINAL (VAD PAUSE)
+        #
+        # Interim Results feature
+        interim_results=True,  # for IS_FINAL=True/False - identifies if the text is final
+        ###
+        vad_events=False,  # события SpeechStarted
+        ###
+        encoding="linear16",
+        channels=2,
+        sample_rate=48000,
+    )
+    # Format of the audio sent, set by the uplink encoder
+    for key, value in create_uplink_encoder(uplink).options.items():
+        setattr(options, key, value)
+    return options
+
+
+def client_options() -> DeepgramClientOptions:
+    # TODO: test this:
+    # auto_flush_speak_delta
+    # endpointing
+    # punctuate
+
+    return DeepgramClientOptions(
+        options={"keepalive": "true", "auto_flush_speak_delta": 500},
+        api_key=DEEPGRAM_API_KEY,
+        url=DEEPGRAM_URL,
+        verbose=logging.FATAL,  # мало логов
+        # verbose=logging.NOTSET,  # много логов
+        # verbose=logging.DEBUG,  # много логов
     )
-    mono_audio = audio.set_channels(1)
-    return mono_audio.raw_data
 
 
 class STTWorker(BaseWorker):
-    def __init__(self, event_bus: EventBus) -> None:
+    def __init__(
+        self, event_bus: EventBus, uplink: str = STT_UPLINK, tape: ProviderTape | None = None
+    ) -> None:
         super().__init__(event_bus)
         self.is_finals = []
-        self.audio_data = bytearray(b"")
+        self.audio_log = None
 
-        self.event_types = ["stt_save"]
-
-        # Configure live transcription options
-        #
-        # https://developers.deepgram.com/docs/understand-endpointing-interim-results
-        #
-        self.options = LiveOptions(
-            model="nova-2",
-            language="en-US",
-            filler_words=False,
-            profanity_filter=False,
-            numerals=False,
-            no_delay=True,  # не ждать номер после любой цифры
-            smart_format=False,  # разметка текста
-            #
-            punctuate=True,
-            #
-            # The utterance_end feature is based on word timings,
-            # and words can be detected in either final or interim results.
-            # Interim results are created around once every second.
-            # utterance_end_ms="3000",  # require interim_results=True
-            #
-            # Endpointing: bool or int (silence window, ms)
-            # Time in milliseconds of silence to wait for before finalizing speech
-            #
-            # Uses VAD to detect silence and set the speech_final flag.
-            #
-            # Works well only in a silent environment.
-            # A significant amount of background noise may prevent
-            # the speech_final=true flag from being sent.
-            #
-            # By default, Deepgram identifies an endpoint after 10 milliseconds (ms) of silence.
-            #
-            endpointing=100,  # for SPEECH_FINAL (VAD PAUSE)
-            #
-            # Interim Results feature
-            interim_results=True,  # for IS_FINAL=True/False - identifies if the text is final
-            ###
-            vad_events=False,  # события SpeechStarted
-            ###
-            encoding="linear16",
-            channels=2,
-            sample_rate=48000,
-        )
+        self.tape = tape
+        self.tape_recorder = None
+        self.tape_task = None
 
-        # TODO: test this:
-        # auto_flush_speak_delta
-        # endpointing
-        # punctuate
-
-        client_options = DeepgramClientOptions(
-            options={"keepalive": "true", "auto_flush_speak_delta": 500},
-            api_key=DEEPGRAM_API_KEY,
-            verbose=logging.FATAL,  # мало логов
-            # verbose=logging.NOTSET,  # много логов
-            # verbose=logging.DEBUG,  # много логов
-        )
+        self.uplink = uplink
+        self.uplink_bytes = 0
+        self.uplink_audio = 0.0  # seconds of audio sent
 
-        self.deepgram = AsyncLiveClient(client_options)
+        self.event_types = ["stt_save"]
 
-        self.deepgram.on(LTE.Open, self.on_open)
-        self.deepgram.on(LTE.Close, self.on_close)
-        self.deepgram.on(LTE.Transcript, self.on_transcript)
-        self.deepgram.on(LTE.Metadata, self.on_metadata)
-        self.deepgram.on(LTE.UtteranceEnd, self.on_utterance_end)
-        self.deepgram.on(LTE.SpeechStarted, self.on_speech_started)
-        self.deepgram.on(LTE.Finalize, self.on_finalize)
-        self.deepgram.on(LTE.Error, self.on_error)
-        self.deepgram.on(LTE.Unhandled, self.on_unhandled)
-        self.deepgram.on(LTE.Warning, self.on_error)
+        self.options = live_options(self.uplink)
+        self.deepgram: AsyncLiveClient | None = None
 
     async def start(self):
         await super().start()
-        res = await self.deepgram.start(self.options)
-        connected = await self.deepgram.is_connected()
-        print(colored(f"start res: {res}, con: {connected}", "red"))
-        if not connected:
-            raise Exception("DG not connected")
+        loop = asyncio.get_running_loop()
+
+        def on_closed(file_name, duration):
+            payload = {"file_name": file_name, "duration": duration}
+            loop.call_soon_threadsafe(self.emit, "audio_log_ready", payload)
+
+        self.audio_log = AudioLogWriter(AUDIO_LOG_PATH, on_closed)
+
+        if self.tape and self.tape.replaying:
+            # Recorded Deepgram messages instead of the connection
+            self.tape_task = asyncio.create_task(self._replay(), name="stt_replay")
+            return
+        if self.tape and self.tape.recording:
+            self.tape_recorder = self.tape.recorder("stt")
+
+        start = monotonic()
+        pool = get_stt_pool()
+        client = await pool.checkout(self.options) if pool else None
+        self.deepgram = client or AsyncLiveClient(client_options())
+        self.subscribe(self.deepgram)
+
+        if client is None:
+            res = await self.deepgram.start(self.options)
+            connected = await self.deepgram.is_connected()
+            print(colored(f"start res: {res}, con: {connected}", "red"))
+            if not connected:
+                raise Exception("DG not connected")
+        logger.info(
+            f"STT connected in {(monotonic() - start) * 1000:.0f} ms"
+            f" ({'pooled' if client else 'new connection'})"
+        )
+
+    def subscribe(self, client: AsyncLiveClient):
+        client.on(LTE.Open, self.on_open)
+        client.on(LTE.Close, self.on_close)
+        client.on(LTE.Transcript, self.on_transcript)
+        client.on(LTE.Metadata, self.on_metadata)
+        client.on(LTE.UtteranceEnd, self.on_utterance_end)
+        client.on(LTE.SpeechStarted, self.on_speech_started)
+        client.on(LTE.Finalize, self.on_finalize)
+        client.on(LTE.Error, self.on_error)
+        client.on(LTE.Unhandled, self.on_unhandled)
+        client.on(LTE.Warning, self.on_error)
 
     async def stop(self):
+        if not self._running:
+            return  # stopped when the track ended
         logger.warning("Stop STT...")
-        await self.deepgram.finish()
-        logger.info("Deepgram finished")
+        if self.tape_task:
+            self.tape_task.cancel()
+        elif self.deepgram:
+            await self.deepgram.finish()
+            logger.info("Deepgram finished")
+        if self.tape_recorder:
+            await self.tape_recorder.close()
+        logger.info(f"STT uplink: {self.uplink_stats()}")
+        if self.audio_log:
+            await asyncio.to_thread(self.audio_log.close)
         await super().stop()
 
     async def handle_custom_message(self, message):
         match message["type"]:
             case "stt_save":
-                self.save()
+                await self.save()
 
-    def save(self):
-        if not self.audio_data:
-            return
-        logger.warning("Saving audio...")
-        file_name = self.save_audio(self.audio_data)
-        self.emit("audio_log_ready", {"file_name": file_name})
-        self.audio_data = bytearray(b"")
-        self.is_finals = []
-
-    def save_audio(self, pcm_data):
+    async def save(self):
         """
-        Save the raw audio data to a compressed file.
+        Close the current audio log segment, audio_log_ready is emitted once it is written.
         """
-        file_name = datetime.now().strftime("%Y%m%d_%H%M%S")
-
-        data_dir = os.path.abspath(AUDIO_LOG_PATH)
-        if not os.path.exists(data_dir):
-            os.makedirs(data_dir)
-        file_path = os.path.join(data_dir, f"{file_name}.mp3")
-
-        audio = AudioSegment.from_raw(
-            io.BytesIO(pcm_data),
-            sample_width=2,
-            frame_rate=48000,
-            channels=2,
-        )
-        audio.export(file_path, format="mp3", bitrate="160k")
-
-        logger.info(f"Saved audio duration: {audio.duration_seconds}")
+        logger.warning("Saving audio...")
+        self.audio_log.rotate()
+        self.is_finals = []
 
-        return file_name
+    def uplink_stats(self) -> dict:
+        seconds = self.uplink_audio
+        return {
+            "encoding": self.uplink,
+            "bytes": self.uplink_bytes,
+            "seconds": round(seconds, 2),
+            "bytes_per_sec": round(self.uplink_bytes / seconds) if seconds else 0,
+        }
 
     def create_track(self, track):
-        return STTTrack(track, self.on_voice_data)
+        return STTTrack(track, self.on_voice_data, create_uplink_encoder(self.uplink))
 
-    async def on_voice_data(self, data):
-        # takes 0.1-0.2 ms
-        # data = stereo_to_mono(data)
-        self.audio_data += data
-        await self.deepgram.send(data)
+    async def on_voice_data(self, pcm, uplink):
+        # The track reuses its buffers
+        self.audio_log.write(bytes(pcm))
+        self.uplink_bytes += len(uplink)
+        self.uplink_audio += len(pcm) / (48000 * 2 * 2)  # s16 stereo
+        if uplink and self.deepgram:
+            await self.deepgram.send(uplink)
+
+    async def _replay(self):
+        try:
+            async for kind, data in self.tape.player("stt"):
+                match kind:
+                    case "transcript":
+                        await self.on_transcript(None, LiveResultResponse.from_json(data))
+                    case "utterance_end":
+                        await self.on_utterance_end(None, UtteranceEndResponse.from_json(data))
+        except Exception as e:
+            logger.exception(e)
 
     async def on_open(self, *args, **kwargs):
         logger.info("STT Connection Opened")
@@ -189,6 +244,9 @@ class STTWorker(BaseWorker):
     async def on_transcript(self, caller, result: LiveResultResponse, **kwargs):
         """Process transcription results."""
 
+        if self.tape_recorder:
+            self.tape_recorder.record("transcript", result.to_json())
+
         try:
             alt_chosen = result.channel.alternatives[0]
             transcript = alt_chosen.transcript
@@ -227,6 +285,9 @@ class STTWorker(BaseWorker):
     async def on_utterance_end(self, caller, utterance_end, **kwargs):
         """Handle end of utterance."""
 
+        if self.tape_recorder:
+            self.tape_recorder.record("utterance_end", utterance_end.to_json())
+
         logger.info(colored("  ON_UTTERANCE_END ", "red", attrs=["reverse"]))
 
         stop = datetime.now()
@@ -1,34 +1,99 @@
 import asyncio
 import logging
 import os
+from contextlib import aclosing
 from fractions import Fraction
 
 from av import codec
 from av.packet import Packet
-from openai import AsyncOpenAI
 
 from tracks.tts_track import TTSTrack
+from utils.media_jobs import get_media_executor
 from utils.ogg_processor import OggProcessor
+from utils.openai_client import get_openai_client
+from utils.provider_tape import ProviderTape
+from utils.rate_limit import get_tts_limiter
+from utils.tts_cache import TTS_CACHE_MAX_CHARS, cache_key, get_tts_cache
 
 from .base import BaseWorker
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.WARNING)
 
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+MODEL = "tts-1"
+VOICE = "alloy"
+FORMAT = "opus"
+
+# Sentences of a turn synthesized at the same time, ahead of the one playing
+TTS_AHEAD = int(os.getenv("TTS_AHEAD", "3"))
+
+
+class Synthesis:
+    """
+    One sentence being synthesized, its decoded segments are queued until its turn to play.
+    """
+
+    def __init__(self, turn, text):
+        self.turn = turn
+        self.text = text
+        self.segments = asyncio.Queue()  # (segment, duration), None at the end
+        self.task: asyncio.Task | None = None
+
+
+class SegmentDecoder:
+    """
+    Opus decoder of one TTS response, only used to measure segment durations.
+
+    One instance per request: decoder state is never shared between concurrent requests.
+    """
+
+    def __init__(self):
+        self.codec = None
+        self.sample_rate = 0
+        self.channels = 0
+
+    def __call__(self, segments):
+        """
+        [(segment, meta), ...] -> [(segment, duration), ...]. Blocking, runs in the executor.
+        """
+        result = []
+        for segment, meta in segments:
+            if self.sample_rate != meta["sampleRate"] or self.channels != meta["channelCount"]:
+                self._init_codec(meta["channelCount"], meta["sampleRate"])
+            sample_count = sum(f.samples for f in self.codec.decode(Packet(segment)))
+            result.append((segment, sample_count / self.sample_rate))
+        return result
+
+    def _init_codec(self, channels, sample_rate):
+        self.codec = codec.CodecContext.create("opus", "r")
+        self.codec.sample_rate = sample_rate
+        self.codec.channels = channels
+        self.sample_rate = sample_rate
+        self.channels = channels
 
 
 class TTSWorker(BaseWorker):
-    def __init__(self, event_bus):
+    def __init__(self, event_bus, tape: ProviderTape | None = None, cache: bool = True):
+        """
+        cache=False: every phrase is synthesized, e.g. to measure the synthesis itself.
+        """
         super().__init__(event_bus)
 
-        self.client = AsyncOpenAI(api_key=OPENAI_API_KEY)
+        self.tape = tape
+        self.client = get_openai_client()
         self.event_types = ["tts_request", "tts_abort"]
 
         self.ttsTrack = TTSTrack(self.get_audio_packet)
 
         self.tts_queue = asyncio.Queue()
         self.packetq = asyncio.Queue()
+        # Sentences in synthesis, handed to packetq in order by _play_syntheses
+        self.syntheses = asyncio.Queue()
+        self.active: set[Synthesis] = set()
+        self.slots = asyncio.Semaphore(TTS_AHEAD)
+        self.limiter = get_tts_limiter()
+        # Phrases said again are played from the cache, not while a tape plays or records
+        self.cache = get_tts_cache() if cache and tape is None else None
         self.lock = asyncio.Lock()
 
         self.tts_speech_active = False
@@ -41,17 +106,18 @@ class TTSWorker(BaseWorker):
         self.time_base = 48000
         self.time_base_fraction = Fraction(1, self.time_base)
 
-        self.gcodec = None
-        self.gsample_rate = 0
-        self.gchannels = 0
-
         self.speech_stopped = asyncio.Event()
 
         self.current_turn = 0
+        self.played_turn = None  # turn of the last non-silence packet
+        self._tasks: list[asyncio.Task] = []
 
     async def start(self) -> None:
         await super().start()
-        asyncio.create_task(self._process_tts_requests(), name="process_tts")
+        self._tasks = [
+            asyncio.create_task(self._process_tts_requests(), name="process_tts"),
+            asyncio.create_task(self._play_syntheses(), name="play_tts"),
+        ]
 
         async def _queue_waiter_1(event):
             while self._running:
@@ -65,8 +131,16 @@ class TTSWorker(BaseWorker):
                 self.emit("tts_speech_stopped", {"reason": "end"})
                 self.speech_stopped.clear()
 
-        asyncio.create_task(_queue_waiter_1(self.speech_started))
-        asyncio.create_task(_queue_waiter_2(self.speech_stopped))
+        self._tasks.append(asyncio.create_task(_queue_waiter_1(self.speech_started)))
+        self._tasks.append(asyncio.create_task(_queue_waiter_2(self.speech_stopped)))
+
+    async def stop(self):
+        await super().stop()
+        for synthesis in self.active:
+            synthesis.task.cancel()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
 
     async def handle_custom_message(self, message):
         match message["type"]:
@@ -85,6 +159,7 @@ class TTSWorker(BaseWorker):
 
         # FIXME: this                        vvvv
         self.current_turn = last_aborted_turn + 1
+        self._cancel_syntheses()
 
     async def _handle_tts_request(self, message):
         text = message["payload"]["text"] + "\n"
@@ -92,46 +167,143 @@ class TTSWorker(BaseWorker):
         await self.tts_queue.put((turn, text))
 
     async def _process_tts_requests(self):
+        """
+        Starts the synthesis of the queued sentences, up to TTS_AHEAD at a time.
+        """
         while self._running:
-            # Process requests in the order they are queued
             turn, text = await self.tts_queue.get()
-            if turn < self.current_turn or not self._running:
-                self.tts_queue.task_done()
-                continue
             try:
-                await self._requestTTS(turn, text)
-                if self._running:
-                    await asyncio.sleep(1)  # rate limit
-            except Exception as e:
-                logger.error(f"Error processing TTS request: {e}")
+                if turn < self.current_turn or not self._running:
+                    continue
+                await self.slots.acquire()
+                if turn < self.current_turn:
+                    self.slots.release()
+                    continue
+                synthesis = Synthesis(turn, text)
+                synthesis.task = asyncio.create_task(self._synthesize(synthesis), name="tts")
+                self.active.add(synthesis)
+                self.syntheses.put_nowait(synthesis)
             finally:
                 self.tts_queue.task_done()
 
-    async def _requestTTS(self, turn, request):
-        request_id = id(request)  # Unique ID for tracking request
-        async with self.client.audio.speech.with_streaming_response.create(
-            model="tts-1",
-            voice="alloy",
-            input=request,
-            response_format="opus",
-        ) as response:
+    async def _play_syntheses(self):
+        """
+        Hands the segments to packetq sentence by sentence, in the order they were requested.
+        """
+        while self._running:
+            synthesis = await self.syntheses.get()
+            while (item := await synthesis.segments.get()) is not None:
+                if synthesis.turn == self.current_turn:
+                    self.on_segment(synthesis.turn, *item)
+
+    def _cancel_syntheses(self):
+        # Aborted turns stop downloading now, _play_syntheses skips what they queued
+        for synthesis in self.active:
+            if synthesis.turn < self.current_turn:
+                synthesis.task.cancel()
+
+    async def _synthesize(self, synthesis: Synthesis):
+        try:
+            key = None
+            if self.cache and len(synthesis.text) <= TTS_CACHE_MAX_CHARS:
+                key = cache_key(synthesis.text.strip(), VOICE, MODEL, FORMAT)
+                if await self._play_cached(synthesis, key):
+                    return
 
-            def on_segment_with_turn(segment, meta):
-                if turn == self.current_turn:
-                    self.on_segment(turn, segment, meta)
+            # Shared by all the calls of the process
+            await self.limiter.acquire()
+            if synthesis.turn >= self.current_turn:
+                segments = []
 
-            oggProcessor = OggProcessor(on_segment_with_turn)
+                def on_segment(item):
+                    segments.append(item)
+                    synthesis.segments.put_nowait(item)
 
-            logger.info(f"start chunks {request_id}")
-            async for chunk in response.iter_bytes(chunk_size=4096):
+                complete = await self._requestTTS(synthesis.turn, synthesis.text, on_segment)
+                if key and complete:
+                    self.cache.put(key, segments)
+        except asyncio.CancelledError:
+            logger.info(f"TTS request of aborted turn {synthesis.turn} cancelled")
+        except Exception as e:
+            logger.error(f"Error processing TTS request: {e}")
+        finally:
+            synthesis.segments.put_nowait(None)
+            self.active.discard(synthesis)
+            self.slots.release()
+
+    async def _play_cached(self, synthesis: Synthesis, key) -> bool:
+        segments = await self.cache.get(key)
+        if segments is None:
+            return False
+        self.mark("tts_request", synthesis.turn)
+        self.mark("tts_first_page", synthesis.turn)
+        for item in segments:
+            synthesis.segments.put_nowait(item)
+        return True
+
+    async def _requestTTS(self, turn, request, on_segment) -> bool:
+        """
+        Streams the speech of the text to on_segment, False if the turn was aborted meanwhile.
+        """
+        request_id = id(request)  # Unique ID for tracking request
+        self.mark("tts_request", turn)
+        # Pages are split on the loop (cheap), segments are decoded in the media executor
+        segments = []
+        oggProcessor = OggProcessor(lambda segment, meta: segments.append((segment, meta)))
+        decoder = SegmentDecoder()
+        executor = get_media_executor()
+        first_page = True
+
+        logger.info(f"start chunks {request_id}")
+        async with aclosing(self._speech_stream(request)) as stream:
+            async for chunk in stream:
                 if turn < self.current_turn:
                     logger.error(f"Chunk for aborted turn {turn} [ct: {self.current_turn}]")
-                    return
+                    return False
                 oggProcessor.addBuffer(chunk)
                 logger.info(f"Received chunk for request {request_id}")
+                if not segments:
+                    continue
+
+                if first_page:
+                    first_page = False
+                    self.mark("tts_first_page", turn)
 
-            logger.info(f"end chunks {request_id}")
-        logger.info(f"end request {request_id}")
+                batch = segments[:]
+                segments.clear()
+                decoded = await executor.submit(decoder, batch)
+                if turn != self.current_turn:
+                    continue
+                for segment, duration in decoded:
+                    on_segment((segment, duration))
+
+        logger.info(f"end chunks {request_id}")
+        return turn == self.current_turn
+
+    async def _speech_stream(self, text):
+        """
+        Ogg/Opus bytes of the speech: from OpenAI, recorded or replayed if there is a tape.
+        """
+        if self.tape and self.tape.replaying:
+            async for _, chunk in self.tape.player("tts", binary=True):
+                yield chunk
+            return
+
+        recorder = self.tape.recorder("tts") if self.tape and self.tape.recording else None
+        try:
+            async with self.client.audio.speech.with_streaming_response.create(
+                model=MODEL,
+                voice=VOICE,
+                input=text,
+                response_format=FORMAT,
+            ) as response:
+                async for chunk in response.iter_bytes(chunk_size=4096):
+                    if recorder:
+                        recorder.record("bytes", chunk)
+                    yield chunk
+        finally:
+            if recorder:
+                await recorder.close()
 
     def get_audio_packet(self):
         """
@@ -141,6 +313,9 @@ class TTSWorker(BaseWorker):
             turn = -1
             while turn < self.current_turn:
                 turn, duration, pts_count, chunk = self.packetq.get_nowait()
+            if turn != self.played_turn:
+                self.played_turn = turn
+                self.mark("tts_first_packet", turn)
         except asyncio.QueueEmpty:
             duration = self.silence_duration
             pts_count = int(round(self.silence_duration * self.time_base))
@@ -161,13 +336,7 @@ class TTSWorker(BaseWorker):
 
         return pkt, duration
 
-    def on_segment(self, turn, segment, meta):
-        if self.gsample_rate != meta["sampleRate"] or self.gchannels != meta["channelCount"]:
-            self._init_codec(meta["channelCount"], meta["sampleRate"])
-
-        sample_count = sum(f.samples for f in self.gcodec.decode(Packet(segment)))
-
-        duration = sample_count / self.gsample_rate
+    def on_segment(self, turn, segment, duration):
         pts_count = round(duration * self.time_base)
 
         if not self.tts_speech_active:
@@ -175,10 +344,3 @@ class TTSWorker(BaseWorker):
             self.speech_started.set()
 
         self.packetq.put_nowait((turn, duration, pts_count, segment))
-
-    def _init_codec(self, channels, sample_rate):
-        self.gcodec = codec.CodecContext.create("opus", "r")
-        self.gcodec.sample_rate = sample_rate
-        self.gcodec.channels = channels
-        self.gsample_rate = sample_rate
-        self.gchannels = channels
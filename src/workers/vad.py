@@ -1,10 +1,8 @@
 import logging
-from collections import deque
-
-import numpy as np
-from silero_vad import load_silero_vad
 
 from tracks.vad_info import VADInfoTrack
+from utils.rolling_stats import RollingStats, WindowStat
+from utils.vad_model import get_vad_model, get_vad_scheduler
 
 from .base import BaseWorker
 
@@ -12,49 +10,36 @@ logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
 
-class VADWorker(BaseWorker):
-    def __init__(self, event_bus):
-        super().__init__(event_bus)
-        self.vad_model = load_silero_vad(onnx=False)
-        self.prob_buffer_window = 50
-        self.prob_buffer = deque(maxlen=self.prob_buffer_window)
-
-    def pause_duration(self, silence_threshold=0.5, window=10) -> float:
-        """
-        Calculate accumulated pause duration for a given VAD threshold and window.
-        Could help calculate uncertainty level.
-        """
-        window = min(window, self.prob_buffer_window)
+# Every chunk is 512 samples at 16 kHz
+CHUNK_DURATION = 512 / 16_000
 
-        # Not enough data, return
-        if len(self.prob_buffer) < window / 2:
-            return 0.0
+# Rolling statistics sent with every on_vad_data event.
+# Declare new windows here, each one costs O(1) per chunk.
+VAD_STATS = (
+    WindowStat("mean_prob", window=5),
+    WindowStat("silence_ratio_short", window=5, threshold=0.05, min_fill=0.5),
+    WindowStat("silence_ratio_long", window=20, threshold=0.05, min_fill=0.5),
+    WindowStat("speech_ratio_1s", window=round(1 / CHUNK_DURATION), threshold=0.5, below=False),
+    WindowStat("speech_ratio_3s", window=round(3 / CHUNK_DURATION), threshold=0.5, below=False),
+)
 
-        silence_ratio = np.mean(np.array(self.prob_buffer)[-window:] < silence_threshold)
 
-        # Convert to seconds (20ms intervals)
-        return silence_ratio
+class VADWorker(BaseWorker):
+    def __init__(self, event_bus, stats=VAD_STATS):
+        super().__init__(event_bus)
+        # Shared model, per-session recurrent state
+        self.vad_model = get_vad_model().create_stream()
+        self.stats = RollingStats(stats)
 
     def on_chunk(self, speech_prob):
         """
         Called by VAD track when a new audio chunk from WebRTC is processed.
         """
-        self.prob_buffer.append(speech_prob)
-
-        # for el in list(np.array(self.prob_buffer)[:10]):
-        #     print(f"{el:0.2f} ", end="")
-        # print()
-        # for el in list(np.array(self.prob_buffer)):
-        #     print(f"{el:0.2f} ", end="")
-        # print()
+        self.stats.push(speech_prob)
 
         try:
-            payload = {
-                "speech_prob": round(speech_prob, 3),
-                "mean_prob": float(np.mean(np.array(self.prob_buffer)[-5:])),
-                "silence_ratio_short": float(self.pause_duration(0.05, 5)),
-                "silence_ratio_long": float(self.pause_duration(0.05, 20)),
-            }
+            payload = {"speech_prob": round(speech_prob, 3)}
+            payload.update(self.stats.values())
             self.emit("on_vad_data", payload)
         except Exception as e:
             logger.exception(e)
@@ -63,11 +48,18 @@ class VADWorker(BaseWorker):
         self.emit("on_vad_start", {})
 
     def on_end(self):
+        self.mark("vad_end")
         self.emit("on_vad_end", {})
 
+    async def infer(self, chunk) -> float:
+        """
+        Speech probability of a chunk, batched with the chunks of other sessions.
+        """
+        return await get_vad_scheduler().infer(self.vad_model, chunk)
+
     def create_track(self, track):
-        return VADInfoTrack(track, self.vad_model, self.on_chunk, self.on_start, self.on_end)
+        return VADInfoTrack(track, self.infer, self.on_chunk, self.on_start, self.on_end)
 
-    def stop(self):
-        super().stop()
-        self._vad_model.reset_states()
+    async def stop(self):
+        await super().stop()
+        self.vad_model.reset()